@@ -12,31 +12,69 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import sys
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI, status
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
 
 from hackathon.api import routes
+from hackathon.api import routes_admin
+from hackathon.api import routes_archive
+from hackathon.api import routes_health
+from hackathon.api import routes_jobs
 from hackathon.api import routes_lbg
+from hackathon.api import routes_sweep
+from hackathon.api.compression import CompressionMiddleware
+from hackathon.api.static_files import PrecompressedStaticFiles, add_compress_static_parser, compress_static
+from hackathon.archive.cli import add_rescore_parser, rescore
+from hackathon.batch.cli import add_score_parser, score
 from hackathon.exception import AppException
 from hackathon.hackathon_settings import get_settings
+from hackathon.jobs.manager import shutdown_job_manager
+from hackathon.scoring.executor import shutdown_scoring_executor
+from hackathon.telemetry.profiling import ProfilingMiddleware, start_background_profiler, stop_background_profiler
+from hackathon.warmup import start_warm_up
+from hackathon.workqueue.worker import add_worker_parser, worker
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    start_background_profiler()
+    warm_up_task = start_warm_up()
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await shutdown_job_manager()
+    stop_background_profiler()
+    shutdown_scoring_executor()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(routes.router)
 app.include_router(routes_lbg.router, prefix="/lbg")
-
+app.include_router(routes_sweep.router)
+app.include_router(routes_admin.router)
+app.include_router(routes_archive.router)
+app.include_router(routes_health.router)
+app.include_router(routes_jobs.router)
+
+if get_settings().response_compression:
+    app.add_middleware(CompressionMiddleware, minimum_size=get_settings().compression_min_size)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=get_settings().allow_origins,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
-app.mount("/", StaticFiles(directory=get_settings().static_path, html=True), name="static")
+app.mount("/", PrecompressedStaticFiles(directory=get_settings().static_path, html=True), name="static")
 
 
 @app.exception_handler(AppException)
@@ -72,5 +110,22 @@ def main(host: str, port: int, workers: int):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m hackathon")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Run the API server (default).")
+    add_rescore_parser(commands)
+    add_score_parser(commands)
+    add_compress_static_parser(commands)
+    add_worker_parser(commands)
+    args = parser.parse_args()
+
+    if args.command == "rescore":
+        sys.exit(rescore(args))
+    if args.command == "score":
+        sys.exit(score(args))
+    if args.command == "compress-static":
+        sys.exit(compress_static(args))
+    if args.command == "worker":
+        sys.exit(worker(args))
     settings = get_settings()
     main(host=settings.host, port=settings.port, workers=settings.workers)
@@ -0,0 +1,128 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import gzip
+from typing import Final, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Preferred first, the first one the client accepts is used
+ENCODINGS: Final[tuple[str, ...]] = ("br", "gzip")
+COMPRESSIBLE_MEDIA_TYPES: Final[tuple[str, ...]] = ("application/json", "text/")
+# Bodies from this size take milliseconds to compress, they are compressed off the event loop
+THREAD_COMPRESSION_SIZE: Final[int] = 256 * 1024
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Encodings of an Accept-Encoding header, without those refused with q=0."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        try:
+            if quality.startswith("q=") and float(quality[2:]) <= 0:
+                continue
+        except ValueError:
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def available_encodings() -> tuple[str, ...]:
+    return tuple(encoding for encoding in ENCODINGS if encoding != "br" or brotli is not None)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Brotli quality or gzip level, the scales differ: brotli goes to 11, gzip to 9."""
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_MEDIA_TYPES) or media_type.split(";")[0].endswith("+json")
+
+
+class CompressionMiddleware:
+    """Compresses complete JSON and text responses above minimum_size with the best encoding the client accepts.
+
+    Streamed responses and responses that already carry a Content-Encoding, like precompressed static files, pass
+    through unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, brotli_quality: int = 4, gzip_level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"br": brotli_quality, "gzip": gzip_level}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((encoding for encoding in available_encodings() if encoding in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.levels[encoding], self.minimum_size))
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not _is_compressible(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                # held back until the body shows whether the response is complete and large enough
+                self.start = message
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        start, self.start, self.passthrough = self.start, None, True
+        body = message.get("body", b"")
+        # the raw header list may belong to a response object that is sent again
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers.add_vary_header("Accept-Encoding")
+        start = {**start, "headers": headers.raw}
+        if not message.get("more_body", False) and len(body) >= self.minimum_size:
+            if len(body) >= THREAD_COMPRESSION_SIZE:
+                body = await asyncio.to_thread(compress, body, self.encoding, self.level)
+            else:
+                body = compress(body, self.encoding, self.level)
+            headers["content-encoding"] = self.encoding
+            headers["content-length"] = str(len(body))
+            message = {**message, "body": body}
+        await self.send(start)
+        await self.send(message)
@@ -0,0 +1,71 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Annotated, Any, Final, Optional
+
+from fastapi import Query
+from fastapi.params import Header
+
+from hackathon.api.serialization import FastJSONResponse
+from hackathon.models.ai_models import AIScoreFormat
+
+COMPACT_MEDIA_TYPE: Final[str] = "application/vnd.hackathon.compact+json"
+
+COMPACT_RESPONSE_DOC: Final[dict] = {
+    "description": f"Columnar scores, returned for format=compact or Accept: {COMPACT_MEDIA_TYPE}.",
+    "content": {COMPACT_MEDIA_TYPE: {}},
+}
+
+
+class CompactJSONResponse(FastJSONResponse):
+    media_type = COMPACT_MEDIA_TYPE
+
+
+def get_score_format(
+    response_format: Annotated[
+        Optional[AIScoreFormat], Query(alias="format", description="Score response format.")
+    ] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+) -> AIScoreFormat:
+    """The query flag wins over the Accept header, the full response stays the default."""
+    if response_format is not None:
+        return response_format
+    if accept and COMPACT_MEDIA_TYPE in accept:
+        return AIScoreFormat.COMPACT
+    return AIScoreFormat.FULL
+
+
+def compact_score_response(
+    columns: dict[str, Any],
+    overall_experiment_score: float,
+    reused: list[bool],
+    usage: Optional[dict],
+    trace: Optional[dict],
+    run_id: Optional[str],
+    unscored_sample_ids: Optional[list[int]] = None,
+) -> CompactJSONResponse:
+    """Build the compact response straight from the columnar scores, without per sample models."""
+    unscored_sample_ids = unscored_sample_ids or list()
+    return CompactJSONResponse(
+        dict(
+            overall_experiment_score=overall_experiment_score,
+            **columns,
+            reused=reused,
+            usage=usage,
+            trace=trace,
+            run_id=run_id,
+            unscored_samples=len(unscored_sample_ids),
+            unscored_sample_ids=unscored_sample_ids,
+        )
+    )
@@ -12,25 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import glob
 import json
-import re
+import time
 from pathlib import Path
-from typing import Annotated, Any, Final, Optional, List
+from typing import Annotated, Optional
 
-import dateutil
 import pandas as pd
-from dateutil.parser import parse
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from fastapi.params import Header
 from fastapi.responses import JSONResponse
 
+from hackathon.api.negotiation import COMPACT_RESPONSE_DOC, compact_score_response, get_score_format
+from hackathon.api.serialization import FastJSONResponse
+from hackathon.archive.incremental import UnitCache, load_unit_cache
+from hackathon.archive.store import ArchivedSamples, archive_run
 from hackathon.exception import AppException
 from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.jobs.progress import JobProgress
 from hackathon.models.ai_models import (
     AIBaseBody,
     AIExperimentInfoItem,
-    AIExperimentItem,
     AIModelParamItem,
     AIProvider,
     AIProviderResponseItem,
@@ -38,23 +41,25 @@ from hackathon.models.ai_models import (
     AIRunResponse,
     AISampleItem,
     AIScoreBody,
+    AIScoreFormat,
     AIScoreResponse,
+    AITraceSummary,
+    AIUsageItem,
     SampleInputResponse,
 )
-from hackathon.providers.base_provider import ProviderParam, BaseProvider
+from hackathon.providers.base_provider import ProviderParam
+from hackathon.providers.deadline import start_deadline, unscored_samples
 from hackathon.providers.manager import get_provider
-
-INSTRUMENT_TYPE_FIELD: Final[str] = "InstrumentType"
-PLACE_HOLDER: Final[str] = "None"
-INPUT_FIELD: Final[str] = "Input"
-DATE_FIELD_END_WITH: Final[str] = "Date"
-ADDITIONAL_FIELDS: Final[list[str]] = ["ID"]
-NONE_FIELDS: Final[List[str]] = ["None", "Null", "NaN", "Empty", "Unknown", "Undefined", "Not Defined", "Unspecified", "Not Specified"]
+from hackathon.providers.scheduler import LANE_BULK, LANE_INTERACTIVE, start_scheduling
+from hackathon.scoring.executor import score_answers
+from hackathon.scoring.experiments import read_experiment
+from hackathon.scoring.sample import ADDITIONAL_FIELDS, INPUT_FIELD, extract_sample_data
+from hackathon.telemetry.tracing import start_span, start_trace
+from hackathon.telemetry.usage import start_usage_meter
+from hackathon.workqueue.client import distribute
 
 router = APIRouter(prefix="", tags=["AI"])
 
-normalize_string_regex = re.compile(r"[\s\-_d]+")
-
 
 @router.get(
     path="/score-tables",
@@ -87,7 +92,7 @@ def get_experiments(settings: Annotated[Settings, Depends(get_settings)]):
     path = Path(settings.data_path, "*.csv")
     experiments = []
     for file in glob.glob(str(path)):
-        df_columns = set(pd.read_csv(file).columns) - {INPUT_FIELD} - set(ADDITIONAL_FIELDS)
+        df_columns = set(read_experiment(file).columns) - {INPUT_FIELD} - set(ADDITIONAL_FIELDS)
         experiment_name = Path(file).stem
         stream_name = experiment_name.split('-')[0]
         prompt_file_path = Path(settings.prompts_path, stream_name + ".txt")
@@ -111,7 +116,7 @@ def get_experiments(settings: Annotated[Settings, Depends(get_settings)]):
             default_table=default_table,
         )
         experiments.append(info_item)
-    return experiments
+    return FastJSONResponse(experiments)
 
 
 @router.get(
@@ -134,7 +139,7 @@ def get_experiment_inputs(
             status.HTTP_400_BAD_REQUEST,
             f"File {str(file_path)} has incorrect structure.",
         )
-    return result
+    return FastJSONResponse(result)
 
 
 @router.get(
@@ -158,7 +163,7 @@ async def get_ai_providers():
     return response_providers
 
 
-def _validate_body_model(provider: AIProvider, body: AIBaseBody) -> bool:
+def validate_body_model(provider: AIProvider, body: AIBaseBody) -> bool:
     if body.provider_model not in provider.models:
         raise AppException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -170,275 +175,201 @@ def _validate_body_model(provider: AIProvider, body: AIBaseBody) -> bool:
 def _correct_answer_for_sample(experiment_name: str, sample_id: int):
     experiment_file_path = Path(__file__).parents[2].joinpath(f"data/{experiment_name}.csv")
     if not experiment_name.endswith("Custom"):
-        correct_answer = pd.read_csv(experiment_file_path, header=0).fillna('None').iloc[sample_id - 1]
+        correct_answer = read_experiment(experiment_file_path).fillna('None').iloc[sample_id - 1]
     else:
-        correct_answer = pd.read_csv(experiment_file_path, header=0).fillna('None').iloc[0]
+        correct_answer = read_experiment(experiment_file_path).fillna('None').iloc[0]
     return correct_answer
 
 
-def compare_as_strings(model_value: Any, correct_value: Any) -> bool:
-    try:
-        model_value = str(model_value).strip().lower()
-        correct_value = str(correct_value).strip().lower()
-        model_value = normalize_string_regex.sub("", model_value)
-        correct_value = normalize_string_regex.sub("", correct_value)
-        return model_value == correct_value
-    except:
-        return False
-
-
-def compare_as_dates(model_value: Any, correct_value: Any) -> bool:
-    try:
-        model_value = str(model_value)
-        correct_value = str(correct_value)
-        return dateutil.parser.parse(model_value) == dateutil.parser.parse(correct_value)
-    except:
-        return compare_as_strings(model_value=model_value, correct_value=correct_value)
-
-
-def compare_as_booleans(model_value: Any, correct_value: Any) -> bool:
-    try:
-        model_value = bool(model_value)
-        correct_value = bool(correct_value)
-        return model_value == correct_value
-    except:
-        return compare_as_strings(model_value=model_value, correct_value=correct_value)
-
-
-def compare_as_floats(model_value: Any, correct_value: Any) -> bool:
-    try:
-        model_value = round(float(model_value), 5)
-        correct_value = round(float(correct_value), 5)
-        return model_value == correct_value
-    except:
-        return compare_as_strings(model_value=model_value, correct_value=correct_value)
-
-
-def compare_as_integers(model_value: Any, correct_value: Any) -> bool:
-    try:
-        model_value = int(model_value)
-        correct_value = int(correct_value)
-        return model_value == correct_value
-    except:
-        return compare_as_strings(model_value=model_value, correct_value=correct_value)
-
-
-def compare_as_nan(model_value: Any, correct_value: Any) -> bool:
-    return is_nan(model_value) and is_nan(correct_value)
-
-
-def is_nan(value: Any):
-    # Looks for basic NaN values and then proceed with specific ones
-    return pd.isna(value) or (isinstance(value, str) and value in NONE_FIELDS)
-
-
-def soft_comparison(model_value: Any, correct_value: Any) -> bool:
-    if is_nan(correct_value) or is_nan(model_value):
-        return compare_as_nan(model_value=model_value, correct_value=correct_value)
-    if pd.api.types.is_integer(correct_value):
-        return compare_as_integers(model_value=model_value, correct_value=correct_value)
-    elif pd.api.types.is_float(correct_value):
-        return compare_as_floats(model_value=model_value, correct_value=correct_value)
-    elif pd.api.types.is_bool(correct_value):
-        return compare_as_booleans(model_value=model_value, correct_value=correct_value)
-    else:
-        return compare_as_strings(model_value=model_value, correct_value=correct_value)
-
-
-def _extract_sample_data(answer: str, correct_answer) -> tuple[float, list[AISampleItem]]:
-    correct_answer = {key: correct_answer[key] for key in correct_answer.keys()
-                      if key not in ADDITIONAL_FIELDS and key != INPUT_FIELD}
-
-    if answer and answer.startswith(BaseProvider.get_error_answer()):
-        samples = list()
-        for key, value in correct_answer.items():
-            samples.append(AISampleItem(field=key, model="Error", correct=str(value), score="Not Scored - Error"))
-        return 0.0, samples
-
-    empty_samples = list()
-    for key, value in correct_answer.items():
-        empty_samples.append(AISampleItem(field=key, model=PLACE_HOLDER, correct=str(value), score="0%"))
-    empty_result = (0.0, empty_samples)
-
-    opening_brace = answer.find("{")
-    closing_brace = answer.find("}")
-
-    if opening_brace != -1 and closing_brace != -1:
-        json_only = answer[opening_brace: closing_brace + 1]
-    else:
-        return empty_result
-
-    # TODO: Make this stage softer
-    try:
-        json_answer = json.loads(json_only)
-    except ValueError:  # JSONDecodeError
-        malformed_json_samples = list()
-        for key, value in correct_answer.items():
-            malformed_json_samples.append(AISampleItem(field=key, model="Malformed JSON", correct=str(value), score="No score - malformed JSON"))
-        malformed_json_result = (0.0, malformed_json_samples)
-        return malformed_json_result
-
-    sample_items = []
-    total_score = 0.0
-
-    if (
-        INSTRUMENT_TYPE_FIELD in json_answer.keys()
-        and compare_as_strings(
-            model_value=json_answer[INSTRUMENT_TYPE_FIELD],
-            correct_value=correct_answer[INSTRUMENT_TYPE_FIELD],
-        )
-    ):
-        max_item_score = 1 / len(correct_answer.keys())
-        sample_items.append(
-            AISampleItem(
-                field=INSTRUMENT_TYPE_FIELD,
-                model=str(json_answer[INSTRUMENT_TYPE_FIELD])
-                    if INSTRUMENT_TYPE_FIELD in json_answer.keys()
-                    else "Not found in response",
-                correct=str(correct_answer[INSTRUMENT_TYPE_FIELD]),
-                score=str(round(100 * max_item_score, 2)) + "%"
-            )
-        )
-        total_score += max_item_score
-        for key in set(correct_answer.keys()) - {INSTRUMENT_TYPE_FIELD}:
-            model_value = json_answer.get(key)
-            correct_value = correct_answer[key]
-
-            if key.endswith(DATE_FIELD_END_WITH):
-                are_values_equal = compare_as_dates(model_value=model_value, correct_value=correct_value)
-            else:
-                are_values_equal = soft_comparison(model_value=model_value, correct_value=correct_value)
-
-            score = max_item_score if are_values_equal else 0.0
-            total_score += score
-            sample_items.append(
-                AISampleItem(
-                    field=key,
-                    model=str(model_value) if model_value is not None else PLACE_HOLDER,
-                    correct=str(correct_value),
-                    score=str(round(100 * score, 2)) + "%",
-                )
-            )
-
-        total_score *= 100
-        return total_score, sample_items
-    else:
-        sample_items.append(
-            AISampleItem(
-                field=INSTRUMENT_TYPE_FIELD,
-                model=str(json_answer[INSTRUMENT_TYPE_FIELD])
-                    if INSTRUMENT_TYPE_FIELD in json_answer.keys()
-                    else "Not found in response",
-                correct=str(correct_answer[INSTRUMENT_TYPE_FIELD]),
-                score="No score - mismatch",
-            )
-        )
-        for key in set(correct_answer.keys()) - {INSTRUMENT_TYPE_FIELD}:
-            model_value = json_answer.get(key)
-            correct_value = correct_answer[key]
-            # TODO: softer
-            sample_items.append(
-                AISampleItem(
-                    field=key,
-                    model=str(model_value) if model_value is not None else PLACE_HOLDER,
-                    correct=str(correct_value),
-                    score="Instrument type mismatch",
-                )
-            )
-        total_score *= 100
-        return total_score, sample_items
-
-
 @router.post(
     path="/{ai_provider}/run",
     description="Run the sample.",
     response_model=AIRunResponse,
 )
-async def provider_run(ai_provider: AIProvider, body: AIRunBody, api_key: str = Header(default=None)):
-    _validate_body_model(ai_provider, body)
+async def provider_run(
+    ai_provider: AIProvider, body: AIRunBody, api_key: str = Header(default=None), trace: bool = False
+):
+    validate_body_model(ai_provider, body)
 
-    param = ProviderParam(
-        sample_id=body.sample_id,
-        provider_model=body.provider_model,
-        prompt=body.prompt,
-        context=body.input,
-        seed=body.seed,
-        temperature=body.temperature,
-        top_p=body.top_p,
-        top_k=body.top_k,
-    )
-    provider_answers = await get_provider(ai_provider, api_key).run([param])
-    answer = provider_answers[0].answer if provider_answers else ""
+    trace_attributes = dict(experiment=body.experiment_name, model=body.provider_model, sample_id=body.sample_id)
+    with start_trace("run", **trace_attributes) as recorder, start_usage_meter() as meter:
+        param = ProviderParam(
+            sample_id=body.sample_id,
+            provider_model=body.provider_model,
+            prompt=body.prompt,
+            context=body.input,
+            seed=body.seed,
+            temperature=body.temperature,
+            top_p=body.top_p,
+            top_k=body.top_k,
+        )
+        with start_scheduling(api_key, LANE_INTERACTIVE):
+            provider_answers = await get_provider(ai_provider, api_key).run([param])
+        answer = provider_answers[0].answer if provider_answers else ""
 
-    correct_answer = _correct_answer_for_sample(experiment_name=body.experiment_name, sample_id=body.sample_id)
-    overall_sample_score, sample_data = _extract_sample_data(answer=answer, correct_answer=correct_answer)
+        with start_span("scoring", sample_id=body.sample_id):
+            correct_answer = _correct_answer_for_sample(experiment_name=body.experiment_name, sample_id=body.sample_id)
+            overall_sample_score, sample_data = extract_sample_data(answer=answer, correct_answer=correct_answer)
 
-    return AIRunResponse(
+    response = AIRunResponse(
         overall_sample_score=str(round(overall_sample_score, 2)) + "%",
         output=answer,
         sample_data=sample_data,
+        usage=AIUsageItem(**meter.total.to_dict()),
+        trace=AITraceSummary(**recorder.summary()) if trace else None,
     )
+    return FastJSONResponse(response)
 
 
-@router.post(
-    path="/{ai_provider}/score",
-    description="Score all samples of the experiment.",
-    response_model=AIScoreResponse,
-)
-async def provider_score(
-    ai_provider: AIProvider,
-    body: AIScoreBody,
-    settings: Annotated[Settings, Depends(get_settings)],
-    api_key: Annotated[Optional[str], Header()] = None,
-):
-    _validate_body_model(ai_provider, body)
-
-    experiment_file_path = Path(settings.data_path, f"{body.experiment_name}.csv")
-    if not experiment_file_path.exists() or not experiment_file_path.is_file():
-        raise AppException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Experiment name {body.experiment_name} is invalid.",
-        )
-
-    provider_params = list()
-    for index, row in pd.read_csv(experiment_file_path, header=0).iterrows():
-        param = ProviderParam(
+def build_provider_params(experiment: pd.DataFrame, body: AIScoreBody) -> list[ProviderParam]:
+    return [
+        ProviderParam(
             sample_id=int(index) + 1,
             provider_model=body.provider_model,
             prompt=body.prompt,
-            context=row[INPUT_FIELD],
+            context=sample_input,
             seed=body.seed,
             temperature=body.temperature,
             top_p=body.top_p,
             top_k=body.top_k,
         )
-        provider_params.append(param)
-
-    provider_answers = await get_provider(ai_provider, api_key).run(provider_params)
-    provider_answers_dict = {p_answer.sample_id: p_answer for p_answer in provider_answers}
-
-    experiment_data: list[AIExperimentItem] = []
-    overall_experiment_score: float = 0.0
-    sample_count = 0.0
-    for index, row in pd.read_csv(experiment_file_path, header=0).fillna('None').iterrows():
-        provider_answer = provider_answers_dict.get(int(index) + 1)
-        if provider_answer is None:
-            continue
-
-        overall_sample_score, sample_data = _extract_sample_data(answer=provider_answer.answer, correct_answer=row)
-        item = AIExperimentItem(
-            overall_sample_score=str(round(overall_sample_score, 2)) + "%",
-            sample_id=provider_answer.sample_id,
-            output=provider_answer.answer,
-            sample_data=sample_data,
+        for index, sample_input in zip(experiment.index, experiment[INPUT_FIELD])
+    ]
+
+
+def get_time_budget(
+    time_budget: Annotated[
+        Optional[float], Query(gt=0, description="Seconds the response may take, late samples are left unscored.")
+    ] = None,
+    deadline: Annotated[
+        Optional[float], Query(gt=0, description="Unix time the response is due, late samples are left unscored.")
+    ] = None,
+) -> Optional[float]:
+    """Seconds provider calls may take, the earlier of both limits less the time kept for scoring the answers."""
+    budgets = list()
+    if time_budget is not None:
+        budgets.append(time_budget)
+    if deadline is not None:
+        budgets.append(deadline - time.time())
+    if not budgets:
+        return None
+    return max(min(budgets) - get_settings().deadline_margin, 0.0)
+
+
+async def prepare_score(ai_provider: AIProvider, body: AIScoreBody, settings: Settings) -> tuple[Path, UnitCache]:
+    """Validate a score request before any provider call, the experiment file and the units of the reference run."""
+    validate_body_model(ai_provider, body)
+
+    experiment_file_path = Path(settings.data_path, f"{body.experiment_name}.csv")
+    if not experiment_file_path.exists() or not experiment_file_path.is_file():
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Experiment name {body.experiment_name} is invalid.",
+        )
+    units = await asyncio.to_thread(load_unit_cache, body.reference_run_id)
+    if units is None:
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Reference run {body.reference_run_id} not exists.",
         )
-        experiment_data.append(item)
-        sample_count += 1
-        overall_experiment_score += overall_sample_score
+    return experiment_file_path, units
 
-    average_experiment_score = overall_experiment_score / sample_count
 
-    return AIScoreResponse(
+async def run_score(
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    api_key: Optional[str],
+    experiment_file_path: Path,
+    units: UnitCache,
+    response_format: AIScoreFormat,
+    include_outputs: bool = True,
+    trace: bool = False,
+    progress: Optional[JobProgress] = None,
+) -> tuple[Response, Optional[str]]:
+    """Score a prepared request, the response of the score endpoint and the id of the archived run."""
+    trace_attributes = dict(experiment=body.experiment_name, model=body.provider_model)
+    with start_trace("score", **trace_attributes) as recorder, start_usage_meter() as meter:
+        experiment = read_experiment(experiment_file_path)
+        ground_truth = experiment.fillna('None')
+        provider_params = build_provider_params(experiment, body)
+
+        if progress is not None:
+            progress.start(len(provider_params), ground_truth)
+        with start_span("provider_calls", samples=len(provider_params)) as span, start_scheduling(api_key, LANE_BULK):
+            provider_answers = await units.run(
+                distribute(ai_provider, get_provider(ai_provider, api_key)),
+                provider_params,
+                on_answer=progress.answer_done if progress is not None else None,
+            )
+            span.set_attributes(executed=len(units.executed))
+        # samples whose calls ran out of the time budget are left unscored
+        unscored = unscored_samples()
+        answers = {
+            p_answer.sample_id: p_answer.answer for p_answer in provider_answers if p_answer.sample_id not in unscored
+        }
+
+        with start_span("scoring", samples=len(answers)):
+            usages = {sample_id: meter.for_sample(sample_id) for sample_id in answers}
+            scores, experiment_data = await score_answers(
+                answers, ground_truth, usages=usages, items=response_format == AIScoreFormat.FULL
+            )
+            units.mark_reused(experiment_data)
+        average_experiment_score = scores.average_score
+
+    run_id = await asyncio.to_thread(
+        archive_run,
+        route="score",
+        provider=ai_provider.value,
+        body=body,
+        prompt=body.prompt,
+        dataset_path=experiment_file_path,
+        samples=ArchivedSamples(outputs=answers, answers=answers, units=units.units),
+        overall_score=average_experiment_score,
+        usage=meter.total.to_dict(),
+        trace_summary=recorder.summary(),
+    )
+    if response_format == AIScoreFormat.COMPACT:
+        response = compact_score_response(
+            scores.columns(outputs=answers if include_outputs else None),
+            overall_experiment_score=average_experiment_score,
+            reused=units.reused(scores.sample_ids),
+            usage=meter.total.to_dict(),
+            trace=recorder.summary() if trace else None,
+            run_id=run_id,
+            unscored_sample_ids=unscored,
+        )
+        return response, run_id
+    response = AIScoreResponse(
         overall_experiment_score=str(round(average_experiment_score, 2)) + "%",
         experiment_data=experiment_data,
+        unscored_samples=len(unscored),
+        unscored_sample_ids=unscored,
+        usage=AIUsageItem(**meter.total.to_dict()),
+        trace=AITraceSummary(**recorder.summary()) if trace else None,
+        run_id=run_id,
     )
+    return FastJSONResponse(response), run_id
+
+
+@router.post(
+    path="/{ai_provider}/score",
+    description="Score all samples of the experiment.",
+    response_model=AIScoreResponse,
+    responses={status.HTTP_200_OK: COMPACT_RESPONSE_DOC},
+)
+async def provider_score(
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    settings: Annotated[Settings, Depends(get_settings)],
+    response_format: Annotated[AIScoreFormat, Depends(get_score_format)],
+    api_key: Annotated[Optional[str], Header()] = None,
+    trace: bool = False,
+    include_outputs: Annotated[bool, Query(description="Include raw outputs in the compact format.")] = True,
+    time_budget: Annotated[Optional[float], Depends(get_time_budget)] = None,
+):
+    with start_deadline(time_budget):
+        experiment_file_path, units = await prepare_score(ai_provider, body, settings)
+        response, _ = await run_score(
+            ai_provider, body, api_key, experiment_file_path, units, response_format, include_outputs, trace
+        )
+    return response
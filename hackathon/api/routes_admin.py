@@ -0,0 +1,109 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, status
+from fastapi.params import Header
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from hackathon.cache.tiered import cache_stats
+from hackathon.exception import AppException
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.providers.scheduler import scheduler_stats
+from hackathon.telemetry.metrics import get_metrics_registry
+from hackathon.telemetry.profiling import get_background_profiler, is_admin
+
+
+def verify_admin_key(admin_key: Annotated[Optional[str], Header()] = None) -> None:
+    if not is_admin(admin_key):
+        raise AppException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin key is missing or invalid.")
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(verify_admin_key)])
+
+
+@router.get(
+    path="/profiles",
+    description="Get names of saved request profiles.",
+)
+def get_profiles(settings: Annotated[Settings, Depends(get_settings)]) -> list[str]:
+    if not settings.profiles_path.exists():
+        return []
+    return sorted(file.name for file in settings.profiles_path.glob("*.speedscope.json"))
+
+
+@router.get(
+    path="/profiles/{file_name}",
+    description="Download a saved request profile in speedscope format.",
+    response_class=FileResponse,
+)
+def get_profile(file_name: str, settings: Annotated[Settings, Depends(get_settings)]):
+    file_path = Path(settings.profiles_path, file_name)
+    if file_path.parent != settings.profiles_path or not file_path.is_file():
+        raise AppException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Profile {file_name} not exists.")
+    return FileResponse(file_path, media_type="application/json", filename=file_name)
+
+
+def _background_profiler():
+    profiler = get_background_profiler()
+    if profiler is None:
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Background profiler is disabled, set BACKGROUND_PROFILER to enable it.",
+        )
+    return profiler
+
+
+@router.get(
+    path="/profile/hot-frames",
+    description="Get the hottest frames sampled across live traffic.",
+)
+def get_hot_frames(top: int = 50) -> list[dict]:
+    return _background_profiler().hot_frames(top)
+
+
+@router.get(
+    path="/profile/flamegraph",
+    description="Get stacks sampled across live traffic in collapsed (flamegraph) format.",
+    response_class=PlainTextResponse,
+)
+def get_flamegraph():
+    return _background_profiler().collapsed_stacks()
+
+
+@router.get(
+    path="/metrics",
+    description="Get server metrics in Prometheus text format.",
+    response_class=PlainTextResponse,
+)
+def get_metrics():
+    return get_metrics_registry().render_prometheus()
+
+
+@router.get(
+    path="/cache",
+    description="Get size, evictions and hit rates per tier of the caches of this worker.",
+)
+def get_cache_stats() -> list[dict]:
+    return cache_stats()
+
+
+@router.get(
+    path="/scheduler",
+    description="Get queued and in flight provider calls per lane and tenant of this worker.",
+)
+def get_scheduler_stats() -> list[dict]:
+    return scheduler_stats()
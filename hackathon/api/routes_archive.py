@@ -0,0 +1,76 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, status
+
+from hackathon.api.routes_admin import verify_admin_key
+from hackathon.api.serialization import FastJSONResponse
+from hackathon.archive.rescore import rescore_run, rescore_runs
+from hackathon.archive.store import get_run_archive
+from hackathon.exception import AppException
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.models.ai_models import AIArchivedRunItem, AIRescoreResponse
+
+router = APIRouter(prefix="/archive", tags=["Archive"], dependencies=[Depends(verify_admin_key)])
+
+
+@router.get(
+    path="/runs",
+    description="Get archived runs, newest first.",
+    response_model=list[AIArchivedRunItem],
+)
+def get_runs(experiment_name: Optional[str] = None, limit: int = 100):
+    return [run.to_dict() for run in get_run_archive().list_runs(experiment_name=experiment_name, limit=limit)]
+
+
+@router.get(
+    path="/runs/{run_id}",
+    description="Get an archived run.",
+    response_model=AIArchivedRunItem,
+)
+def get_run(run_id: str):
+    run = get_run_archive().get_run(run_id)
+    if run is None:
+        raise AppException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Run {run_id} not exists.")
+    return run.to_dict()
+
+
+@router.post(
+    path="/runs/{run_id}/rescore",
+    description="Rescore the archived outputs of a run with the current scoring code, without provider calls.",
+    response_model=AIRescoreResponse,
+)
+async def rescore(run_id: str, settings: Annotated[Settings, Depends(get_settings)]):
+    try:
+        result = await asyncio.to_thread(rescore_run, get_run_archive(), run_id, settings.data_path)
+    except FileNotFoundError as err:
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Experiment file is missing: {err}"
+        )
+    if result is None:
+        raise AppException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Run {run_id} not exists.")
+    return FastJSONResponse(result.to_response())
+
+
+@router.post(
+    path="/rescore",
+    description="Rescore all archived runs, optionally of one experiment, without provider calls.",
+    response_model=list[AIRescoreResponse],
+)
+async def rescore_all(settings: Annotated[Settings, Depends(get_settings)], experiment_name: Optional[str] = None):
+    results = await asyncio.to_thread(rescore_runs, get_run_archive(), settings.data_path, experiment_name)
+    return FastJSONResponse([result.to_response(include_samples=False) for result in results])
@@ -0,0 +1,43 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from fastapi import APIRouter, Response, status
+
+from hackathon.models.ai_models import ReadinessResponse
+from hackathon.warmup import get_readiness
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get(
+    path="/live",
+    description="Liveness probe, answers as soon as the worker accepts requests.",
+)
+def get_liveness() -> dict[str, str]:
+    return {"status": "alive"}
+
+
+@router.get(
+    path="/ready",
+    description="Readiness probe, 503 until the warm-up has finished and every required step succeeded.",
+    response_model=ReadinessResponse,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessResponse}},
+)
+def get_readiness_state(response: Response):
+    readiness = get_readiness()
+    state = readiness.to_dict()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
@@ -0,0 +1,146 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import ModuleType
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.params import Header
+
+from hackathon.api import routes, routes_lbg
+from hackathon.api.negotiation import get_score_format
+from hackathon.api.routes_admin import verify_admin_key
+from hackathon.exception import AppException
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.jobs.manager import get_job_manager
+from hackathon.jobs.store import STATUS_SUCCEEDED, Job, new_job
+from hackathon.models.ai_models import AIJobItem, AIProvider, AIScoreBody, AIScoreFormat
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+async def _submit(
+    kind: str,
+    score_routes: ModuleType,
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    settings: Settings,
+    response_format: AIScoreFormat,
+    api_key: Optional[str],
+    trace: bool,
+    include_outputs: bool,
+) -> dict:
+    # invalid requests are rejected here, not reported later as failed jobs
+    experiment_file_path, units = await score_routes.prepare_score(ai_provider, body, settings)
+    request = dict(
+        body=body.model_dump(), response_format=response_format.value, include_outputs=include_outputs, trace=trace
+    )
+    job = new_job(kind, body.experiment_name, ai_provider.value, body.provider_model, request)
+
+    async def runner(progress):
+        return await score_routes.run_score(
+            ai_provider, body, api_key, experiment_file_path, units, response_format, include_outputs, trace, progress
+        )
+
+    await get_job_manager().submit(job, runner)
+    return job.to_dict()
+
+
+@router.post(
+    path="/{ai_provider}/score",
+    description="Submit scoring of all samples of the experiment, the result is kept with the job.",
+    response_model=AIJobItem,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_score(
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    settings: Annotated[Settings, Depends(get_settings)],
+    response_format: Annotated[AIScoreFormat, Depends(get_score_format)],
+    api_key: Annotated[Optional[str], Header()] = None,
+    trace: bool = False,
+    include_outputs: Annotated[bool, Query(description="Include raw outputs in the compact format.")] = True,
+):
+    return await _submit("score", routes, ai_provider, body, settings, response_format, api_key, trace, include_outputs)
+
+
+@router.post(
+    path="/lbg/{ai_provider}/score",
+    description="Submit scoring of all samples of the experiment through its prompt chain.",
+    response_model=AIJobItem,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_lbg_score(
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    settings: Annotated[Settings, Depends(get_settings)],
+    response_format: Annotated[AIScoreFormat, Depends(get_score_format)],
+    api_key: Annotated[Optional[str], Header()] = None,
+    trace: bool = False,
+    include_outputs: Annotated[bool, Query(description="Include raw outputs in the compact format.")] = True,
+):
+    return await _submit(
+        "lbg.score", routes_lbg, ai_provider, body, settings, response_format, api_key, trace, include_outputs
+    )
+
+
+@router.get(
+    path="",
+    description="Get jobs of all users, newest first.",
+    response_model=list[AIJobItem],
+    dependencies=[Depends(verify_admin_key)],
+)
+def get_jobs(job_status: Annotated[Optional[str], Query(alias="status")] = None, limit: int = 100):
+    return [job.to_dict() for job in get_job_manager().store.list_jobs(status=job_status, limit=limit)]
+
+
+def _get_job(job_id: str) -> Job:
+    job = get_job_manager().store.get(job_id)
+    if job is None:
+        raise AppException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not exists.")
+    return job
+
+
+@router.get(
+    path="/{job_id}",
+    description="Get the status and progress of a job.",
+    response_model=AIJobItem,
+)
+def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@router.get(
+    path="/{job_id}/result",
+    description="Get the response of a succeeded job, as the score endpoint returned it.",
+)
+def get_job_result(job_id: str):
+    job = _get_job(job_id)
+    result = get_job_manager().store.get_result(job_id)
+    if job.status != STATUS_SUCCEEDED or result is None:
+        raise AppException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is {job.status}.")
+    media_type, content = result
+    return Response(content=content, media_type=media_type)
+
+
+@router.post(
+    path="/{job_id}/cancel",
+    description="Cancel a queued or running job.",
+    response_model=AIJobItem,
+)
+async def cancel_job(job_id: str):
+    job = await get_job_manager().cancel(job_id)
+    if job is None:
+        raise AppException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not exists.")
+    return job.to_dict()
@@ -0,0 +1,188 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+from typing import Annotated, Final, Optional
+
+import pandas as pd
+from fastapi import APIRouter, Depends, status
+from fastapi.params import Header
+
+from hackathon.api import routes
+from hackathon.api.serialization import FastJSONResponse
+from hackathon.archive.incremental import UnitCache
+from hackathon.archive.store import ArchivedSamples, archive_run
+from hackathon.exception import AppException
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.models.ai_models import (
+    AIProvider,
+    AIScoreBody,
+    AISweepBody,
+    AISweepFailedRunItem,
+    AISweepResponse,
+    AISweepRunItem,
+    AIUsageItem,
+)
+from hackathon.providers.manager import get_provider, get_provider_concurrency
+from hackathon.providers.scheduler import LANE_BULK, start_scheduling
+from hackathon.scoring.executor import score_answers
+from hackathon.scoring.experiments import read_experiment
+from hackathon.telemetry.tracing import start_span, start_trace
+from hackathon.telemetry.usage import start_usage_meter
+from hackathon.workqueue.client import distribute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="", tags=["AI"])
+
+SWEEP_PARAMS: Final[tuple[str, ...]] = ("seed", "temperature", "top_p", "top_k")
+
+
+def sweep_runs(body: AISweepBody) -> list[tuple[AIProvider, AIScoreBody]]:
+    """Every combination of candidate and parameter values, a parameter the provider ignores is not varied."""
+    runs = dict()
+    for candidate in body.candidates:
+        available = {param.value for param in candidate.provider.available_params}
+        values = [getattr(body, name) if name in available else [None] for name in SWEEP_PARAMS]
+        for combination in itertools.product(*values):
+            run_body = AIScoreBody(
+                experiment_name=body.experiment_name,
+                prompt=body.prompt,
+                provider_model=candidate.provider_model,
+                **dict(zip(SWEEP_PARAMS, combination)),
+            )
+            runs.setdefault((candidate.provider, run_body.model_dump_json()), (candidate.provider, run_body))
+    return list(runs.values())
+
+
+async def _run_combination(
+    ai_provider: AIProvider,
+    body: AIScoreBody,
+    api_key: Optional[str],
+    experiment: pd.DataFrame,
+    ground_truth: pd.DataFrame,
+    limiter: asyncio.Semaphore,
+    experiment_file_path: Path,
+) -> tuple[AISweepRunItem, list[str]]:
+    trace_attributes = dict(experiment=body.experiment_name, provider=ai_provider.value, model=body.provider_model)
+    with start_trace("sweep.run", **trace_attributes) as recorder, start_usage_meter() as meter:
+        provider = distribute(ai_provider, get_provider(ai_provider, api_key))
+        provider.limiter = limiter
+        provider_params = routes.build_provider_params(experiment, body)
+        units = UnitCache()
+        with start_span("provider_calls", samples=len(provider_params)), start_scheduling(api_key, LANE_BULK):
+            provider_answers = await units.run(provider, provider_params)
+        answers = {p_answer.sample_id: p_answer.answer for p_answer in provider_answers}
+        with start_span("scoring", samples=len(answers)):
+            scores, _ = await score_answers(answers, ground_truth, items=False)
+
+    run_id = await asyncio.to_thread(
+        archive_run,
+        route="sweep",
+        provider=ai_provider.value,
+        body=body,
+        prompt=body.prompt,
+        dataset_path=experiment_file_path,
+        samples=ArchivedSamples(outputs=answers, answers=answers, units=units.units),
+        overall_score=scores.average_score,
+        usage=meter.total.to_dict(),
+        trace_summary=recorder.summary(),
+    )
+    run = AISweepRunItem(
+        provider=ai_provider,
+        provider_model=body.provider_model,
+        **{name: getattr(body, name) for name in SWEEP_PARAMS},
+        overall_experiment_score=round(scores.average_score, 2),
+        field_scores={field: round(score, 2) for field, score in scores.field_scores().items()},
+        usage=AIUsageItem(**meter.total.to_dict()),
+        run_id=run_id,
+    )
+    return run, scores.fields
+
+
+@router.post(
+    path="/sweep",
+    description="Score the experiment with every combination of provider models and parameter values.",
+    response_model=AISweepResponse,
+)
+async def sweep(
+    body: AISweepBody,
+    settings: Annotated[Settings, Depends(get_settings)],
+    api_key: Annotated[Optional[str], Header()] = None,
+):
+    runs = sweep_runs(body)
+    if len(runs) > settings.sweep_max_runs:
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Sweep has {len(runs)} combinations, at most {settings.sweep_max_runs} are allowed.",
+        )
+    for ai_provider, run_body in runs:
+        routes.validate_body_model(ai_provider, run_body)
+    experiment_file_path = Path(settings.data_path, f"{body.experiment_name}.csv")
+    if not experiment_file_path.is_file():
+        raise AppException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Experiment name {body.experiment_name} is invalid.",
+        )
+
+    # ground truth is read once, the runs only differ in their provider calls
+    experiment = read_experiment(experiment_file_path)
+    ground_truth = experiment.fillna('None')
+    # each provider has its own limit, so that a slow provider does not hold up the calls to the others
+    limiters = {
+        ai_provider: asyncio.Semaphore(get_provider_concurrency(ai_provider))
+        for ai_provider in {ai_provider for ai_provider, _ in runs}
+    }
+    results = await asyncio.gather(
+        *[
+            _run_combination(
+                ai_provider,
+                run_body,
+                body.api_keys.get(ai_provider, api_key),
+                experiment,
+                ground_truth,
+                limiters[ai_provider],
+                experiment_file_path,
+            )
+            for ai_provider, run_body in runs
+        ],
+        return_exceptions=True,
+    )
+    # a failing combination is reported with the others instead of discarding the runs that finished
+    finished, failed = list(), list()
+    for (ai_provider, run_body), result in zip(runs, results):
+        if not isinstance(result, BaseException):
+            finished.append(result)
+            continue
+        if not isinstance(result, Exception):
+            raise result
+        logger.error("Sweep run of %s %s failed.", ai_provider.value, run_body.provider_model, exc_info=result)
+        failed.append(
+            AISweepFailedRunItem(
+                provider=ai_provider,
+                provider_model=run_body.provider_model,
+                **{name: getattr(run_body, name) for name in SWEEP_PARAMS},
+                error=f"{type(result).__name__}: {result}",
+            )
+        )
+    response = AISweepResponse(
+        experiment_name=body.experiment_name,
+        fields=finished[0][1] if finished else [],
+        runs=sorted((run for run, _ in finished), key=lambda run: -run.overall_experiment_score),
+        failed_runs=failed,
+    )
+    return FastJSONResponse(response)
@@ -0,0 +1,170 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Final, Optional, Union
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from hackathon.api.compression import ENCODINGS, accepted_encodings, available_encodings, brotli, compress
+from hackathon.hackathon_settings import get_settings
+
+ASSET_MANIFEST: Final[str] = "asset-manifest.json"
+IMMUTABLE_CACHE_CONTROL: Final[str] = "public, max-age=31536000, immutable"
+# Everything that is not fingerprinted is revalidated on every use, an unchanged file costs a 304
+REVALIDATE_CACHE_CONTROL: Final[str] = "no-cache"
+COMPRESSIBLE_SUFFIXES: Final[frozenset[str]] = frozenset(
+    {".css", ".html", ".ico", ".js", ".json", ".map", ".svg", ".txt"}
+)
+MIN_COMPRESS_SIZE: Final[int] = 1024
+VARIANT_SUFFIXES: Final[dict[str, str]] = {"br": ".br", "gzip": ".gz"}
+# Variants are compressed once, so they get the highest levels
+VARIANT_LEVELS: Final[dict[str, int]] = {"br": 11, "gzip": 9}
+
+
+def _write_atomically(path: Path, data: bytes) -> None:
+    # workers may precompress the same directory at once, readers only ever see a complete file
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as temp_file:
+        temp_file.write(data)
+    os.replace(temp_file.name, path)
+
+
+def precompress_static(directory: Union[str, Path]) -> list[Path]:
+    """Write the brotli and gzip variants of every compressible file that has no fresh variant yet."""
+    written = list()
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        source_stat = path.stat()
+        if source_stat.st_size < MIN_COMPRESS_SIZE:
+            continue
+        data = None
+        for encoding in available_encodings():
+            variant_path = path.with_name(path.name + VARIANT_SUFFIXES[encoding])
+            if variant_path.exists() and variant_path.stat().st_mtime_ns >= source_stat.st_mtime_ns:
+                continue
+            data = data if data is not None else path.read_bytes()
+            compressed = compress(data, encoding, VARIANT_LEVELS[encoding])
+            # a variant that is not smaller is never worth sending
+            if len(compressed) < len(data):
+                _write_atomically(variant_path, compressed)
+                written.append(variant_path)
+    return written
+
+
+@lru_cache(maxsize=1024)
+def _content_etag(path: str, modified_ns: int, size: int) -> str:
+    with open(path, "rb") as file:
+        return '"' + hashlib.sha256(file.read()).hexdigest()[:32] + '"'
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Static files with precompressed variants, immutable caching of fingerprinted assets and content ETags.
+
+    Fingerprinted assets are the files listed in the asset manifest of the build, it is read once at startup.
+    """
+
+    def __init__(self, directory: Union[str, Path], **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.root = os.path.realpath(directory)
+        self.immutable = self._load_immutable(Path(directory, ASSET_MANIFEST))
+
+    @staticmethod
+    def _load_immutable(manifest_path: Path) -> frozenset[str]:
+        try:
+            with open(manifest_path) as manifest_file:
+                files = json.load(manifest_file)["files"]
+        except (OSError, ValueError, KeyError):
+            return frozenset()
+        return frozenset(path.lstrip("/") for path in files.values() if path.lstrip("/") != "index.html")
+
+    def _variant(
+        self, full_path: str, stat_result: os.stat_result, request_headers: Headers
+    ) -> tuple[str, os.stat_result, Optional[str]]:
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            suffix = VARIANT_SUFFIXES[encoding]
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # a variant older than its source belongs to a previous build
+            if variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                return full_path + suffix, variant_stat, encoding
+        return full_path, stat_result, None
+
+    def file_response(
+        self, full_path: Union[str, os.PathLike], stat_result: os.stat_result, scope: Scope, status_code: int = 200
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        relative_path = Path(os.path.relpath(full_path, self.root)).as_posix()
+        served_path, served_stat, encoding = self._variant(full_path, stat_result, request_headers)
+
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL if relative_path in self.immutable else REVALIDATE_CACHE_CONTROL
+        }
+        if Path(full_path).suffix in COMPRESSIBLE_SUFFIXES:
+            headers["vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            headers=headers,
+            # the media type is that of the original file, not of its compressed variant
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+            stat_result=served_stat,
+            method=scope["method"],
+        )
+        # content ETags are equal on every node, unlike the mtime based ones
+        response.headers["etag"] = _content_etag(served_path, served_stat.st_mtime_ns, served_stat.st_size)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is None:
+            return super().is_not_modified(response_headers, request_headers)
+        # If-None-Match takes precedence over If-Modified-Since and may list several (weak) tags
+        etag = response_headers.get("etag", "")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def add_compress_static_parser(commands: argparse._SubParsersAction) -> None:
+    parser = commands.add_parser("compress-static", help="Write brotli and gzip variants of the static files.")
+    parser.add_argument("--static", type=Path, default=get_settings().static_path, help="Static files directory.")
+
+
+def compress_static(args: argparse.Namespace) -> int:
+    if brotli is None:
+        print("brotli is not installed, only gzip variants are written.")
+    for path in precompress_static(args.static):
+        print(path)
+    return 0
@@ -0,0 +1,53 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import sys
+from pathlib import Path
+
+from hackathon.archive.rescore import rescore_run, rescore_runs
+from hackathon.archive.store import RunArchive
+from hackathon.hackathon_settings import get_settings
+
+
+def add_rescore_parser(commands: argparse._SubParsersAction) -> None:
+    settings = get_settings()
+    parser = commands.add_parser("rescore", help="Rescore archived runs without provider calls.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--run-id", action="append", help="Run to rescore, can be repeated.")
+    target.add_argument("--all", action="store_true", help="Rescore every archived run.")
+    parser.add_argument("--experiment", help="Only rescore runs of this experiment (with --all).")
+    parser.add_argument("--archive", type=Path, default=settings.archive_path, help="Archive file.")
+    parser.add_argument("--data", type=Path, default=settings.data_path, help="Directory of experiment files.")
+    parser.add_argument("--samples", action="store_true", help="Include per sample results in the output.")
+
+
+def rescore(args: argparse.Namespace) -> int:
+    """Print one JSON line per rescored run, exit code 1 when a requested run is not archived."""
+    if not Path(args.archive).is_file():
+        print(f"Archive {args.archive} not exists.", file=sys.stderr)
+        return 1
+    archive = RunArchive(args.archive)
+    if args.all:
+        results = rescore_runs(archive, args.data, args.experiment)
+    else:
+        results = [rescore_run(archive, run_id, args.data) for run_id in args.run_id]
+    exit_code = 0
+    for run_id, result in zip(args.run_id or [None] * len(results), results):
+        if result is None:
+            print(f"Run {run_id} not exists.", file=sys.stderr)
+            exit_code = 1
+            continue
+        print(result.to_response(include_samples=args.samples).model_dump_json())
+    return exit_code
@@ -0,0 +1,82 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from dataclasses import asdict
+from typing import Optional
+
+from hackathon.archive.store import content_hash, get_run_archive
+from hackathon.models.ai_models import AIExperimentItem
+from hackathon.providers.base_provider import AnswerCallback, BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.metrics import get_metrics_registry
+
+PROVIDER_UNITS = get_metrics_registry().counter(
+    "hackathon_provider_units_total", "Provider calls of score runs, executed or reused from a reference run."
+)
+
+
+def unit_hash(provider: BaseProvider, param: ProviderParam) -> str:
+    """Hash of one unit of provider work: the sample input, the final prompt and the model params."""
+    unit = asdict(param)
+    del unit["sample_id"]  # the same input scores the same wherever the row sits in the experiment file
+    unit["provider"] = provider.PROVIDER_NAME or type(provider).__name__
+    return content_hash(json.dumps(unit, sort_keys=True, default=str).encode())
+
+
+class UnitCache:
+    """Answers of a reference run keyed by unit hash, only units missing from it are sent to the provider."""
+
+    def __init__(self, reference: Optional[dict[str, str]] = None):
+        self.reference = reference or dict()
+        self.units: dict[str, str] = dict()  # every successful unit of this run, archived for the next one
+        self.executed: set[int] = set()  # samples with at least one provider call in this run
+
+    async def run(
+        self, provider: BaseProvider, params: list[ProviderParam], on_answer: Optional[AnswerCallback] = None
+    ) -> list[ProviderAnswer]:
+        hashes = [unit_hash(provider, param) for param in params]
+        answers: list[Optional[ProviderAnswer]] = [
+            ProviderAnswer(sample_id=param.sample_id, answer=self.reference[hash_]) if hash_ in self.reference else None
+            for param, hash_ in zip(params, hashes)
+        ]
+        pending = [index for index, answer in enumerate(answers) if answer is None]
+        PROVIDER_UNITS.inc(len(params) - len(pending), outcome="reused")
+        PROVIDER_UNITS.inc(len(pending), outcome="executed")
+        if on_answer is not None:
+            for answer in answers:
+                if answer is not None:
+                    on_answer(answer)
+
+        for index, answer in zip(pending, await provider.run([params[index] for index in pending], on_answer)):
+            answers[index] = answer
+            self.executed.add(answer.sample_id)
+        for hash_, answer in zip(hashes, answers):
+            if not answer.answer.startswith(provider.get_error_answer()):
+                self.units[hash_] = answer.answer
+        return answers
+
+    def reused(self, sample_ids: list[int]) -> list[bool]:
+        return [sample_id not in self.executed for sample_id in sample_ids]
+
+    def mark_reused(self, experiment_data: list[AIExperimentItem]) -> None:
+        for item in experiment_data:
+            item.reused = item.sample_id not in self.executed
+
+
+def load_unit_cache(reference_run_id: Optional[str]) -> Optional[UnitCache]:
+    """Unit cache seeded from an archived run, None when the reference run is unknown."""
+    if reference_run_id is None:
+        return UnitCache()
+    samples = get_run_archive().get_samples(reference_run_id)
+    return UnitCache(samples.units) if samples is not None else None
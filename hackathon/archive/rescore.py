@@ -0,0 +1,71 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from hackathon.archive.store import ArchivedRun, RunArchive, dataset_hash
+from hackathon.models.ai_models import AIExperimentItem, AIRescoreResponse
+from hackathon.scoring.engine import ExperimentScores, score_experiment
+from hackathon.scoring.experiments import read_experiment
+
+
+@dataclass
+class RescoreResult:
+    run: ArchivedRun
+    scores: ExperimentScores
+    experiment_data: list[AIExperimentItem]
+    dataset_hash: str
+
+    @property
+    def overall_score(self) -> float:
+        return self.scores.average_score if self.scores.sample_ids else 0.0
+
+    def to_response(self, include_samples: bool = True) -> AIRescoreResponse:
+        archived_score = self.run.overall_score
+        return AIRescoreResponse(
+            run_id=self.run.run_id,
+            experiment_name=self.run.experiment_name,
+            archived_score=str(round(archived_score, 2)) + "%" if archived_score is not None else None,
+            overall_experiment_score=str(round(self.overall_score, 2)) + "%",
+            dataset_changed=self.dataset_hash != self.run.dataset_hash,
+            experiment_data=self.experiment_data if include_samples else [],
+        )
+
+
+def rescore_run(archive: RunArchive, run_id: str, data_path: Path) -> Optional[RescoreResult]:
+    """Score the archived outputs of a run against the current scoring code and experiment file, None if unknown."""
+    run = archive.get_run(run_id)
+    samples = archive.get_samples(run_id)
+    if run is None or samples is None:
+        return None
+    experiment_file_path = Path(data_path, f"{run.experiment_name}.csv")
+    ground_truth = read_experiment(experiment_file_path).fillna('None')
+    scores = score_experiment(samples.answers, ground_truth)
+    return RescoreResult(
+        run=run,
+        scores=scores,
+        experiment_data=scores.experiment_items(outputs=samples.outputs),
+        dataset_hash=dataset_hash(experiment_file_path),
+    )
+
+
+def rescore_runs(archive: RunArchive, data_path: Path, experiment_name: Optional[str] = None) -> list[RescoreResult]:
+    results = list()
+    for run in archive.list_runs(experiment_name=experiment_name):
+        if not Path(data_path, f"{run.experiment_name}.csv").is_file():
+            continue
+        results.append(rescore_run(archive, run.run_id, data_path))
+    return results
@@ -0,0 +1,248 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from hackathon.hackathon_settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    prompt BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    route TEXT NOT NULL,
+    experiment_name TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    provider_model TEXT NOT NULL,
+    params TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL REFERENCES prompts (prompt_hash),
+    dataset_hash TEXT NOT NULL,
+    overall_score REAL,
+    usage TEXT,
+    timings TEXT NOT NULL,
+    samples BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_experiment ON runs (experiment_name, created_at);
+"""
+
+
+@dataclass
+class ArchivedRun:
+    run_id: str
+    created_at: float
+    route: str
+    experiment_name: str
+    provider: str
+    provider_model: str
+    params: dict = field(default_factory=dict)
+    prompt_hash: str = ""
+    dataset_hash: str = ""
+    overall_score: Optional[float] = None
+    usage: Optional[dict] = None
+    timings: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__dataclass_fields__}
+
+
+@dataclass
+class ArchivedSamples:
+    outputs: dict[int, str]  # raw model outputs shown to the user
+    answers: dict[int, str]  # answers that were scored, after any repair
+    units: dict[str, str] = field(default_factory=dict)  # provider answers by unit hash, for incremental runs
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@lru_cache(maxsize=64)
+def _file_hash(path: Path, modified: float, size: int) -> str:
+    return content_hash(path.read_bytes())
+
+
+def dataset_hash(path: Path) -> str:
+    stat = path.stat()
+    return _file_hash(path, stat.st_mtime, stat.st_size)
+
+
+def _compress(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value).encode(), level=6)
+
+
+def _decompress(value: bytes) -> Any:
+    return json.loads(zlib.decompress(value).decode())
+
+
+class RunArchive:
+    """Runs and their raw outputs in one SQLite file, sample data compressed per run."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save_run(self, run: ArchivedRun, prompt: str, samples: ArchivedSamples) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO prompts (prompt_hash, prompt) VALUES (?, ?)",
+                (run.prompt_hash, zlib.compress(prompt.encode())),
+            )
+            connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run.run_id,
+                    run.created_at,
+                    run.route,
+                    run.experiment_name,
+                    run.provider,
+                    run.provider_model,
+                    json.dumps(run.params),
+                    run.prompt_hash,
+                    run.dataset_hash,
+                    run.overall_score,
+                    json.dumps(run.usage) if run.usage is not None else None,
+                    json.dumps(run.timings),
+                    _compress({"outputs": samples.outputs, "answers": samples.answers, "units": samples.units}),
+                ),
+            )
+
+    @staticmethod
+    def _to_run(row: sqlite3.Row) -> ArchivedRun:
+        return ArchivedRun(
+            run_id=row["run_id"],
+            created_at=row["created_at"],
+            route=row["route"],
+            experiment_name=row["experiment_name"],
+            provider=row["provider"],
+            provider_model=row["provider_model"],
+            params=json.loads(row["params"]),
+            prompt_hash=row["prompt_hash"],
+            dataset_hash=row["dataset_hash"],
+            overall_score=row["overall_score"],
+            usage=json.loads(row["usage"]) if row["usage"] is not None else None,
+            timings=json.loads(row["timings"]),
+        )
+
+    def list_runs(self, experiment_name: Optional[str] = None, limit: Optional[int] = None) -> list[ArchivedRun]:
+        query = "SELECT * FROM runs"
+        params: list = list()
+        if experiment_name is not None:
+            query += " WHERE experiment_name = ?"
+            params.append(experiment_name)
+        query += " ORDER BY created_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            return [self._to_run(row) for row in connection.execute(query, params)]
+
+    def get_run(self, run_id: str) -> Optional[ArchivedRun]:
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._to_run(row) if row is not None else None
+
+    def get_samples(self, run_id: str) -> Optional[ArchivedSamples]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT samples FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        samples = _decompress(row[0])
+        # JSON object keys are strings, sample ids are restored to integers
+        return ArchivedSamples(
+            outputs={int(key): value for key, value in samples["outputs"].items()},
+            answers={int(key): value for key, value in samples["answers"].items()},
+            units=samples.get("units", dict()),
+        )
+
+    def get_prompt(self, prompt_hash: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT prompt FROM prompts WHERE prompt_hash = ?", (prompt_hash,)).fetchone()
+        return zlib.decompress(row[0]).decode() if row is not None else None
+
+
+@lru_cache
+def _run_archive(path: Path) -> RunArchive:
+    return RunArchive(path)
+
+
+def get_run_archive() -> RunArchive:
+    return _run_archive(Path(get_settings().archive_path))
+
+
+def archive_run(
+    route: str,
+    provider: str,
+    body: Any,
+    prompt: str,
+    dataset_path: Path,
+    samples: ArchivedSamples,
+    overall_score: Optional[float],
+    usage: Optional[dict],
+    trace_summary: dict,
+) -> Optional[str]:
+    """Persist a finished run, returning its id. Archive failures are logged and never fail the request."""
+    if not get_settings().archive_runs:
+        return None
+    timings = {stage["name"]: stage["total_ms"] for stage in trace_summary["stages"]}
+    timings["duration_ms"] = trace_summary["duration_ms"]
+    run = ArchivedRun(
+        run_id=uuid.uuid4().hex,
+        created_at=time.time(),
+        route=route,
+        experiment_name=body.experiment_name,
+        provider=provider,
+        provider_model=body.provider_model,
+        params=dict(seed=body.seed, temperature=body.temperature, top_p=body.top_p, top_k=body.top_k),
+        prompt_hash=content_hash(prompt.encode()),
+        dataset_hash=dataset_hash(dataset_path),
+        overall_score=overall_score,
+        usage=usage,
+        timings=timings,
+    )
+    try:
+        get_run_archive().save_run(run, prompt, samples)
+    except (sqlite3.Error, OSError) as err:
+        logger.warning(f"Failed to archive run {run.run_id}: {err}")
+        return None
+    return run.run_id
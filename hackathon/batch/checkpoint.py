@@ -0,0 +1,124 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from hackathon.providers.base_provider import BaseProvider
+from hackathon.telemetry.usage import UsageTotals
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+@dataclass
+class SampleRecord:
+    sample_id: int
+    output: str  # raw model answer
+    answer: str  # answer that is scored
+    usage: UsageTotals
+
+    @property
+    def failed(self) -> bool:
+        error_answer = BaseProvider.get_error_answer()
+        return self.answer.startswith(error_answer) or self.output.startswith(error_answer)
+
+    def to_line(self) -> bytes:
+        record = dict(sample_id=self.sample_id, output=self.output, answer=self.answer, usage=asdict(self.usage))
+        return json.dumps(record).encode() + b"\n"
+
+    @classmethod
+    def from_line(cls, line: bytes) -> "SampleRecord":
+        record = json.loads(line)
+        return cls(
+            sample_id=record["sample_id"],
+            output=record["output"],
+            answer=record["answer"],
+            usage=UsageTotals(**record["usage"]),
+        )
+
+
+class Checkpoint:
+    """Answered samples of a batch run, one JSON line each after a header line describing the run.
+
+    Every line is flushed once its sample is answered. A run that was interrupted loses at most the line it was
+    writing, the line is cut off when the run resumes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file: Optional[BinaryIO] = None
+
+    def open(self, run: dict, restart: bool = False) -> set[int]:
+        """Sample ids answered by earlier attempts of the run, the checkpoint of another run is not resumed."""
+        run = json.loads(json.dumps(run))
+        if restart or not self.path.is_file() or not self._read_header():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "wb")
+            self._file.write(json.dumps(dict(run=run)).encode() + b"\n")
+            self._file.flush()
+            return set()
+        if self._read_header() != run:
+            raise CheckpointMismatch(f"Checkpoint {self.path} belongs to another run.")
+
+        sample_ids = set()
+        with open(self.path, "rb") as file:
+            end = len(file.readline())
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    sample_ids.add(SampleRecord.from_line(line).sample_id)
+                except (ValueError, KeyError, TypeError):
+                    break
+                end += len(line)
+        self._file = open(self.path, "r+b")
+        self._file.truncate(end)
+        self._file.seek(end)
+        return sample_ids
+
+    def _read_header(self) -> Optional[dict]:
+        with open(self.path, "rb") as file:
+            header = file.readline()
+        if not header.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(header)["run"]
+        except (ValueError, KeyError):
+            raise CheckpointMismatch(f"{self.path} is not a checkpoint.")
+
+    def records(self, batch_size: int) -> Iterator[list[SampleRecord]]:
+        """Records written so far in batches, only one batch is held at a time."""
+        batch = list()
+        with open(self.path, "rb") as file:
+            file.readline()
+            for line in file:
+                batch.append(SampleRecord.from_line(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = list()
+        if batch:
+            yield batch
+
+    def append(self, record: SampleRecord) -> None:
+        self._file.write(record.to_line())
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,138 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from hackathon.batch.checkpoint import Checkpoint, CheckpointMismatch
+from hackathon.batch.output import FORMATS, open_writer, output_format
+from hackathon.batch.runner import BatchRun, answer_fields
+from hackathon.chains.definition import Chain, get_chain
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIProvider, AIScoreBody
+from hackathon.providers.manager import get_provider, get_provider_concurrency
+from hackathon.scoring.experiments import read_experiment
+from hackathon.workqueue.client import distribute
+
+
+def add_score_parser(commands: argparse._SubParsersAction) -> None:
+    settings = get_settings()
+    parser = commands.add_parser("score", help="Score an experiment without the API server, resumable.")
+    parser.add_argument("provider", choices=[ai_provider.value for ai_provider in AIProvider], help="AI provider.")
+    parser.add_argument("--experiment", required=True, help="Experiment name.")
+    parser.add_argument("--model", required=True, help="Provider model.")
+    parser.add_argument("--output", type=Path, required=True, help="File the per sample results are written to.")
+    parser.add_argument("--format", choices=FORMATS, help="Output format, parquet for a .parquet output by default.")
+    parser.add_argument("--lbg", action="store_true", help="Score with the prompt chain of the experiment.")
+    parser.add_argument("--prompt-file", type=Path, help="Prompt, the default prompt of the experiment if omitted.")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--top-p", type=float)
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--api-key", default=os.getenv("PROVIDER_API_KEY"), help="Provider API key.")
+    parser.add_argument("--concurrency", type=int, help="Samples scored at once, the provider concurrency if omitted.")
+    parser.add_argument("--batch-size", type=int, default=50, help="Samples scored and written together.")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint file, next to the output if omitted.")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and score every sample.")
+    parser.add_argument("--data", type=Path, default=settings.data_path, help="Directory of experiment files.")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _default_prompt(experiment_name: str) -> Optional[str]:
+    prompt_file_path = Path(get_settings().prompts_path, experiment_name.split("-")[0] + ".txt")
+    return prompt_file_path.read_text() if prompt_file_path.is_file() else None
+
+
+def score(args: argparse.Namespace) -> int:
+    """Print one JSON line with the summary of the run, exit code 1 when the run cannot start."""
+    ai_provider = AIProvider(args.provider)
+    if args.model not in ai_provider.models:
+        print(f"Model {args.model} is not supported by {ai_provider.value} provider.", file=sys.stderr)
+        return 1
+    experiment_file_path = Path(args.data, f"{args.experiment}.csv")
+    if not experiment_file_path.is_file():
+        print(f"Experiment name {args.experiment} is invalid.", file=sys.stderr)
+        return 1
+    chain: Optional[Chain] = None
+    if args.lbg:
+        try:
+            chain = get_chain(f"{args.experiment.split('-')[0]} LBG")
+        except FileNotFoundError:
+            print(f"Experiment {args.experiment} has no prompt chain.", file=sys.stderr)
+            return 1
+        prompt = chain.prompt
+    else:
+        prompt = args.prompt_file.read_text() if args.prompt_file is not None else _default_prompt(args.experiment)
+        if prompt is None:
+            print(f"Experiment {args.experiment} has no default prompt, pass --prompt-file.", file=sys.stderr)
+            return 1
+    body = AIScoreBody(
+        experiment_name=args.experiment,
+        prompt=prompt,
+        provider_model=args.model,
+        seed=args.seed,
+        temperature=args.temperature,
+        top_p=args.top_p,
+        top_k=args.top_k,
+    )
+    # a checkpoint is only resumed by the run that wrote it, the dataset and prompt included
+    run = dict(
+        route="lbg.score" if args.lbg else "score",
+        provider=ai_provider.value,
+        dataset_sha256=_sha256(experiment_file_path.read_bytes()),
+        prompt_sha256=_sha256(prompt.encode()),
+        **body.model_dump(exclude={"prompt", "reference_run_id"}),
+    )
+    format_name = output_format(args.output, args.format)
+    checkpoint = Checkpoint(args.checkpoint or args.output.with_name(args.output.name + ".checkpoint"))
+    try:
+        answered = checkpoint.open(run, restart=args.restart)
+    except CheckpointMismatch as err:
+        print(f"{err} Pass --restart to score again.", file=sys.stderr)
+        return 1
+
+    experiment = read_experiment(experiment_file_path)
+    batch_run = BatchRun(
+        body,
+        experiment,
+        distribute(ai_provider, get_provider(ai_provider, args.api_key)),
+        chain=chain,
+        concurrency=args.concurrency or get_provider_concurrency(ai_provider),
+        batch_size=args.batch_size,
+    )
+    try:
+        writer = open_writer(args.output, answer_fields(experiment), format_name)
+    except RuntimeError as err:
+        checkpoint.close()
+        print(str(err), file=sys.stderr)
+        return 1
+    try:
+        summary = asyncio.run(batch_run.run(checkpoint, answered, writer))
+    except KeyboardInterrupt:
+        print(f"Interrupted, answered samples are kept in {checkpoint.path}, run again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+        checkpoint.close()
+    print(json.dumps(dict(output=str(args.output), checkpoint=str(checkpoint.path), **summary.to_dict())))
+    return 0
@@ -0,0 +1,125 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+from pathlib import Path
+from typing import Any, Final, Optional
+
+from hackathon.api.serialization import dumps
+from hackathon.batch.checkpoint import SampleRecord
+from hackathon.scoring.engine import ExperimentScores
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional, results are written as JSON lines without it
+    pyarrow = None
+
+FORMAT_JSONL: Final[str] = "jsonl"
+FORMAT_PARQUET: Final[str] = "parquet"
+FORMATS: Final[tuple[str, ...]] = (FORMAT_JSONL, FORMAT_PARQUET)
+
+
+def sample_rows(scores: ExperimentScores, records: dict[int, SampleRecord]) -> list[dict[str, Any]]:
+    """One flat row per scored sample: scores and model values of the fields are "score.<field>" and "model.<field>"."""
+    columns = scores.columns()
+    rows = list()
+    for row, sample_id in enumerate(columns["sample_ids"]):
+        record = records[sample_id]
+        values = dict(
+            sample_id=sample_id,
+            status=columns["statuses"][row],
+            overall_score=columns["overall_sample_scores"][row],
+            output=record.output,
+            answer=record.answer,
+            **record.usage.to_dict(),
+        )
+        for field, score, model_value in zip(columns["fields"], columns["scores"][row], columns["model_values"][row]):
+            values[f"score.{field}"] = score
+            values[f"model.{field}"] = model_value
+        rows.append(values)
+    return rows
+
+
+class ResultWriter(abc.ABC):
+    def __init__(self, path: Path, fields: list[str]):
+        self.path = Path(path)
+        self.fields = fields
+
+    @abc.abstractmethod
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class JsonLinesWriter(ResultWriter):
+    def __init__(self, path: Path, fields: list[str]):
+        super().__init__(path, fields)
+        self._file = open(self.path, "wb")
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        self._file.write(b"".join(dumps(row) + b"\n" for row in rows))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter(ResultWriter):
+    """Every batch of rows is a row group, the file can be read once the writer is closed."""
+
+    def __init__(self, path: Path, fields: list[str]):
+        super().__init__(path, fields)
+        columns = [
+            ("sample_id", pyarrow.int64()),
+            ("status", pyarrow.string()),
+            ("overall_score", pyarrow.float64()),
+            ("output", pyarrow.string()),
+            ("answer", pyarrow.string()),
+            ("calls", pyarrow.int64()),
+            ("prompt_tokens", pyarrow.int64()),
+            ("completion_tokens", pyarrow.int64()),
+            ("total_tokens", pyarrow.int64()),
+            ("estimated_cost", pyarrow.float64()),
+            ("provider_time_ms", pyarrow.float64()),
+            ("latency_ms", pyarrow.float64()),
+        ]
+        for field in fields:
+            columns += [(f"score.{field}", pyarrow.float64()), (f"model.{field}", pyarrow.string())]
+        self._schema = pyarrow.schema(columns)
+        self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if rows:
+            self._writer.write_table(pyarrow.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def output_format(path: Path, requested: Optional[str] = None) -> str:
+    if requested is not None:
+        return requested
+    return FORMAT_PARQUET if Path(path).suffix == ".parquet" else FORMAT_JSONL
+
+
+def open_writer(path: Path, fields: list[str], format_name: str) -> ResultWriter:
+    if format_name == FORMAT_PARQUET:
+        if pyarrow is None:
+            raise RuntimeError("Parquet output needs pyarrow, install it or write JSON lines.")
+        return ParquetWriter(path, fields)
+    return JsonLinesWriter(path, fields)
@@ -0,0 +1,166 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from hackathon.batch.checkpoint import Checkpoint, SampleRecord
+from hackathon.batch.output import ResultWriter, sample_rows
+from hackathon.chains.definition import Chain
+from hackathon.chains.executor import get_stage_cache, run_chain
+from hackathon.models.ai_models import AIScoreBody
+from hackathon.providers.base_provider import BaseProvider, ProviderParam
+from hackathon.scoring.engine import score_experiment
+from hackathon.scoring.sample import ADDITIONAL_FIELDS, INPUT_FIELD
+from hackathon.telemetry.usage import UsageTotals, start_usage_meter
+
+
+def answer_fields(experiment: pd.DataFrame) -> list[str]:
+    return [column for column in experiment.columns if column not in ADDITIONAL_FIELDS and column != INPUT_FIELD]
+
+
+@dataclass
+class BatchSummary:
+    samples_total: int
+    samples_resumed: int = 0
+    samples_written: int = 0
+    samples_failed: int = 0
+    score_sum: float = 0.0
+    usage: UsageTotals = field(default_factory=UsageTotals)
+
+    @property
+    def average_score(self) -> Optional[float]:
+        return self.score_sum / self.samples_written if self.samples_written else None
+
+    def to_dict(self) -> dict:
+        average_score = self.average_score
+        return dict(
+            samples_total=self.samples_total,
+            samples_resumed=self.samples_resumed,
+            samples_written=self.samples_written,
+            samples_failed=self.samples_failed,
+            overall_experiment_score=round(average_score, 2) if average_score is not None else None,
+            usage=self.usage.to_dict(),
+        )
+
+
+class BatchRun:
+    """Scores an experiment sample by sample without holding the results, for runs outside the API server.
+
+    At most concurrency samples are in flight. Answered samples go to the checkpoint right away and are scored and
+    written in batches, answers of an earlier attempt are read back from the checkpoint instead of calling the
+    provider again. Failed samples are written but not checkpointed, so a resumed run tries them again.
+    """
+
+    def __init__(
+        self,
+        body: AIScoreBody,
+        experiment: pd.DataFrame,
+        provider: BaseProvider,
+        chain: Optional[Chain] = None,
+        concurrency: int = 8,
+        batch_size: int = 50,
+    ):
+        self.body = body
+        self.experiment = experiment
+        self.ground_truth = experiment.fillna('None')
+        self.fields = answer_fields(experiment)
+        self.provider = provider
+        self.chain = chain
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+    async def answer(self, sample_id: int, sample_input: str) -> SampleRecord:
+        # every sample runs in its own task, so its meter only sees its own calls, repair calls included
+        with start_usage_meter() as meter:
+            if self.chain is None:
+                param = ProviderParam(
+                    sample_id=sample_id,
+                    provider_model=self.body.provider_model,
+                    prompt=self.body.prompt,
+                    context=sample_input,
+                    seed=self.body.seed,
+                    temperature=self.body.temperature,
+                    top_p=self.body.top_p,
+                    top_k=self.body.top_k,
+                )
+                provider_answers = await self.provider.run([param])
+                output = answer = provider_answers[0].answer
+            else:
+                results = await run_chain(
+                    self.chain,
+                    sample_id,
+                    sample_input,
+                    self.fields,
+                    self.body,
+                    self.provider,
+                    cache=get_stage_cache(),
+                    trace_prefix="lbg",
+                )
+                result = results[self.chain.stages[-1].name]
+                output, answer = result.output, result.answer
+        return SampleRecord(sample_id=sample_id, output=output, answer=answer, usage=meter.total)
+
+    def _write(self, records: list[SampleRecord], writer: ResultWriter, summary: BatchSummary) -> None:
+        scores = score_experiment({record.sample_id: record.answer for record in records}, self.ground_truth)
+        writer.write(sample_rows(scores, {record.sample_id: record for record in records}))
+        summary.samples_written += len(scores.sample_ids)
+        summary.score_sum += float(sum(scores.overall_scores))
+        for record in records:
+            summary.samples_failed += record.failed
+            summary.usage.merge(record.usage)
+
+    def _samples(self, answered: set[int]) -> Iterator[tuple[int, str]]:
+        for index, sample_input in zip(self.experiment.index, self.experiment[INPUT_FIELD]):
+            if int(index) + 1 not in answered:
+                yield int(index) + 1, sample_input
+
+    async def run(self, checkpoint: Checkpoint, answered: set[int], writer: ResultWriter) -> BatchSummary:
+        summary = BatchSummary(samples_total=len(self.experiment))
+        # the output is written again from the checkpoint, a file cut off by the interruption is replaced
+        for records in checkpoint.records(self.batch_size):
+            await asyncio.to_thread(self._write, records, writer, summary)
+            summary.samples_resumed += len(records)
+
+        samples = self._samples(answered)
+        running: set[asyncio.Task] = set()
+        pending: list[SampleRecord] = list()
+        try:
+            while True:
+                while len(running) < self.concurrency:
+                    sample = next(samples, None)
+                    if sample is None:
+                        break
+                    running.add(asyncio.create_task(self.answer(*sample)))
+                if not running:
+                    break
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    record = task.result()
+                    if not record.failed:
+                        checkpoint.append(record)
+                    pending.append(record)
+                if len(pending) >= self.batch_size:
+                    await asyncio.to_thread(self._write, pending, writer, summary)
+                    pending = list()
+            if pending:
+                await asyncio.to_thread(self._write, pending, writer, summary)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        return summary
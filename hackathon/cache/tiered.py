@@ -0,0 +1,136 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Generic, Optional, TypeVar
+
+from hackathon.cache.tiers import MemoryTier, SharedTier, SQLiteTier
+from hackathon.hackathon_settings import get_settings
+from hackathon.telemetry.metrics import get_metrics_registry
+
+T = TypeVar("T")
+
+CACHE_REQUESTS = get_metrics_registry().counter(
+    "hackathon_cache_requests_total", "Cache lookups by cache, tier and outcome (hit or miss)."
+)
+
+
+@dataclass(frozen=True)
+class Codec(Generic[T]):
+    encode: Callable[[T], bytes]
+    decode: Callable[[bytes], T]
+
+
+class TieredCache(Generic[T]):
+    """In-process tier in front of the shared tiers, a shared hit is promoted into the in-process tier.
+
+    Caches without a codec keep objects that are not worth serializing and stay in-process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        memory: Optional[MemoryTier],
+        shared: Optional[list[SharedTier]] = None,
+        codec: Optional[Codec[T]] = None,
+    ):
+        self.name = name
+        self.memory = memory
+        self.shared = (shared or list()) if codec is not None else list()
+        self.codec = codec
+        self._lookups: dict[tuple[str, str], int] = dict()
+        self._lock = threading.Lock()
+
+    def _record(self, tier: str, outcome: str) -> None:
+        with self._lock:
+            self._lookups[tier, outcome] = self._lookups.get((tier, outcome), 0) + 1
+        CACHE_REQUESTS.inc(cache=self.name, tier=tier, outcome=outcome)
+
+    def get(self, key: str) -> Optional[T]:
+        if self.memory is not None:
+            value = self.memory.get(key)
+            self._record(self.memory.name, "hit" if value is not None else "miss")
+            if value is not None:
+                return value
+        for tier in self.shared:
+            data = tier.get(self.name, key)
+            self._record(tier.name, "hit" if data is not None else "miss")
+            if data is not None:
+                value = self.codec.decode(data)
+                if self.memory is not None:
+                    self.memory.put(key, value)
+                return value
+        return None
+
+    def put(self, key: str, value: T) -> None:
+        if self.memory is not None:
+            self.memory.put(key, value)
+        if self.shared:
+            data = self.codec.encode(value)
+            for tier in self.shared:
+                tier.put(self.name, key, data)
+
+    def stats(self) -> dict:
+        tiers = ([self.memory] if self.memory is not None else list()) + self.shared
+        with self._lock:
+            lookups = dict(self._lookups)
+        tier_stats = list()
+        for tier in tiers:
+            hits, misses = lookups.get((tier.name, "hit"), 0), lookups.get((tier.name, "miss"), 0)
+            stats = tier.stats() if isinstance(tier, MemoryTier) else tier.stats(self.name)
+            hit_rate = hits / (hits + misses) if hits + misses else None
+            tier_stats.append(dict(tier=tier.name, hits=hits, misses=misses, hit_rate=hit_rate, **stats))
+        return dict(name=self.name, tiers=tier_stats)
+
+
+@lru_cache
+def _shared_tier(backend: str, path: Path, max_bytes: int) -> Optional[SharedTier]:
+    if backend == "sqlite":
+        return SQLiteTier(path, max_bytes)
+    return None
+
+
+def get_shared_tier() -> Optional[SharedTier]:
+    settings = get_settings()
+    max_bytes = int(settings.cache_shared_max_mb * 1024 * 1024)
+    return _shared_tier(settings.cache_shared_backend, Path(settings.cache_shared_path), max_bytes)
+
+
+_caches: dict[str, TieredCache] = dict()
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, memory_entries: int, codec: Optional[Codec[T]] = None) -> TieredCache[T]:
+    """Cache registered under name, built on first use, with the shared tier when a codec is given."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None or (cache.memory.max_entries if cache.memory is not None else 0) != memory_entries:
+            shared_tier = get_shared_tier() if codec is not None else None
+            cache = _caches[name] = TieredCache(
+                name,
+                MemoryTier(memory_entries) if memory_entries > 0 else None,
+                [shared_tier] if shared_tier is not None else None,
+                codec,
+            )
+        return cache
+
+
+def cache_stats() -> list[dict]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
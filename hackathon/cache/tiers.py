@@ -0,0 +1,195 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import abc
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Final, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE usage SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE usage SET bytes = bytes - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE usage SET bytes = bytes + new.size - old.size;
+END;
+"""
+
+
+class MemoryTier:
+    """Bounded LRU of objects in this process, nothing is serialized."""
+
+    name: Final[str] = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._values: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._values)
+        return dict(entries=entries, max_entries=self.max_entries, evictions=self.evictions)
+
+
+class SharedTier(abc.ABC):
+    """Byte values shared by every worker that opens the same backend, keys are scoped by cache namespace.
+
+    Backends never fail the request, an unavailable backend behaves as a miss.
+    """
+
+    name: str = ""
+
+    @abc.abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    def put(self, namespace: str, key: str, value: bytes) -> None:
+        ...
+
+    @abc.abstractmethod
+    def stats(self, namespace: str) -> dict:
+        ...
+
+
+class SQLiteTier(SharedTier):
+    """Node-local shared tier in one SQLite file in WAL mode, least recently used entries evicted over max_bytes."""
+
+    name = "sqlite"
+    # Access times are only refreshed when older than this, so that most hits stay read-only
+    ACCESS_RESOLUTION: Final[float] = 60.0
+    # Eviction frees some room below the limit, so that not every insert near the limit has to evict
+    EVICTION_TARGET: Final[float] = 0.9
+    EVICTION_BATCH: Final[int] = 64
+    LOCK_TIMEOUT: Final[float] = 5.0
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=self.LOCK_TIMEOUT)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT value, accessed_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if row[1] < now - self.ACCESS_RESOLUTION:
+                    connection.execute(
+                        "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                    )
+                return row[0]
+        except sqlite3.Error as err:
+            logger.warning(f"Shared cache read failed: {err}")
+            return None
+
+    def put(self, namespace: str, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+                    "value = excluded.value, size = excluded.size, accessed_at = excluded.accessed_at",
+                    (namespace, key, value, len(value), time.time()),
+                )
+                self._evict(connection)
+        except sqlite3.Error as err:
+            logger.warning(f"Shared cache write failed: {err}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        (used,) = connection.execute("SELECT bytes FROM usage").fetchone()
+        if used <= self.max_bytes:
+            return
+        target = self.max_bytes * self.EVICTION_TARGET
+        while used > target:
+            deleted = connection.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed_at LIMIT ?)",
+                (self.EVICTION_BATCH,),
+            ).rowcount
+            if not deleted:
+                break
+            self.evictions += deleted
+            (used,) = connection.execute("SELECT bytes FROM usage").fetchone()
+
+    def stats(self, namespace: str) -> dict:
+        try:
+            with self._connect() as connection:
+                (entries,) = connection.execute(
+                    "SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)
+                ).fetchone()
+                (used,) = connection.execute("SELECT bytes FROM usage").fetchone()
+        except sqlite3.Error as err:
+            logger.warning(f"Shared cache stats failed: {err}")
+            entries, used = None, None
+        # entries are those of the namespace, bytes cover the whole file and evictions are those of this worker
+        return dict(entries=entries, bytes=used, max_bytes=self.max_bytes, evictions=self.evictions)
@@ -0,0 +1,118 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from string import Formatter
+from typing import Final, Optional
+
+from hackathon.cache.tiered import get_cache
+from hackathon.chains.steps import FIXUPS, TRANSFORMS
+from hackathon.hackathon_settings import get_settings
+
+INPUT_PLACEHOLDER: Final[str] = "input"
+CHAIN_DEFINITIONS_CACHE_SIZE: Final[int] = 32
+
+
+@dataclass
+class ChainStage:
+    name: str
+    template: str
+    # placeholder -> "stage" for the raw answer of an earlier stage or "stage.Field" for one of its parsed fields
+    fields: dict[str, str] = field(default_factory=dict)
+    fixups: list[str] = field(default_factory=list)
+    transforms: list[str] = field(default_factory=list)
+    repair: bool = False  # convert answers that are not JSON, locally or by asking the model
+
+    def sources(self) -> dict[str, tuple[str, Optional[str]]]:
+        """Placeholder -> (stage, field), field is None for the raw answer."""
+        return {
+            placeholder: (source.split(".", 1)[0], source.split(".", 1)[1] if "." in source else None)
+            for placeholder, source in self.fields.items()
+        }
+
+
+@dataclass
+class Chain:
+    name: str
+    taxonomy: str
+    stages: list[ChainStage]
+    files: list[Path] = field(default_factory=list)  # definition and prompt files the chain was loaded from
+
+    @property
+    def prompt(self) -> str:
+        return "".join(stage.template for stage in self.stages)
+
+
+def load_chain(path: Path) -> Chain:
+    """Chain from its JSON definition, prompt files are resolved next to it."""
+    path = Path(path)
+    with open(path) as f:
+        definition = json.load(f)
+
+    stages = list()
+    for stage_definition in definition["stages"]:
+        stage = ChainStage(
+            name=stage_definition["name"],
+            template=Path(path.parent, stage_definition["prompt"]).read_text(),
+            fields=stage_definition.get("fields", dict()),
+            fixups=stage_definition.get("fixups", list()),
+            transforms=stage_definition.get("transforms", list()),
+            repair=stage_definition.get("repair", False),
+        )
+        _validate_stage(stage, [earlier.name for earlier in stages], path)
+        stages.append(stage)
+    if not stages:
+        raise ValueError(f"Chain {path.name} has no stages.")
+    files = [path] + [Path(path.parent, stage["prompt"]) for stage in definition["stages"]]
+    return Chain(name=path.stem, taxonomy=definition["taxonomy"], stages=stages, files=files)
+
+
+def _validate_stage(stage: ChainStage, earlier_stages: list[str], path: Path) -> None:
+    if stage.name in earlier_stages:
+        raise ValueError(f"Chain {path.name} repeats stage {stage.name}.")
+    for placeholder, (source_stage, _) in stage.sources().items():
+        if source_stage not in earlier_stages:
+            raise ValueError(f"Field {placeholder} of stage {stage.name} in {path.name} needs an earlier stage.")
+    if stage.fields:
+        placeholders = {name for _, name, _, _ in Formatter().parse(stage.template) if name is not None}
+        missing = placeholders - set(stage.fields) - {INPUT_PLACEHOLDER}
+        if missing:
+            raise ValueError(f"Stage {stage.name} in {path.name} has no source for {sorted(missing)}.")
+    unknown = set(stage.fixups) - set(FIXUPS) | set(stage.transforms) - set(TRANSFORMS)
+    if unknown:
+        raise ValueError(f"Stage {stage.name} in {path.name} uses unknown steps {sorted(unknown)}.")
+
+
+def _file_versions(paths: list[Path]) -> tuple[tuple[int, int], ...]:
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, paths))
+
+
+def get_chain(name: str) -> Chain:
+    """Chain by name from the prompts directory, loaded again once its definition or one of its prompts changed."""
+    path = Path(get_settings().prompts_path, f"{name}.json")
+    cache = get_cache("chains", CHAIN_DEFINITIONS_CACHE_SIZE)
+    cached = cache.get(str(path))
+    if cached is not None:
+        versions, chain = cached
+        try:
+            if _file_versions(chain.files) == versions:
+                return chain
+        except FileNotFoundError:
+            pass
+    chain = load_chain(path)
+    cache.put(str(path), (_file_versions(chain.files), chain))
+    return chain
@@ -0,0 +1,195 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from dataclasses import asdict, dataclass
+from typing import Final, Optional
+
+from hackathon.archive.incremental import UnitCache, unit_hash
+from hackathon.archive.store import content_hash
+from hackathon.cache.tiered import Codec, TieredCache, get_cache
+from hackathon.chains.definition import Chain, ChainStage
+from hackathon.chains.steps import FIXUPS, TRANSFORMS
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIBaseBody
+from hackathon.providers.base_provider import BaseProvider, ProviderParam
+from hackathon.scoring.json_repair import JSON_REPAIRS, repair_json
+from hackathon.scoring.sample import PLACE_HOLDER, STATUS_MALFORMED, STATUS_NO_JSON, parse_answer
+from hackathon.telemetry.metrics import get_metrics_registry
+from hackathon.telemetry.tracing import start_span
+
+CHAIN_STAGES = get_metrics_registry().counter(
+    "hackathon_chain_stages_total", "Prompt chain stages, executed or served from the stage cache."
+)
+CONVERT_TO_JSON_PROMPT = """
+        Convert the following to JSON format: : ```{input}```
+        """
+
+
+@dataclass(frozen=True)
+class StageResult:
+    output: str  # raw model answer after the stage transforms
+    answer: str  # answer passed on and scored, after any repair
+
+
+STAGE_RESULT_CODEC: Final[Codec[StageResult]] = Codec(
+    encode=lambda result: json.dumps(asdict(result)).encode(),
+    decode=lambda data: StageResult(**json.loads(data)),
+)
+
+
+def get_stage_cache() -> Optional[TieredCache[StageResult]]:
+    """Stage results of this worker, backed by the shared tier so that every worker reuses them."""
+    max_size = get_settings().chain_cache_size
+    if max_size <= 0:
+        return None
+    return get_cache("chain_stages", max_size, STAGE_RESULT_CODEC)
+
+
+def repair_outcome(answer: str, keys: list[str]) -> str:
+    status, _ = parse_answer(answer, keys)
+    return "not_json" if status in (STATUS_NO_JSON, STATUS_MALFORMED) else "json"
+
+
+async def convert_to_json(
+    answer: str, keys: Optional[list[str]], param: ProviderParam, provider: BaseProvider, units: Optional[UnitCache]
+) -> tuple[str, str]:
+    """Local repair first, the model is only asked to convert its own answer when that fails."""
+    repaired = repair_json(answer, keys)
+    if repaired is not None:
+        return json.dumps(repaired), "local"
+    param = ProviderParam(
+        sample_id=param.sample_id,
+        provider_model=param.provider_model,
+        prompt=CONVERT_TO_JSON_PROMPT,
+        context=answer,
+        seed=param.seed,
+        temperature=param.temperature,
+        top_p=param.top_p,
+        top_k=param.top_k,
+    )
+    provider_answers = await (units.run(provider, [param]) if units is not None else provider.run([param]))
+    answer = provider_answers[0].answer if provider_answers else ""
+    return answer, "llm"
+
+
+def _trim_to_object(answer: str) -> str:
+    answer = "{" + "".join(answer.split("{")[1:])
+    answer = "".join(answer.split("}")[:-1]) + "}"
+    return answer.replace("[", "'").replace("]", "'")
+
+
+def _parsed_fields(answer: str, keys: list[str]) -> dict[str, str]:
+    _, json_answer = parse_answer(answer, keys)
+    json_answer = json_answer or dict()
+    return {key: str(json_answer[key]) if json_answer.get(key) is not None else PLACE_HOLDER for key in keys}
+
+
+def _stage_prompt(chain: Chain, stage: ChainStage, results: dict[str, StageResult], keys: list[str]) -> str:
+    fields, source_answers, parsed = dict(), dict(), dict()
+    for placeholder, (source_stage, source_field) in stage.sources().items():
+        source_answer = results[source_stage].answer
+        source_answers[placeholder] = source_answer
+        if source_field is None:
+            fields[placeholder] = source_answer
+            continue
+        if source_stage not in parsed:
+            parsed[source_stage] = _parsed_fields(source_answer, keys)
+        fields[placeholder] = parsed[source_stage].get(source_field, PLACE_HOLDER)
+    for fixup in stage.fixups:
+        fields = FIXUPS[fixup](fields, source_answers, chain.taxonomy)
+    # the input stays a placeholder, providers fill it in when they build the question
+    return stage.template.format(**fields, input="{input}")
+
+
+def _stage_key(provider: BaseProvider, param: ProviderParam, stage: ChainStage, keys: list[str]) -> str:
+    return content_hash(json.dumps([unit_hash(provider, param), stage.transforms, stage.repair, keys]).encode())
+
+
+async def run_chain(
+    chain: Chain,
+    sample_id: int,
+    sample_input: str,
+    keys: list[str],
+    body: AIBaseBody,
+    provider: BaseProvider,
+    units: Optional[UnitCache] = None,
+    cache: Optional[TieredCache[StageResult]] = None,
+    trace_prefix: str = "chain",
+) -> dict[str, StageResult]:
+    """Run the stages of a chain for one sample, a stage whose inputs did not change is taken from the cache.
+
+    Only runs with temperature 0 use the cache. Sampled answers, including those of runs without a temperature that
+    sample at the provider default, are neither taken from nor put into it, a repeated run asks again.
+    """
+    if body.temperature != 0:
+        cache = None
+    results: dict[str, StageResult] = dict()
+    for stage in chain.stages:
+        prompt = stage.template
+        if stage.fields:
+            with start_span(f"{trace_prefix}.fixup", sample_id=sample_id, stage=stage.name):
+                prompt = _stage_prompt(chain, stage, results, keys)
+        param = ProviderParam(
+            sample_id=sample_id,
+            provider_model=body.provider_model,
+            prompt=prompt,
+            context=sample_input,
+            seed=body.seed,
+            temperature=body.temperature,
+            top_p=body.top_p,
+            top_k=body.top_k,
+        )
+        key = _stage_key(provider, param, stage, keys)
+        # the shared tier is a file, lookups stay off the event loop
+        result = await asyncio.to_thread(cache.get, key) if cache is not None else None
+        CHAIN_STAGES.inc(chain=chain.name, stage=stage.name, outcome="cached" if result is not None else "executed")
+        if result is None:
+            result, succeeded = await _run_stage(stage, param, keys, provider, units, trace_prefix)
+            if cache is not None and succeeded:
+                await asyncio.to_thread(cache.put, key, result)
+        results[stage.name] = result
+    return results
+
+
+async def _run_stage(
+    stage: ChainStage,
+    param: ProviderParam,
+    keys: list[str],
+    provider: BaseProvider,
+    units: Optional[UnitCache],
+    trace_prefix: str,
+) -> tuple[StageResult, bool]:
+    """Stage result and whether every provider call of the stage succeeded, failures are not cached."""
+    error_answer = provider.get_error_answer()
+    with start_span(f"{trace_prefix}.{stage.name}", sample_id=param.sample_id):
+        provider_answers = await (units.run(provider, [param]) if units is not None else provider.run([param]))
+        output = provider_answers[0].answer if provider_answers else ""
+        succeeded = not output.startswith(error_answer)
+        for transform in stage.transforms:
+            output = TRANSFORMS[transform](output)
+
+    answer = output
+    status, _ = parse_answer(answer, keys)
+    if stage.repair and status in (STATUS_NO_JSON, STATUS_MALFORMED):
+        with start_span(f"{trace_prefix}.{stage.name}.repair", sample_id=param.sample_id) as span:
+            answer, method = await convert_to_json(answer, keys, param, provider, units)
+            if method == "llm":
+                succeeded = succeeded and not answer.startswith(error_answer)
+                answer = _trim_to_object(answer)
+            outcome = repair_outcome(answer, keys)
+            span.set_attributes(method=method, outcome=outcome)
+            JSON_REPAIRS.inc(stage=stage.name, method=method, outcome=outcome)
+    return StageResult(output=output, answer=answer), succeeded
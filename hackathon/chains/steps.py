@@ -0,0 +1,51 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Final
+
+from hackathon.scoring.comparison import normalize_string_regex
+from hackathon.scoring.instruments import get_instrument_index
+from hackathon.scoring.sample import INSTRUMENT_TYPE_FIELD, PLACE_HOLDER
+
+# Fixups adjust the fields passed into a stage prompt, they get the fields, the raw answers the fields were parsed
+# from and the chain taxonomy
+Fixup = Callable[[dict[str, str], dict[str, str], str], dict[str, str]]
+# Transforms rewrite the raw answer of a stage before it is parsed
+Transform = Callable[[str], str]
+
+
+def fix_instrument_type(fields: dict[str, str], source_answers: dict[str, str], taxonomy: str) -> dict[str, str]:
+    """Map the instrument type onto the taxonomy, from a mention in the raw answer when it was not parsed."""
+    if INSTRUMENT_TYPE_FIELD not in fields:
+        return fields
+    fields = dict(fields)
+    instrument = normalize_string_regex.sub("", fields[INSTRUMENT_TYPE_FIELD].replace(" ", "").replace("-", ""))
+    instrument_index = get_instrument_index(taxonomy)
+    if instrument == PLACE_HOLDER:
+        mentioned = instrument_index.find_mentioned(source_answers[INSTRUMENT_TYPE_FIELD])
+        if mentioned is not None:
+            instrument = mentioned
+    if instrument not in instrument_index:
+        instrument = instrument_index.closest(instrument)
+    fields[INSTRUMENT_TYPE_FIELD] = instrument
+    return fields
+
+
+def zero_as_none(answer: str) -> str:
+    # models answer 0 for keys that do not apply
+    return answer.replace(": 0,", ': "None",')
+
+
+FIXUPS: Final[dict[str, Fixup]] = {"instrument_type": fix_instrument_type}
+TRANSFORMS: Final[dict[str, Transform]] = {"zero_as_none": zero_as_none}
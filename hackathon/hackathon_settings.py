@@ -13,22 +13,95 @@
 # limitations under the License.
 
 import os
+import re
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     allow_origins: list[str] = ["http://localhost:3000"]
     static_path: Path = Path(__file__).parents[1].joinpath("./wwwroot")
+    static_precompress: bool = os.getenv("STATIC_PRECOMPRESS", True)  # write missing variants during warm-up
+    response_compression: bool = os.getenv("RESPONSE_COMPRESSION", True)
+    compression_min_size: int = os.getenv("COMPRESSION_MIN_SIZE", 1024)  # bytes, smaller responses are sent as is
     prompts_path: Path = Path(__file__).parents[1].joinpath("./prompts")
     data_path: Path = Path(__file__).parents[1].joinpath("./data")
     results_path: Path = Path(data_path, "results.json")
+    instruments_path: Path = os.getenv("INSTRUMENTS_PATH", Path(data_path, "instruments.json"))
     log_level: str = os.getenv("LOG_LEVEL", "DEBUG")
     host: str = os.getenv("UVICORN_HOST", "localhost")
     port: int = os.getenv("UVICORN_PORT", 8000)
     workers: int = os.getenv("UVICORN_WORKERS", 1)
+    trace_exporter: str = os.getenv("TRACE_EXPORTER", "none")  # none, file or otlp
+    trace_file_path: Path = os.getenv("TRACE_FILE_PATH", Path(__file__).parents[1].joinpath("./traces/traces.jsonl"))
+    trace_otlp_endpoint: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318")
+    admin_api_key: Optional[str] = os.getenv("ADMIN_API_KEY")
+    profiles_path: Path = os.getenv("PROFILES_PATH", Path(__file__).parents[1].joinpath("./profiles"))
+    profile_interval: float = os.getenv("PROFILE_INTERVAL", 0.005)
+    background_profiler: bool = os.getenv("BACKGROUND_PROFILER", False)
+    background_profile_interval: float = os.getenv("BACKGROUND_PROFILE_INTERVAL", 0.05)
+    background_profile_window: int = os.getenv("BACKGROUND_PROFILE_WINDOW", 15)  # minutes
+    scoring_executor: str = os.getenv("SCORING_EXECUTOR", "thread")  # none, thread or process
+    scoring_workers: int = os.getenv("SCORING_WORKERS", 4)
+    scoring_chunk_size: int = os.getenv("SCORING_CHUNK_SIZE", 50)  # samples per executor task
+    archive_runs: bool = os.getenv("ARCHIVE_RUNS", True)
+    archive_path: Path = os.getenv("ARCHIVE_PATH", Path(__file__).parents[1].joinpath("./archive/runs.sqlite"))
+    # prompt chain stage results kept per worker, 0 disables, only runs with temperature 0 use it, /lbg/run never
+    chain_cache_size: int = os.getenv("CHAIN_CACHE_SIZE", 4096)
+    # none or sqlite, the sqlite tier shares cached stage results between workers and keeps them across restarts
+    cache_shared_backend: str = os.getenv("CACHE_SHARED_BACKEND", "none")
+    cache_shared_path: Path = os.getenv(
+        "CACHE_SHARED_PATH", Path(__file__).parents[1].joinpath("./cache/shared.sqlite")
+    )
+    cache_shared_max_mb: float = os.getenv("CACHE_SHARED_MAX_MB", 256)
+    jobs_path: Path = os.getenv("JOBS_PATH", Path(__file__).parents[1].joinpath("./jobs/jobs.sqlite"))
+    job_max_running: int = os.getenv("JOB_MAX_RUNNING", 2)  # scoring jobs running at once across all workers
+    job_poll_interval: float = os.getenv("JOB_POLL_INTERVAL", 1.0)  # seconds between progress reports
+    job_stale_after: float = os.getenv("JOB_STALE_AFTER", 30.0)  # seconds without progress before a job is failed
+    job_retention_days: float = os.getenv("JOB_RETENTION_DAYS", 7)
+    work_queue_backend: str = os.getenv("WORK_QUEUE_BACKEND", "none")  # none, sqlite or a "module:Class" path
+    work_queue_path: Path = os.getenv("WORK_QUEUE_PATH", Path(__file__).parents[1].joinpath("./queue/tasks.sqlite"))
+    work_queue_poll_interval: float = os.getenv("WORK_QUEUE_POLL_INTERVAL", 0.2)  # seconds
+    work_queue_lease: float = os.getenv("WORK_QUEUE_LEASE", 30.0)  # seconds a task stays claimed without renewal
+    work_queue_max_attempts: int = os.getenv("WORK_QUEUE_MAX_ATTEMPTS", 3)
+    worker_concurrency: int = os.getenv("WORKER_CONCURRENCY", 32)  # provider calls run at once by one worker
+    sweep_max_runs: int = os.getenv("SWEEP_MAX_RUNS", 64)  # combinations of one sweep request
+    # provider calls at once per sweep or batch run, PROVIDER_CONCURRENCY is a JSON object of provider -> calls
+    provider_concurrency: dict[str, int] = {"openai": 16, "replicate": 8, "fireworks": 16}
+    scheduler_capacity: int = os.getenv("SCHEDULER_CAPACITY", 64)  # provider calls in flight per worker, 0 turns off
+    scheduler_interactive_reserve: int = os.getenv("SCHEDULER_INTERACTIVE_RESERVE", 8)  # slots bulk calls never take
+    scheduler_tenant_max_in_flight: int = os.getenv("SCHEDULER_TENANT_MAX_IN_FLIGHT", 32)
+    # share per API key digest (metrics api_key label), 1 by default, SCHEDULER_TENANT_WEIGHTS is a JSON object of
+    # digest -> weight
+    scheduler_tenant_weights: dict[str, float] = {}
+    deadline_margin: float = os.getenv("DEADLINE_MARGIN", 0.5)  # seconds of a time budget kept to score the answers
+    warm_up: bool = os.getenv("WARM_UP", True)
+    warm_up_providers: list[str] = ["openai", "replicate", "fireworks"]  # provider SDKs imported during warm-up
+
+    @field_validator("work_queue_backend")
+    @classmethod
+    def _check_work_queue_backend(cls, value: str) -> str:
+        if value not in ("none", "sqlite") and not re.fullmatch(r"[\w.]+:\w+", value):
+            raise ValueError(f'WORK_QUEUE_BACKEND must be none, sqlite or a "module:Class" path, got {value!r}')
+        return value
+
+    @field_validator("provider_concurrency")
+    @classmethod
+    def _check_provider_concurrency(cls, value: dict[str, int]) -> dict[str, int]:
+        if any(calls < 1 for calls in value.values()):
+            raise ValueError(f"PROVIDER_CONCURRENCY allows at least 1 call per provider, got {value}")
+        return value
+
+    @field_validator("scheduler_tenant_weights")
+    @classmethod
+    def _check_scheduler_tenant_weights(cls, value: dict[str, float]) -> dict[str, float]:
+        if any(weight <= 0 for weight in value.values()):
+            raise ValueError(f"SCHEDULER_TENANT_WEIGHTS must be positive, got {value}")
+        return value
 
 
 @lru_cache
@@ -0,0 +1,145 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Response
+
+from hackathon.exception import AppException
+from hackathon.hackathon_settings import get_settings
+from hackathon.jobs.progress import JobProgress
+from hackathon.jobs.store import (
+    STATUS_CANCELLED,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    Job,
+    JobStore,
+)
+from hackathon.telemetry.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Runs the job and returns the response the synchronous endpoint would have returned, with its archived run id
+JobRunner = Callable[[JobProgress], Awaitable[tuple[Response, Optional[str]]]]
+
+JOBS = get_metrics_registry().counter("hackathon_jobs_total", "Scoring jobs by final status.")
+
+
+class JobManager:
+    """Runs submitted jobs as tasks of this worker, at most max_running jobs at a time across all workers.
+
+    A job waits in the queued state until the store grants it a slot, then reports its progress every poll_interval
+    seconds, which is also how a cancellation requested through another worker reaches it.
+    """
+
+    def __init__(self, store: JobStore, max_running: int, poll_interval: float = 1.0, stale_after: float = 30.0):
+        self.store = store
+        self.max_running = max_running
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._tasks: dict[str, asyncio.Task] = dict()
+
+    async def submit(self, job: Job, runner: JobRunner) -> Job:
+        await asyncio.to_thread(self.store.create, job)
+        task = asyncio.create_task(self._run(job.job_id, runner), name=f"job-{job.job_id}")
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.request_cancel, job_id)
+
+    async def _wait_for_slot(self, job_id: str) -> str:
+        while True:
+            status = await asyncio.to_thread(self.store.try_start, job_id, self.max_running, self.stale_after)
+            if status != STATUS_QUEUED:
+                return status
+            await asyncio.sleep(self.poll_interval)
+
+    async def _report(self, job_id: str, progress: JobProgress) -> bool:
+        """Write the progress of a running job, True when it should be cancelled."""
+        try:
+            await asyncio.to_thread(progress.score_pending)
+        except Exception:
+            logger.exception("Running score of job %s failed.", job_id)
+        return await asyncio.to_thread(
+            self.store.heartbeat, job_id, progress.samples_total, progress.samples_done, progress.running_score
+        )
+
+    async def _run(self, job_id: str, runner: JobRunner) -> None:
+        task: Optional[asyncio.Task] = None
+        try:
+            if await self._wait_for_slot(job_id) != STATUS_RUNNING:
+                return
+            progress = JobProgress()
+            task = asyncio.create_task(runner(progress))
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.poll_interval)
+                if not task.done() and await self._report(job_id, progress):
+                    task.cancel()
+            response, run_id = await task
+        except asyncio.CancelledError:
+            if task is None or not task.done():  # the worker shuts down and the job is lost with it
+                if task is not None:
+                    task.cancel()
+                self._finish(job_id, STATUS_FAILED, error="Worker shut down.")
+                raise
+            await asyncio.to_thread(self._finish, job_id, STATUS_CANCELLED)
+        except AppException as err:
+            await asyncio.to_thread(self._finish, job_id, STATUS_FAILED, error=str(err.detail))
+        except Exception as err:
+            logger.exception("Job %s failed.", job_id)
+            await asyncio.to_thread(self._finish, job_id, STATUS_FAILED, error=f"{type(err).__name__}: {err}")
+        else:
+            await self._report(job_id, progress)
+            await asyncio.to_thread(
+                self._finish,
+                job_id,
+                STATUS_SUCCEEDED,
+                run_id=run_id,
+                media_type=response.media_type,
+                result=bytes(response.body),
+            )
+
+    def _finish(self, job_id: str, status: str, **kwargs) -> None:
+        self.store.finish(job_id, status, **kwargs)
+        JOBS.inc(status=status)
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@lru_cache
+def get_job_manager() -> JobManager:
+    settings = get_settings()
+    return JobManager(
+        JobStore(settings.jobs_path),
+        max_running=settings.job_max_running,
+        poll_interval=settings.job_poll_interval,
+        stale_after=settings.job_stale_after,
+    )
+
+
+async def shutdown_job_manager() -> None:
+    """Fail the jobs running in this worker, they cannot outlive it."""
+    if get_job_manager.cache_info().currsize:
+        await get_job_manager().shutdown()
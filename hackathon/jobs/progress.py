@@ -0,0 +1,64 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from typing import Optional
+
+import pandas as pd
+
+from hackathon.providers.base_provider import ProviderAnswer
+from hackathon.scoring.engine import score_experiment
+
+
+class JobProgress:
+    """Samples answered by a running job and the average score over them.
+
+    Answers are only collected as they arrive, they are scored in batches when the job reports its progress, so the
+    event loop never scores a single sample on its own.
+    """
+
+    def __init__(self):
+        self.samples_total: Optional[int] = None
+        self.samples_done = 0
+        self._ground_truth: Optional[pd.DataFrame] = None
+        self._pending: dict[int, str] = dict()
+        self._score_sum = 0.0
+        self._scored = 0
+        self._lock = threading.Lock()
+
+    def start(self, samples_total: int, ground_truth: pd.DataFrame) -> None:
+        self.samples_total = samples_total
+        self._ground_truth = ground_truth
+
+    def sample_done(self, sample_id: int, answer: str) -> None:
+        with self._lock:
+            self.samples_done += 1
+            self._pending[sample_id] = answer
+
+    def answer_done(self, answer: ProviderAnswer) -> None:
+        self.sample_done(answer.sample_id, answer.answer)
+
+    @property
+    def running_score(self) -> Optional[float]:
+        return self._score_sum / self._scored if self._scored else None
+
+    def score_pending(self) -> None:
+        """Score the answers collected since the last call, blocking, meant for a worker thread."""
+        with self._lock:
+            pending, self._pending = self._pending, dict()
+        if not pending or self._ground_truth is None:
+            return
+        scores = score_experiment(pending, self._ground_truth)
+        self._score_sum += float(sum(scores.overall_scores))
+        self._scored += len(scores.sample_ids)
@@ -0,0 +1,294 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import sqlite3
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Final, Iterator, Optional
+
+STATUS_QUEUED: Final[str] = "queued"
+STATUS_RUNNING: Final[str] = "running"
+STATUS_SUCCEEDED: Final[str] = "succeeded"
+STATUS_FAILED: Final[str] = "failed"
+STATUS_CANCELLED: Final[str] = "cancelled"
+FINISHED_STATUSES: Final[tuple[str, ...]] = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    experiment_name TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    provider_model TEXT NOT NULL,
+    request TEXT NOT NULL,
+    samples_total INTEGER,
+    samples_done INTEGER NOT NULL DEFAULT 0,
+    running_score REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    run_id TEXT,
+    media_type TEXT,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+_COLUMN_NAMES: Final[tuple[str, ...]] = (
+    "job_id",
+    "kind",
+    "status",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "heartbeat_at",
+    "experiment_name",
+    "provider",
+    "provider_model",
+    "request",
+    "samples_total",
+    "samples_done",
+    "running_score",
+    "cancel_requested",
+    "error",
+    "run_id",
+)
+_COLUMNS: Final[str] = ", ".join(_COLUMN_NAMES)
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str  # the route that runs it, score or lbg.score
+    status: str
+    created_at: float
+    experiment_name: str
+    provider: str
+    provider_model: str
+    request: dict = field(default_factory=dict)  # body and query options, never the api key
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+    samples_total: Optional[int] = None
+    samples_done: int = 0
+    running_score: Optional[float] = None
+    cancel_requested: bool = False
+    error: Optional[str] = None
+    run_id: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__dataclass_fields__ if key != "request"}
+
+
+def new_job(kind: str, experiment_name: str, provider: str, provider_model: str, request: dict) -> Job:
+    return Job(
+        job_id=uuid.uuid4().hex,
+        kind=kind,
+        status=STATUS_QUEUED,
+        created_at=time.time(),
+        experiment_name=experiment_name,
+        provider=provider,
+        provider_model=provider_model,
+        request=request,
+    )
+
+
+def _to_job(row: tuple) -> Job:
+    values = dict(zip(_COLUMN_NAMES, row))
+    values["request"] = json.loads(values["request"])
+    values["cancel_requested"] = bool(values["cancel_requested"])
+    return Job(**values)
+
+
+class JobStore:
+    """Scoring jobs of every worker in one SQLite file, results stored compressed once a job succeeded.
+
+    Starting a job is a transaction that counts the running jobs of all workers, which is what caps the concurrency
+    server-wide, jobs start in the order they were submitted. A job whose heartbeat is older than stale_after lost its
+    worker and is failed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as connection:
+            # taking the write lock up front, so that two workers never both see a free slot
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def create(self, job: Job) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (job_id, kind, status, created_at, heartbeat_at, experiment_name, provider, "
+                "provider_model, request) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id,
+                    job.kind,
+                    job.status,
+                    job.created_at,
+                    job.created_at,
+                    job.experiment_name,
+                    job.provider,
+                    job.provider_model,
+                    json.dumps(job.request),
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as connection:
+            row = connection.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _to_job(row) if row is not None else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> list[Job]:
+        query, args = f"SELECT {_COLUMNS} FROM jobs", list()
+        if status is not None:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._connect() as connection:
+            rows = connection.execute(query, (*args, limit)).fetchall()
+        return [_to_job(row) for row in rows]
+
+    def _fail_stale(self, connection: sqlite3.Connection, stale_after: float, now: float) -> None:
+        connection.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE status IN (?, ?) AND heartbeat_at < ?",
+            (STATUS_FAILED, now, "Worker stopped responding.", STATUS_QUEUED, STATUS_RUNNING, now - stale_after),
+        )
+
+    def try_start(self, job_id: str, max_running: int, stale_after: float, now: Optional[float] = None) -> str:
+        """Status of the job after trying to start it, queued while the running and older queued jobs fill the slots.
+
+        now is the current time, the clock when None.
+        """
+        now = now if now is not None else time.time()
+        with self._transaction() as connection:
+            self._fail_stale(connection, stale_after, now)
+            row = connection.execute("SELECT status, created_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] != STATUS_QUEUED:
+                return row[0] if row is not None else STATUS_CANCELLED
+            (ahead,) = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? OR (status = ? AND (created_at, job_id) < (?, ?))",
+                (STATUS_RUNNING, STATUS_QUEUED, row[1], job_id),
+            ).fetchone()
+            if ahead >= max_running:
+                # a waiting job reports too, one left behind by a stopped worker must not hold up the queue
+                connection.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (now, job_id))
+                return STATUS_QUEUED
+            connection.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                (STATUS_RUNNING, now, now, job_id),
+            )
+            return STATUS_RUNNING
+
+    def heartbeat(
+        self, job_id: str, samples_total: Optional[int], samples_done: int, running_score: Optional[float]
+    ) -> bool:
+        """Record progress of a running job, True when its cancellation was requested."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET heartbeat_at = ?, samples_total = ?, samples_done = ?, running_score = ? "
+                "WHERE job_id = ? AND status = ?",
+                (time.time(), samples_total, samples_done, running_score, job_id, STATUS_RUNNING),
+            )
+            row = connection.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        error: Optional[str] = None,
+        run_id: Optional[str] = None,
+        media_type: Optional[str] = None,
+        result: Optional[bytes] = None,
+    ) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, run_id = ?, media_type = ?, result = ? "
+                "WHERE job_id = ? AND status IN (?, ?)",
+                (
+                    status,
+                    time.time(),
+                    error,
+                    run_id,
+                    media_type,
+                    zlib.compress(result, level=6) if result is not None else None,
+                    job_id,
+                    STATUS_QUEUED,
+                    STATUS_RUNNING,
+                ),
+            )
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        """A queued job is cancelled at once, a running one by its worker at the next heartbeat."""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED),
+            )
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?", (job_id, STATUS_RUNNING)
+            )
+        return self.get(job_id)
+
+    def get_result(self, job_id: str) -> Optional[tuple[str, bytes]]:
+        """Media type and body of the response of a succeeded job."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT media_type, result FROM jobs WHERE job_id = ? AND status = ?", (job_id, STATUS_SUCCEEDED)
+            ).fetchone()
+        if row is None or row[1] is None:
+            return None
+        return row[0], zlib.decompress(row[1])
+
+    def prune(self, older_than: float) -> int:
+        """Delete jobs finished before older_than (unix time), the number of deleted jobs."""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"DELETE FROM jobs WHERE finished_at < ? AND status IN ({', '.join('?' * len(FINISHED_STATUSES))})",
+                (older_than, *FINISHED_STATUSES),
+            )
+        return cursor.rowcount
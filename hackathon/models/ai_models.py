@@ -47,6 +47,11 @@ class AIModel(str, enum.Enum):
     GPT_4_TURBO = "gpt-4-1106-preview"
 
 
+class AIScoreFormat(str, enum.Enum):
+    FULL = "full"
+    COMPACT = "compact"
+
+
 class AIProvider(str, enum.Enum):
     def __new__(
         cls, name: str, models: list[str], available_params: list[AIModelParam]
@@ -109,6 +114,27 @@ class AIRunBody(AIBaseBody):
 class AIScoreBody(AIBaseBody):
     experiment_name: str = Field(description="Experiment name.")
     prompt: str = Field(description="AI request prompt.")
+    reference_run_id: Optional[str] = Field(
+        default=None, description="Archived run whose answers are reused for unchanged samples."
+    )
+
+
+class AISweepCandidate(BaseModel):
+    provider: AIProvider
+    provider_model: str = Field(description="Provider model.")
+
+
+class AISweepBody(BaseModel):
+    experiment_name: str = Field(description="Experiment name.")
+    prompt: str = Field(description="AI request prompt.")
+    candidates: list[AISweepCandidate] = Field(min_length=1, description="Provider models to compare.")
+    seed: list[Optional[int]] = Field(default=[None], min_length=1, description="Seeds to try.")
+    temperature: list[Optional[float]] = Field(default=[None], min_length=1, description="Temperatures to try.")
+    top_p: list[Optional[float]] = Field(default=[None], min_length=1, description="top_p values to try.")
+    top_k: list[Optional[int]] = Field(default=[None], min_length=1, description="top_k values to try.")
+    api_keys: dict[AIProvider, str] = Field(
+        default=dict(), description="Api key per provider, the api_key header is used for the others."
+    )
 
 
 class AISampleItem(BaseModel):
@@ -118,16 +144,71 @@ class AISampleItem(BaseModel):
     score: str
 
 
+class AIUsageItem(BaseModel):
+    calls: int = Field(description="Number of provider calls, including repair calls.")
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    estimated_cost: float = Field(description="Estimated cost in USD.")
+    provider_time_ms: Optional[float] = Field(default=None, description="Processing time reported by the provider.")
+    latency_ms: float = Field(description="Total wall time of provider calls.")
+
+
 class AIExperimentItem(BaseModel):
     overall_sample_score: str
     sample_id: int
     output: str
     sample_data: list[AISampleItem]
+    usage: Optional[AIUsageItem] = None
+    reused: bool = Field(default=False, description="Provider answers were reused from the reference run.")
+
+
+class AITraceStageItem(BaseModel):
+    name: str
+    count: int
+    errors: int
+    total_ms: float
+    max_ms: float
+
+
+class AITraceSummary(BaseModel):
+    trace_id: str
+    duration_ms: float
+    stages: list[AITraceStageItem]
 
 
 class AIScoreResponse(BaseModel):
-    overall_experiment_score: str
+    overall_experiment_score: str = Field(description="Average over the scored samples.")
     experiment_data: list[AIExperimentItem]
+    unscored_samples: int = Field(default=0, description="Samples left unscored when the time budget ran out.")
+    unscored_sample_ids: list[int] = Field(default_factory=list)
+    usage: Optional[AIUsageItem] = None
+    trace: Optional[AITraceSummary] = Field(default=None, description="Trace summary (when requested).")
+    run_id: Optional[str] = Field(default=None, description="Id of the archived run (when archiving is enabled).")
+
+
+class AIArchivedRunItem(BaseModel):
+    run_id: str
+    created_at: float = Field(description="Unix time of the run.")
+    route: str = Field(description="Endpoint that produced the run.")
+    experiment_name: str
+    provider: str
+    provider_model: str
+    params: dict = Field(description="Model parameters.")
+    prompt_hash: str
+    dataset_hash: str = Field(description="Hash of the experiment file the run was scored against.")
+    overall_score: Optional[float] = None
+    usage: Optional[dict] = None
+    timings: dict = Field(description="Milliseconds spent per stage.")
+
+
+class AIRescoreResponse(BaseModel):
+    run_id: str
+    experiment_name: str
+    archived_score: Optional[str] = Field(description="Score recorded when the run was archived.")
+    overall_experiment_score: str = Field(description="Score against the current scoring code and data.")
+    dataset_changed: bool = Field(description="Experiment file differs from the one the run was scored against.")
+    experiment_data: list[AIExperimentItem] = []
 
 
 class SampleInputResponse(BaseModel):
@@ -139,6 +220,8 @@ class AIRunResponse(BaseModel):
     overall_sample_score: str
     output: str = Field(description="AI response.")
     sample_data: list[AISampleItem]
+    usage: Optional[AIUsageItem] = None
+    trace: Optional[AITraceSummary] = Field(default=None, description="Trace summary (when requested).")
 
 
 class AIModelParamItem(BaseModel):
@@ -156,3 +239,68 @@ class AIExperimentInfoItem(BaseModel):
     experiment_name: str
     default_prompt: str
     default_table: list[AISampleItem]
+
+
+class WarmUpStepItem(BaseModel):
+    name: str
+    required: bool = Field(description="The worker is not ready while a required step failed.")
+    status: str = Field(description="pending, ok or failed.")
+    duration_ms: float
+    error: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    finished: bool = Field(description="Warm-up has finished, successfully or not.")
+    steps: list[WarmUpStepItem]
+
+
+class AIJobItem(BaseModel):
+    job_id: str
+    kind: str = Field(description="Endpoint that runs the job, score or lbg.score.")
+    status: str = Field(description="queued, running, succeeded, failed or cancelled.")
+    created_at: float = Field(description="Unix time of the submission.")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    heartbeat_at: Optional[float] = Field(default=None, description="Unix time of the last progress report.")
+    experiment_name: str
+    provider: str
+    provider_model: str
+    samples_total: Optional[int] = Field(default=None, description="Samples of the experiment, once the job started.")
+    samples_done: int = Field(description="Samples answered so far.")
+    running_score: Optional[float] = Field(default=None, description="Average score of the answered samples.")
+    cancel_requested: bool
+    error: Optional[str] = None
+    run_id: Optional[str] = Field(default=None, description="Id of the archived run (when archiving is enabled).")
+
+
+class AISweepRunItem(BaseModel):
+    provider: AIProvider
+    provider_model: str
+    seed: Optional[int] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    overall_experiment_score: float = Field(description="Average score of the samples in percent.")
+    field_scores: dict[str, float] = Field(description="Average score of every field in percent.")
+    usage: Optional[AIUsageItem] = None
+    run_id: Optional[str] = Field(default=None, description="Id of the archived run (when archiving is enabled).")
+
+
+class AISweepFailedRunItem(BaseModel):
+    provider: AIProvider
+    provider_model: str
+    seed: Optional[int] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    error: str
+
+
+class AISweepResponse(BaseModel):
+    experiment_name: str
+    fields: list[str]
+    runs: list[AISweepRunItem] = Field(description="Runs of every combination, best overall score first.")
+    failed_runs: list[AISweepFailedRunItem] = Field(
+        default_factory=list, description="Combinations whose run failed, the other runs are still ranked."
+    )
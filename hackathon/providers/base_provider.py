@@ -14,8 +14,22 @@
 
 import abc
 import asyncio
+import contextlib
+import time
 from dataclasses import dataclass
-from typing import Final, Optional
+from typing import Callable, Final, Optional
+
+from hackathon.providers.deadline import (
+    DEADLINE_EXCEEDED,
+    LATENCY_ESTIMATES,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+)
+from hackathon.providers.pricing import estimate_cost
+from hackathon.providers.scheduler import call_slot
+from hackathon.telemetry.tracing import STATUS_ERROR, start_span
+from hackathon.telemetry.usage import ProviderUsage, record_usage
 
 
 @dataclass
@@ -34,26 +48,92 @@ class ProviderParam:
 class ProviderAnswer:
     sample_id: int
     answer: str
+    usage: Optional[ProviderUsage] = None
+
+
+AnswerCallback = Callable[[ProviderAnswer], None]
 
 
 class BaseProvider(abc.ABC):
     RETRY_ATTEMPT: Final[int] = 3
+    PROVIDER_NAME: str = ""
 
     def __init__(self, api_key: str):
         self.api_key = api_key
+        # calls of providers sharing a limiter wait for a free slot, the wait is not part of their latency
+        self.limiter: Optional[asyncio.Semaphore] = None
 
     @abc.abstractmethod
     async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
         ...
 
-    async def run(self, params: list[ProviderParam]) -> list[ProviderAnswer]:
-        coroutines = [self.get_answer(param) for param in params]
+    async def run(
+        self, params: list[ProviderParam], on_answer: Optional[AnswerCallback] = None
+    ) -> list[ProviderAnswer]:
+        """Answers in the order of params, on_answer is called as each one arrives."""
+        coroutines = [self._get_traced_answer(param, on_answer) for param in params]
         if coroutines:
             results = await asyncio.gather(*coroutines)
         else:
             results = list()
         return results
 
+    async def _get_timed_answer(
+        self, param: ProviderParam, provider_name: str, deadline: Optional[Deadline]
+    ) -> ProviderAnswer:
+        limiter = self.limiter if self.limiter is not None else contextlib.nullcontext()
+        # the request's own limit comes first, no slot of the shared scheduler is held while waiting for it
+        async with limiter, call_slot():
+            if deadline is not None:
+                deadline.check_start(param.sample_id, LATENCY_ESTIMATES.estimate(provider_name, param.provider_model))
+            start_time = time.perf_counter()
+            provider_answer = await self.get_answer(param)
+            usage = provider_answer.usage if provider_answer.usage is not None else ProviderUsage()
+            usage.latency_ms = (time.perf_counter() - start_time) * 1000
+        LATENCY_ESTIMATES.update(provider_name, param.provider_model, usage.latency_ms / 1000)
+        provider_answer.usage = usage
+        return provider_answer
+
+    async def _get_traced_answer(
+        self, param: ProviderParam, on_answer: Optional[AnswerCallback] = None
+    ) -> ProviderAnswer:
+        provider_name = self.PROVIDER_NAME or type(self).__name__
+        deadline = current_deadline()
+        with start_span(
+            "provider.call", provider=provider_name, model=param.provider_model, sample_id=param.sample_id
+        ) as span:
+            if deadline is None:
+                provider_answer = await self._get_timed_answer(param, provider_name, None)
+            else:
+                try:
+                    deadline.check_start(param.sample_id, 0.0)
+                    provider_answer = await asyncio.wait_for(
+                        self._get_timed_answer(param, provider_name, deadline), deadline.remaining()
+                    )
+                except (DeadlineExceeded, asyncio.TimeoutError) as err:
+                    # the call never started or was cancelled, it has no usage and its sample is left unscored
+                    deadline.expire(param.sample_id, "skipped" if isinstance(err, DeadlineExceeded) else "cancelled")
+                    span.set_error(DEADLINE_EXCEEDED)
+                    span.set_attributes(outcome="deadline")
+                    return ProviderAnswer(sample_id=param.sample_id, answer=self.get_error_answer(DEADLINE_EXCEEDED))
+            usage = provider_answer.usage
+            usage.cost = estimate_cost(param.provider_model, usage.prompt_tokens, usage.completion_tokens)
+            if provider_answer.answer.startswith(self.get_error_answer()):
+                span.set_error(provider_answer.answer)
+            span.set_attributes(
+                outcome=span.status.lower(),
+                answer_chars=len(provider_answer.answer),
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                provider_time_ms=usage.provider_time_ms,
+                estimated_cost=usage.cost,
+            )
+        outcome = "error" if span.status == STATUS_ERROR else "ok"
+        record_usage(provider_name, self.api_key, param.provider_model, param.sample_id, outcome, usage)
+        if on_answer is not None:
+            on_answer(provider_answer)
+        return provider_answer
+
     @staticmethod
     def get_error_answer(msg: str = "") -> str:
         return f"An error has occurred: {msg}"
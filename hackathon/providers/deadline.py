@@ -0,0 +1,99 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Final, Iterator, Optional
+
+from hackathon.telemetry.metrics import get_metrics_registry
+
+DEADLINE_EXCEEDED: Final[str] = "deadline exceeded"
+
+DEADLINE_CALLS = get_metrics_registry().counter(
+    "hackathon_deadline_calls_total", "Provider calls of requests with a time budget that were skipped or cancelled."
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class LatencyEstimates:
+    """Moving average of the call latency per provider model, to tell whether a call can still finish in time."""
+
+    # Weight of the latest call in the average
+    SMOOTHING: Final[float] = 0.2
+
+    def __init__(self):
+        self._seconds: dict[tuple[str, str], float] = dict()
+        self._lock = threading.Lock()
+
+    def update(self, provider_name: str, provider_model: str, seconds: float) -> None:
+        key = (provider_name, provider_model)
+        with self._lock:
+            previous = self._seconds.get(key)
+            self._seconds[key] = seconds if previous is None else previous + self.SMOOTHING * (seconds - previous)
+
+    def estimate(self, provider_name: str, provider_model: str) -> float:
+        # a model without calls yet is expected to be quick, it is cancelled at the deadline otherwise
+        return self._seconds.get((provider_name, provider_model), 0.0)
+
+
+LATENCY_ESTIMATES = LatencyEstimates()
+
+
+class Deadline:
+    """Time budget shared by every provider call of a request and the samples whose calls ran out of it."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.unfinished: set[int] = set()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check_start(self, sample_id: int, expected_seconds: float) -> None:
+        """Raise DeadlineExceeded for a call that cannot finish in time or whose sample is already unfinished."""
+        if sample_id in self.unfinished or self.remaining() <= expected_seconds:
+            raise DeadlineExceeded
+
+    def expire(self, sample_id: int, outcome: str) -> None:
+        self.unfinished.add(sample_id)
+        DEADLINE_CALLS.inc(outcome=outcome)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+@contextlib.contextmanager
+def start_deadline(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Provider calls made inside share the time budget, no budget when seconds is None."""
+    deadline = Deadline(seconds) if seconds is not None else None
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def unscored_samples() -> list[int]:
+    """Samples of the current request whose calls ran out of its time budget."""
+    deadline = _current_deadline.get()
+    return sorted(deadline.unfinished) if deadline is not None else list()
@@ -19,16 +19,24 @@ from fireworks.client.error import FireworksError
 from tenacity import retry, stop_after_attempt
 
 from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.usage import ProviderUsage
 
 
 class FireworksProvider(BaseProvider):
     REQUEST_TIMEOUT: Final[int] = 60
+    PROVIDER_NAME = "fireworks"
 
     async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
         fireworks.client.api_key = self.api_key
+        usage = None
         try:
             response = await self._fireworks_create(param)
             answer = response.choices[0].text
+            if response.usage is not None:
+                usage = ProviderUsage(
+                    prompt_tokens=response.usage.prompt_tokens,
+                    completion_tokens=response.usage.completion_tokens or 0,
+                )
         except FireworksError as err:
             try:
                 answer = self.get_error_answer(err.args[0]["fault"]["faultstring"])
@@ -37,7 +45,7 @@ class FireworksProvider(BaseProvider):
         except:
             answer = self.get_error_answer("Fireworks is not available for now. Please try again later.")
 
-        return ProviderAnswer(sample_id=param.sample_id, answer=answer)
+        return ProviderAnswer(sample_id=param.sample_id, answer=answer, usage=usage)
 
     @retry(reraise=True, stop=stop_after_attempt(BaseProvider.RETRY_ATTEMPT))
     async def _fireworks_create(self, param: ProviderParam):
@@ -12,16 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import lru_cache
+from importlib import import_module
+from typing import Final
+
+from hackathon.hackathon_settings import get_settings
 from hackathon.models.ai_models import AIProvider
 from hackathon.providers.base_provider import BaseProvider
-from hackathon.providers.fireworks_provider import FireworksProvider
-from hackathon.providers.openai_provider import OpenAIProvider
-from hackathon.providers.replicate_provider import ReplicateProvider
+
+# Provider modules pull in their SDKs, a module is only imported when its provider is first used or warmed up
+PROVIDER_CLASSES: Final[dict[AIProvider, str]] = {
+    AIProvider.REPLICATE: "hackathon.providers.replicate_provider:ReplicateProvider",
+    AIProvider.FIREWORKS: "hackathon.providers.fireworks_provider:FireworksProvider",
+    AIProvider.OPENAI: "hackathon.providers.openai_provider:OpenAIProvider",
+}
+DEFAULT_PROVIDER_CONCURRENCY: Final[int] = 8
+
+
+@lru_cache
+def get_provider_class(ai_provider: AIProvider) -> type[BaseProvider]:
+    module_name, class_name = PROVIDER_CLASSES[ai_provider].split(":")
+    return getattr(import_module(module_name), class_name)
 
 
 def get_provider(ai_provider: AIProvider, api_key: str) -> BaseProvider:
-    return {
-        AIProvider.REPLICATE: ReplicateProvider,
-        AIProvider.FIREWORKS: FireworksProvider,
-        AIProvider.OPENAI: OpenAIProvider,
-    }[ai_provider](api_key)
+    return get_provider_class(ai_provider)(api_key)
+
+
+def get_provider_concurrency(ai_provider: AIProvider) -> int:
+    """Calls to the provider run at once by one sweep or batch run."""
+    return get_settings().provider_concurrency.get(ai_provider.value, DEFAULT_PROVIDER_CONCURRENCY)
@@ -12,34 +12,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Final
+from typing import Final, Optional
 
 import aiohttp
 import openai
 from openai import OpenAIError
 from tenacity import retry, stop_after_attempt
 
-from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.providers.base_provider import AnswerCallback, BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.usage import ProviderUsage
 
 
 class OpenAIProvider(BaseProvider):
     REQUEST_TIMEOUT: Final[int] = 60
+    PROVIDER_NAME = "openai"
 
-    async def run(self, params: list[ProviderParam]) -> list[ProviderAnswer]:
+    async def run(
+        self, params: list[ProviderParam], on_answer: Optional[AnswerCallback] = None
+    ) -> list[ProviderAnswer]:
         async with aiohttp.ClientSession() as session:
             openai.aiosession.set(session)
             openai.api_key = self.api_key
-            return await super().run(params)
+            return await super().run(params, on_answer)
 
     async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        usage = None
         try:
             response = await self._openai_create(param)
             answer = response["choices"][0]["message"]["content"]
+            response_usage = response.get("usage") or {}
+            usage = ProviderUsage(
+                prompt_tokens=response_usage.get("prompt_tokens", 0),
+                completion_tokens=response_usage.get("completion_tokens", 0),
+                provider_time_ms=response.response_ms,
+            )
         except OpenAIError as err:
             answer = self.get_error_answer(str(err))
         except:
             answer = self.get_error_answer("OpenAI is not available for now. Please try again later.")
-        return ProviderAnswer(sample_id=param.sample_id, answer=answer)
+        return ProviderAnswer(sample_id=param.sample_id, answer=answer, usage=usage)
 
     @retry(reraise=True, stop=stop_after_attempt(BaseProvider.RETRY_ATTEMPT))
     async def _openai_create(self, param: ProviderParam):
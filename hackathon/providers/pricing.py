@@ -0,0 +1,35 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Final
+
+from hackathon.models.ai_models import AIModel
+
+# Estimated list prices in USD per million tokens as (prompt, completion), used for budgeting only
+MODEL_PRICES: Final[dict[str, tuple[float, float]]] = {
+    AIModel.GPT_3_5_TURBO: (1.0, 2.0),
+    AIModel.GPT_4: (30.0, 60.0),
+    AIModel.GPT_4_TURBO: (10.0, 30.0),
+    AIModel.LLAMA_V2_70B_CHAT: (0.9, 0.9),
+    AIModel.LLAMA_V2_34B_CODE_INSTRUCT: (0.9, 0.9),
+    AIModel.LLAMA_V2_13B_CHAT: (0.2, 0.2),
+    AIModel.LLAMA_V2_7B_CHAT: (0.2, 0.2),
+    AIModel.LLAMA_2_70B_CHAT: (0.65, 2.75),
+    AIModel.LLAMA_2_13B_CHAT: (0.1, 0.5),
+}
+
+
+def estimate_cost(provider_model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(provider_model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
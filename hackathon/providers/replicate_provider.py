@@ -12,18 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from typing import Final
 
 import httpx
 import replicate
-from replicate.exceptions import ReplicateException
+from replicate.exceptions import ModelError, ReplicateException
 from tenacity import retry, stop_after_attempt
 
 from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.usage import ProviderUsage
 
 
 class ReplicateProvider(BaseProvider):
     REQUEST_TIMEOUT: Final[int] = 90
+    PROVIDER_NAME = "replicate"
+    FINAL_STATUSES: Final[tuple[str, ...]] = ("succeeded", "failed", "canceled")
     MODEL_TOKEN_DICT: Final[dict] = {
         "llama-2-7b-chat": "13c3cdee13ee059ab779f0291d29054dab00a47dad8261375654de5540165fb0",
         "llama-2-13b-chat": "f4e2de70d66816a838a89eeeb621910adffb0dd0baba3976c96980970978018d",
@@ -38,21 +42,29 @@ class ReplicateProvider(BaseProvider):
         )
 
     async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        usage = None
         try:
-            output = await self._replicate_run(param)
-            answer = "".join(output)
+            prediction = await self._replicate_run(param)
+            answer = "".join(prediction.output or [])
+            metrics = prediction.metrics or {}
+            usage = ProviderUsage(
+                prompt_tokens=metrics.get("input_token_count", 0),
+                completion_tokens=metrics.get("output_token_count", 0),
+                provider_time_ms=metrics["predict_time"] * 1000 if "predict_time" in metrics else None,
+            )
         except ReplicateException as err:
             answer = self.get_error_answer(str(err))
         except:
             answer = self.get_error_answer("Replicate is not available for now. Please try again later.")
-        return ProviderAnswer(sample_id=param.sample_id, answer=answer)
+        return ProviderAnswer(sample_id=param.sample_id, answer=answer, usage=usage)
 
     @retry(reraise=True, stop=stop_after_attempt(BaseProvider.RETRY_ATTEMPT))
     async def _replicate_run(self, param: ProviderParam):
+        # Polls the prediction directly instead of using async_run, which hides the prediction metrics
         question = self.build_question(prompt=param.prompt, context=param.context)
         formatted_question = self.add_llama_formatting(question)
-        return await self.replicate_client.async_run(
-            f"meta/{param.provider_model}:{self.MODEL_TOKEN_DICT[param.provider_model]}",
+        prediction = await self.replicate_client.predictions.async_create(
+            version=self.MODEL_TOKEN_DICT[param.provider_model],
             input={
                 "prompt": formatted_question,
                 "seed": param.seed,
@@ -62,3 +74,10 @@ class ReplicateProvider(BaseProvider):
                 "max_new_tokens": 512
             },
         )
+        while prediction.status not in self.FINAL_STATUSES:
+            await asyncio.sleep(self.replicate_client.poll_interval)
+            prediction = await self.replicate_client.predictions.async_get(prediction.id)
+        # a canceled prediction has no complete output either, it is not an empty answer
+        if prediction.status != "succeeded":
+            raise ModelError(prediction.error or f"Prediction {prediction.status}.")
+        return prediction
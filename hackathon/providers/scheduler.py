@@ -0,0 +1,226 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextlib
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncContextManager, AsyncIterator, Final, Iterator, Optional
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.telemetry.metrics import Labels, get_metrics_registry
+from hackathon.telemetry.usage import api_key_label
+
+LANE_INTERACTIVE: Final[str] = "interactive"
+LANE_BULK: Final[str] = "bulk"
+LANES: Final[tuple[str, ...]] = (LANE_INTERACTIVE, LANE_BULK)
+
+SCHEDULER_CALLS = get_metrics_registry().counter(
+    "hackathon_scheduler_calls_total", "Provider calls started by the scheduler, by lane and tenant."
+)
+SCHEDULER_WAIT = get_metrics_registry().counter(
+    "hackathon_scheduler_wait_seconds_total", "Time provider calls waited for a scheduler slot."
+)
+SCHEDULER_QUEUED = get_metrics_registry().gauge(
+    "hackathon_scheduler_queued", "Provider calls waiting for a scheduler slot."
+)
+SCHEDULER_IN_FLIGHT = get_metrics_registry().gauge(
+    "hackathon_scheduler_in_flight", "Provider calls holding a scheduler slot."
+)
+
+
+@dataclass
+class _Waiter:
+    tag: float
+    future: asyncio.Future
+
+
+class FairScheduler:
+    """Provider call slots of this worker, shared by the tenants with weighted fair queueing.
+
+    Interactive calls start before any bulk call and have interactive_reserve slots that bulk calls never take, so a
+    single sample run does not wait behind the scoring runs of other tenants. Within a lane tenants get slots in
+    proportion to their weight (start time fair queueing) and no tenant holds more than tenant_max_in_flight slots.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        interactive_reserve: int = 0,
+        tenant_max_in_flight: Optional[int] = None,
+        weights: Optional[dict[str, float]] = None,
+    ):
+        self.capacity = capacity
+        self.bulk_capacity = max(capacity - interactive_reserve, 1)
+        self.tenant_max_in_flight = tenant_max_in_flight or capacity
+        self.weights = weights or dict()
+        self._queues: dict[str, dict[str, deque[_Waiter]]] = {lane: dict() for lane in LANES}
+        self._virtual_times = {lane: 0.0 for lane in LANES}
+        self._finish_tags: dict[tuple[str, str], float] = dict()
+        self._in_flight: dict[tuple[str, str], int] = defaultdict(int)
+        self._lane_in_flight = {lane: 0 for lane in LANES}
+        self._tenant_in_flight: dict[str, int] = defaultdict(int)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant: str, lane: str) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        await self._acquire(tenant, lane)
+        SCHEDULER_WAIT.inc(time.perf_counter() - started, lane=lane, tenant=tenant)
+        SCHEDULER_CALLS.inc(lane=lane, tenant=tenant)
+        try:
+            yield
+        finally:
+            self._release(tenant, lane)
+
+    async def _acquire(self, tenant: str, lane: str) -> None:
+        # the start tag of a call is where the previous call of its tenant finishes, in units of 1 / weight
+        key = (lane, tenant)
+        tag = max(self._virtual_times[lane], self._finish_tags.get(key, 0.0))
+        self._finish_tags[key] = tag + 1.0 / self.weights.get(tenant, 1.0)
+        waiter = _Waiter(tag=tag, future=asyncio.get_running_loop().create_future())
+        self._queues[lane].setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # the slot was given to a call that was cancelled before it could start
+                self._release(tenant, lane)
+            else:
+                self._remove(tenant, lane, waiter)
+            raise
+
+    def _eligible(self, tenant: str, lane: str) -> bool:
+        if self._tenant_in_flight.get(tenant, 0) >= self.tenant_max_in_flight:
+            return False
+        if sum(self._lane_in_flight.values()) >= self.capacity:
+            return False
+        return lane == LANE_INTERACTIVE or self._lane_in_flight[LANE_BULK] < self.bulk_capacity
+
+    def _next(self, lane: str) -> Optional[str]:
+        tags = [(queue[0].tag, tenant) for tenant, queue in self._queues[lane].items() if self._eligible(tenant, lane)]
+        return min(tags)[1] if tags else None
+
+    def _dispatch(self) -> None:
+        while True:
+            for lane in LANES:
+                tenant = self._next(lane)
+                if tenant is not None:
+                    break
+            else:
+                return
+            waiter = self._queues[lane][tenant].popleft()
+            if not self._queues[lane][tenant]:
+                del self._queues[lane][tenant]
+            if waiter.future.done():
+                continue
+            self._virtual_times[lane] = waiter.tag
+            self._in_flight[(lane, tenant)] += 1
+            self._lane_in_flight[lane] += 1
+            self._tenant_in_flight[tenant] += 1
+            waiter.future.set_result(None)
+
+    def _remove(self, tenant: str, lane: str, waiter: _Waiter) -> None:
+        queue = self._queues[lane].get(tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[lane][tenant]
+
+    def _release(self, tenant: str, lane: str) -> None:
+        self._in_flight[(lane, tenant)] -= 1
+        if not self._in_flight[(lane, tenant)]:
+            del self._in_flight[(lane, tenant)]
+        self._lane_in_flight[lane] -= 1
+        self._tenant_in_flight[tenant] -= 1
+        if not self._tenant_in_flight[tenant]:
+            del self._tenant_in_flight[tenant]
+        self._dispatch()
+
+    # read by metrics scrapes from other threads, the dicts are copied in one step before iterating
+    def queued(self) -> dict[tuple[str, str], int]:
+        return {(lane, tenant): len(queue) for lane in LANES for tenant, queue in list(self._queues[lane].items())}
+
+    def in_flight(self) -> dict[tuple[str, str], int]:
+        return dict(self._in_flight)
+
+    def stats(self) -> list[dict]:
+        queued, in_flight = self.queued(), self.in_flight()
+        return [
+            dict(
+                lane=lane,
+                tenant=tenant,
+                queued=queued.get((lane, tenant), 0),
+                in_flight=in_flight.get((lane, tenant), 0),
+                weight=self.weights.get(tenant, 1.0),
+            )
+            for lane, tenant in sorted(set(queued) | set(in_flight))
+        ]
+
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_loop: Optional[asyncio.AbstractEventLoop] = None
+_current_tenant: ContextVar[Optional[tuple[str, str]]] = ContextVar("current_tenant", default=None)
+
+
+def get_scheduler() -> Optional[FairScheduler]:
+    """Scheduler of the running event loop, None when scheduling is turned off."""
+    global _scheduler, _scheduler_loop
+    settings = get_settings()
+    if settings.scheduler_capacity <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = FairScheduler(
+            settings.scheduler_capacity,
+            settings.scheduler_interactive_reserve,
+            settings.scheduler_tenant_max_in_flight,
+            settings.scheduler_tenant_weights,
+        )
+        _scheduler_loop = loop
+    return _scheduler
+
+
+def scheduler_stats() -> list[dict]:
+    return _scheduler.stats() if _scheduler is not None else list()
+
+
+@contextlib.contextmanager
+def start_scheduling(api_key: Optional[str], lane: str) -> Iterator[None]:
+    """Provider calls made inside are scheduled in the lane, as calls of the tenant the API key belongs to."""
+    token = _current_tenant.set((api_key_label(api_key), lane))
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def call_slot() -> AsyncContextManager:
+    """Slot for a provider call, calls made outside of start_scheduling (workers, batch runs) are not scheduled."""
+    current = _current_tenant.get()
+    scheduler = get_scheduler() if current is not None else None
+    if scheduler is None:
+        return contextlib.nullcontext()
+    tenant, lane = current
+    return scheduler.slot(tenant, lane)
+
+
+def _gauge_samples(values: dict[tuple[str, str], int]) -> dict[Labels, float]:
+    return {(("lane", lane), ("tenant", tenant)): float(count) for (lane, tenant), count in values.items()}
+
+
+SCHEDULER_QUEUED.add_callback(lambda: _gauge_samples(_scheduler.queued()) if _scheduler is not None else dict())
+SCHEDULER_IN_FLIGHT.add_callback(lambda: _gauge_samples(_scheduler.in_flight()) if _scheduler is not None else dict())
@@ -0,0 +1,92 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from typing import Any, Final, List
+
+import pandas as pd
+
+NONE_FIELDS: Final[List[str]] = [
+    "None",
+    "Null",
+    "NaN",
+    "Empty",
+    "Unknown",
+    "Undefined",
+    "Not Defined",
+    "Unspecified",
+    "Not Specified",
+]
+
+normalize_string_regex = re.compile(r"[\s\-_d]+")
+
+
+def compare_as_strings(model_value: Any, correct_value: Any) -> bool:
+    try:
+        model_value = str(model_value).strip().lower()
+        correct_value = str(correct_value).strip().lower()
+        model_value = normalize_string_regex.sub("", model_value)
+        correct_value = normalize_string_regex.sub("", correct_value)
+        return model_value == correct_value
+    except:
+        return False
+
+
+def compare_as_booleans(model_value: Any, correct_value: Any) -> bool:
+    try:
+        model_value = bool(model_value)
+        correct_value = bool(correct_value)
+        return model_value == correct_value
+    except:
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
+
+
+def compare_as_floats(model_value: Any, correct_value: Any) -> bool:
+    try:
+        model_value = round(float(model_value), 5)
+        correct_value = round(float(correct_value), 5)
+        return model_value == correct_value
+    except:
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
+
+
+def compare_as_integers(model_value: Any, correct_value: Any) -> bool:
+    try:
+        model_value = int(model_value)
+        correct_value = int(correct_value)
+        return model_value == correct_value
+    except:
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
+
+
+def compare_as_nan(model_value: Any, correct_value: Any) -> bool:
+    return is_nan(model_value) and is_nan(correct_value)
+
+
+def is_nan(value: Any):
+    # Looks for basic NaN values and then proceed with specific ones
+    return pd.isna(value) or (isinstance(value, str) and value in NONE_FIELDS)
+
+
+def soft_comparison(model_value: Any, correct_value: Any) -> bool:
+    if is_nan(correct_value) or is_nan(model_value):
+        return compare_as_nan(model_value=model_value, correct_value=correct_value)
+    if pd.api.types.is_integer(correct_value):
+        return compare_as_integers(model_value=model_value, correct_value=correct_value)
+    elif pd.api.types.is_float(correct_value):
+        return compare_as_floats(model_value=model_value, correct_value=correct_value)
+    elif pd.api.types.is_bool(correct_value):
+        return compare_as_booleans(model_value=model_value, correct_value=correct_value)
+    else:
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
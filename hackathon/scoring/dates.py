@@ -0,0 +1,111 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import calendar
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Final, Optional
+
+from dateutil.parser import parse
+
+from hackathon.scoring.comparison import NONE_FIELDS, compare_as_strings
+
+DATE_CACHE_SIZE: Final[int] = 4096
+
+# English names as dateutil knows them, independent of the locale
+MONTH_NAMES: Final[list[str]] = [
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+]
+MONTHS: Final[dict[str, int]] = {
+    **{name: month for month, name in enumerate(MONTH_NAMES, start=1)},
+    **{name[:3]: month for month, name in enumerate(MONTH_NAMES, start=1)},
+    "sept": 9,
+}
+
+iso_date_regex = re.compile(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?)?", re.ASCII)
+numeric_date_regex = re.compile(r"(\d{1,2})([/.-])(\d{1,2})\2(\d{4})", re.ASCII)
+day_month_regex = re.compile(r"(\d{1,2})[ -]([A-Za-z]+)[ -](\d{4})", re.ASCII)
+month_day_regex = re.compile(r"([A-Za-z]+) (\d{1,2}),? (\d{4})", re.ASCII)
+
+_NOT_DATES: Final[frozenset[str]] = frozenset(NONE_FIELDS)
+
+
+def _to_datetime(
+    year: int, month: int, day: int, hour: int = 0, minute: int = 0, second: int = 0
+) -> Optional[datetime]:
+    # Only unambiguous, valid values take the fast path, anything else is left to dateutil
+    if year < 1 or not 1 <= month <= 12 or not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return None
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return datetime(year, month, day, hour, minute, second)
+
+
+def _parse_fast(value: str) -> Optional[datetime]:
+    if match := iso_date_regex.fullmatch(value):
+        year, month, day, hour, minute, second = match.groups()
+        return _to_datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    if match := numeric_date_regex.fullmatch(value):
+        first, _, second, year = match.groups()
+        # dateutil reads month first unless the first number cannot be a month
+        if int(first) <= 12:
+            return _to_datetime(int(year), int(first), int(second))
+        if int(second) <= 12:
+            return _to_datetime(int(year), int(second), int(first))
+        return None
+    if match := day_month_regex.fullmatch(value):
+        day, month, year = match.groups()
+        return _to_datetime(int(year), MONTHS[month.lower()], int(day)) if month.lower() in MONTHS else None
+    if match := month_day_regex.fullmatch(value):
+        month, day, year = match.groups()
+        return _to_datetime(int(year), MONTHS[month.lower()], int(day)) if month.lower() in MONTHS else None
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_cached(value: str, today: date) -> Optional[datetime]:
+    # dateutil fills missing parts from today, so cached results are only valid for the day they were parsed
+    try:
+        return parse(value)
+    except Exception:
+        return None
+
+
+def parse_date(value: str) -> Optional[datetime]:
+    """Parse a date the way dateutil does, returning None where dateutil would raise."""
+    if value in _NOT_DATES:
+        return None
+    return _parse_fast(value) or _parse_cached(value, date.today())
+
+
+def compare_as_dates(model_value: Any, correct_value: Any) -> bool:
+    model_value = str(model_value)
+    correct_value = str(correct_value)
+    model_date = parse_date(model_value)
+    correct_date = parse_date(correct_value)
+    if model_date is None or correct_date is None:
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
+    return model_date == correct_date
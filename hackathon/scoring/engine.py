@@ -0,0 +1,409 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dataclasses import dataclass
+from typing import Any, Callable, Final, Optional
+
+import numpy as np
+import pandas as pd
+
+from hackathon.models.ai_models import AIExperimentItem, AISampleItem
+from hackathon.scoring.comparison import NONE_FIELDS, normalize_string_regex, soft_comparison
+from hackathon.scoring.dates import parse_date
+from hackathon.scoring.sample import (
+    ADDITIONAL_FIELDS,
+    DATE_FIELD_END_WITH,
+    INPUT_FIELD,
+    INSTRUMENT_TYPE_FIELD,
+    PLACE_HOLDER,
+    STATUS_ERROR,
+    STATUS_MALFORMED,
+    STATUS_MISMATCH,
+    STATUS_NO_JSON,
+    STATUS_SCORED,
+    parse_answer,
+)
+
+# Value kinds that decide which comparator soft_comparison picks, anything else goes through the scalar path
+KIND_OTHER: Final[int] = 0
+KIND_NONE: Final[int] = 1
+KIND_STR: Final[int] = 2
+KIND_BOOL: Final[int] = 3
+KIND_INT: Final[int] = 4
+KIND_FLOAT: Final[int] = 5
+VALUE_KINDS: Final[dict[type, int]] = {
+    type(None): KIND_NONE,
+    str: KIND_STR,
+    bool: KIND_BOOL,
+    np.bool_: KIND_BOOL,
+    int: KIND_INT,
+    np.int8: KIND_INT,
+    np.int16: KIND_INT,
+    np.int32: KIND_INT,
+    np.int64: KIND_INT,
+    np.uint8: KIND_INT,
+    np.uint16: KIND_INT,
+    np.uint32: KIND_INT,
+    np.uint64: KIND_INT,
+    float: KIND_FLOAT,
+    np.float16: KIND_FLOAT,
+    np.float32: KIND_FLOAT,
+    np.float64: KIND_FLOAT,
+}
+
+_FAILED = object()
+
+
+class _Missing:
+    # Marks an absent instrument type, pickled by reference so that identity survives worker processes
+    def __reduce__(self) -> str:
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+@dataclass
+class ExperimentScores:
+    sample_ids: list[int]
+    fields: list[str]  # ground truth column order
+    scored_fields: list[str]  # order used for answers that were scored or mismatched
+    statuses: list[str]
+    scores: np.ndarray  # sample x field score in percent, NaN when the sample was not scored
+    model_values: np.ndarray  # sample x field values as returned by the model, None when absent
+    correct_values: np.ndarray  # sample x field ground truth values
+    overall_scores: np.ndarray  # per sample score in percent
+
+    @classmethod
+    def concat(cls, parts: list["ExperimentScores"]) -> "ExperimentScores":
+        return cls(
+            sample_ids=[sample_id for part in parts for sample_id in part.sample_ids],
+            fields=parts[0].fields,
+            scored_fields=parts[0].scored_fields,
+            statuses=[status for part in parts for status in part.statuses],
+            scores=np.concatenate([part.scores for part in parts]),
+            model_values=np.concatenate([part.model_values for part in parts]),
+            correct_values=np.concatenate([part.correct_values for part in parts]),
+            overall_scores=np.concatenate([part.overall_scores for part in parts]),
+        )
+
+    @property
+    def average_score(self) -> float:
+        if not self.sample_ids:
+            return 0.0
+        overall_experiment_score = 0.0
+        for overall_sample_score in self.overall_scores:
+            overall_experiment_score += float(overall_sample_score)
+        return overall_experiment_score / len(self.sample_ids)
+
+    def field_scores(self) -> dict[str, float]:
+        """Share of the samples in percent whose field matched, a sample whose field was not scored counts as 0."""
+        if not self.sample_ids:
+            return {field: 0.0 for field in self.fields}
+        # a matching field adds 100 / len(fields) to its sample score
+        averages = np.nan_to_num(self.scores, nan=0.0).mean(axis=0) * len(self.fields)
+        return {field: float(score) for field, score in zip(self.fields, averages)}
+
+    def sample_items(self, row: int) -> list[AISampleItem]:
+        status = self.statuses[row]
+        correct = {field: str(value) for field, value in zip(self.fields, self.correct_values[row])}
+        if status == STATUS_ERROR:
+            return [
+                AISampleItem(field=f, model="Error", correct=correct[f], score="Not Scored - Error")
+                for f in self.fields
+            ]
+        if status == STATUS_NO_JSON:
+            return [AISampleItem(field=f, model=PLACE_HOLDER, correct=correct[f], score="0%") for f in self.fields]
+        if status == STATUS_MALFORMED:
+            return [
+                AISampleItem(field=f, model="Malformed JSON", correct=correct[f], score="No score - malformed JSON")
+                for f in self.fields
+            ]
+
+        field_index = {field: index for index, field in enumerate(self.fields)}
+        sample_items = list()
+        for field in self.scored_fields:
+            model_value = self.model_values[row, field_index[field]]
+            if field == INSTRUMENT_TYPE_FIELD:
+                model = str(model_value) if model_value is not _MISSING else "Not found in response"
+            else:
+                model = str(model_value) if model_value is not None else PLACE_HOLDER
+            if status == STATUS_SCORED:
+                score = str(round(float(self.scores[row, field_index[field]]), 2)) + "%"
+            elif field == INSTRUMENT_TYPE_FIELD:
+                score = "No score - mismatch"
+            else:
+                score = "Instrument type mismatch"
+            sample_items.append(AISampleItem(field=field, model=model, correct=correct[field], score=score))
+        return sample_items
+
+    def experiment_items(
+        self, outputs: dict[int, str], usages: Optional[dict[int, Any]] = None
+    ) -> list[AIExperimentItem]:
+        usages = usages or dict()
+        return [
+            AIExperimentItem(
+                overall_sample_score=str(round(float(self.overall_scores[row]), 2)) + "%",
+                sample_id=sample_id,
+                output=outputs[sample_id],
+                sample_data=self.sample_items(row),
+                usage=usages.get(sample_id),
+            )
+            for row, sample_id in enumerate(self.sample_ids)
+        ]
+
+    def columns(self, outputs: Optional[dict[int, str]] = None) -> dict[str, Any]:
+        """Columnar form of the scores: numeric scores, one field header and sample x field matrices.
+
+        Scores of fields that were not scored are None, absent model values are None and values are strings
+        as in the per sample items. Raw outputs are included only when given.
+        """
+        scores = np.where(np.isnan(self.scores), None, self.scores)
+        model_values = [
+            [str(value) if value is not None and value is not _MISSING else None for value in row]
+            for row in self.model_values.tolist()
+        ]
+        columns = dict(
+            fields=self.fields,
+            sample_ids=self.sample_ids,
+            statuses=self.statuses,
+            overall_sample_scores=self.overall_scores.tolist(),
+            scores=scores.tolist(),
+            model_values=model_values,
+            correct_values=[[str(value) for value in row] for row in self.correct_values.tolist()],
+        )
+        if outputs is not None:
+            columns["outputs"] = [outputs[sample_id] for sample_id in self.sample_ids]
+        return columns
+
+
+@dataclass
+class ScoringInput:
+    # Compact, picklable form of an experiment: only the answered rows and the scored columns
+    sample_ids: list[int]
+    answers: list[str]
+    fields: list[str]
+    scored_fields: list[str]
+    correct_values: np.ndarray
+
+    def split(self, chunk_size: int) -> list["ScoringInput"]:
+        return [
+            ScoringInput(
+                sample_ids=self.sample_ids[start : start + chunk_size],
+                answers=self.answers[start : start + chunk_size],
+                fields=self.fields,
+                scored_fields=self.scored_fields,
+                correct_values=self.correct_values[start : start + chunk_size],
+            )
+            for start in range(0, len(self.sample_ids), chunk_size)
+        ]
+
+
+def prepare_experiment(answers: dict[int, str], ground_truth: pd.DataFrame) -> ScoringInput:
+    # Sample ids are one-based row positions of the ground truth, samples without an answer are skipped
+    rows = [index for index in range(len(ground_truth)) if index + 1 in answers]
+    sample_ids = [row + 1 for row in rows]
+    positions = [
+        position
+        for position, column in enumerate(ground_truth.columns)
+        if column not in ADDITIONAL_FIELDS and column != INPUT_FIELD
+    ]
+    fields = [ground_truth.columns[position] for position in positions]
+    instrument_fields = [INSTRUMENT_TYPE_FIELD] if INSTRUMENT_TYPE_FIELD in fields else list()
+    # Rows come from the whole frame, as iterrows does, so that values keep the types the scalar path sees
+    return ScoringInput(
+        sample_ids=sample_ids,
+        answers=[answers[sample_id] for sample_id in sample_ids],
+        fields=fields,
+        scored_fields=instrument_fields + list(set(fields) - {INSTRUMENT_TYPE_FIELD}),
+        correct_values=ground_truth.values[rows][:, positions].astype(object),
+    )
+
+
+def score_experiment(answers: dict[int, str], ground_truth: pd.DataFrame) -> ExperimentScores:
+    return score_rows(prepare_experiment(answers, ground_truth))
+
+
+def score_rows(scoring_input: ScoringInput) -> ExperimentScores:
+    sample_ids, fields, correct_values = scoring_input.sample_ids, scoring_input.fields, scoring_input.correct_values
+    rows = range(len(sample_ids))
+
+    statuses = list()
+    model_values = np.full((len(rows), len(fields)), None, dtype=object)
+    # ground truth without an instrument type has no gate, every parsed sample is scored field by field
+    instrument_column = fields.index(INSTRUMENT_TYPE_FIELD) if INSTRUMENT_TYPE_FIELD in fields else None
+    for row, answer in enumerate(scoring_input.answers):
+        status, json_answer = parse_answer(answer, fields)
+        statuses.append(status)
+        if json_answer is not None:
+            model_values[row] = [json_answer.get(field) for field in fields]
+            if instrument_column is not None and INSTRUMENT_TYPE_FIELD not in json_answer:
+                model_values[row, instrument_column] = _MISSING
+    parsed = np.array([status == STATUS_SCORED for status in statuses], dtype=bool)
+
+    matches = np.zeros((len(rows), len(fields)), dtype=bool)
+    if instrument_column is None:
+        instrument_match = parsed
+    else:
+        # A sample is scored only when its instrument type matches, otherwise every field is a mismatch
+        instrument_values = model_values[:, instrument_column]
+        instrument_present = parsed & np.array([value is not _MISSING for value in instrument_values], dtype=bool)
+        instrument_match = np.zeros(len(rows), dtype=bool)
+        instrument_match[instrument_present] = _compare_strings(
+            instrument_values[instrument_present], correct_values[instrument_present, instrument_column]
+        )
+        for row in np.flatnonzero(parsed & ~instrument_match):
+            statuses[row] = STATUS_MISMATCH
+        matches[:, instrument_column] = instrument_match
+    for column, field in enumerate(fields):
+        if field == INSTRUMENT_TYPE_FIELD or not instrument_match.any():
+            continue
+        compare = _compare_dates if field.endswith(DATE_FIELD_END_WITH) else _compare_soft
+        matches[instrument_match, column] = compare(
+            model_values[instrument_match, column], correct_values[instrument_match, column]
+        )
+
+    max_item_score = 1 / len(fields)
+    scores = np.where(matches, 100 * max_item_score, 0.0)
+    scores[~instrument_match] = np.nan
+    # Repeated addition keeps totals bit-identical to the per-field accumulation of the scalar path
+    totals_by_count = [0.0]
+    for _ in fields:
+        totals_by_count.append(totals_by_count[-1] + max_item_score)
+    overall_scores = np.array([totals_by_count[count] * 100 for count in matches.sum(axis=1)], dtype=float)
+    overall_scores[~instrument_match] = 0.0
+
+    return ExperimentScores(
+        sample_ids=sample_ids,
+        fields=fields,
+        scored_fields=scoring_input.scored_fields,
+        statuses=statuses,
+        scores=scores,
+        model_values=model_values,
+        correct_values=correct_values,
+        overall_scores=overall_scores,
+    )
+
+
+def _cache_key(value: Any) -> Optional[tuple]:
+    # Keys keep True, 1 and 1.0 (and 0.0, -0.0) apart, other types are converted without caching
+    value_type = type(value)
+    if value_type is str or value_type is int or value_type is bool:
+        return value_type, value
+    if value_type is float:
+        return value_type, value.hex()
+    return None
+
+
+def _map_unique(values: np.ndarray, func: Callable[[Any], Any]) -> np.ndarray:
+    # Applies an exact scalar conversion once per distinct value
+    cache: dict = dict()
+    result = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        key = _cache_key(value)
+        if key is None:
+            result[index] = func(value)
+            continue
+        converted = cache.get(key, _FAILED)
+        if converted is _FAILED:
+            converted = cache[key] = func(value)
+        result[index] = converted
+    return result
+
+
+def _kinds(values: np.ndarray) -> np.ndarray:
+    return pd.Series(values, dtype=object).map(type).map(VALUE_KINDS).fillna(KIND_OTHER).to_numpy(dtype=int)
+
+
+def _nan_mask(values: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    mask = pd.Series(values, dtype=object).isna().to_numpy() & (kinds != KIND_OTHER)
+    strings = kinds == KIND_STR
+    mask[strings] |= pd.Series(values[strings], dtype=object).isin(NONE_FIELDS).to_numpy()
+    return mask
+
+
+def _normalize_strings(values: np.ndarray) -> np.ndarray:
+    normalized = pd.Series(_map_unique(values, str), dtype=object).str.strip().str.lower()
+    return normalized.str.replace(normalize_string_regex, "", regex=True).to_numpy(dtype=object)
+
+
+def _compare_strings(model_values: np.ndarray, correct_values: np.ndarray) -> np.ndarray:
+    if len(model_values) == 0:
+        return np.zeros(0, dtype=bool)
+    return _normalize_strings(model_values) == _normalize_strings(correct_values)
+
+
+def _try(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def converter(value: Any) -> Any:
+        try:
+            return func(value)
+        except Exception:
+            return _FAILED
+
+    return converter
+
+
+_to_int = _try(int)
+_to_float = _try(lambda value: round(float(value), 5))
+
+
+def _to_date(value: str) -> Any:
+    parsed = parse_date(value)
+    return parsed if parsed is not None else _FAILED
+
+
+def _compare_converted(
+    model_values: np.ndarray, correct_values: np.ndarray, convert: Callable[[Any], Any]
+) -> np.ndarray:
+    # Equal when both conversions succeed, otherwise the comparators fall back to string comparison
+    model_converted = _map_unique(model_values, convert)
+    correct_converted = _map_unique(correct_values, convert)
+    converted = np.array(
+        [m is not _FAILED and c is not _FAILED for m, c in zip(model_converted, correct_converted)], dtype=bool
+    )
+    result = np.zeros(len(model_values), dtype=bool)
+    result[converted] = (model_converted[converted] == correct_converted[converted]).astype(bool)
+    result[~converted] = _compare_strings(model_values[~converted], correct_values[~converted])
+    return result
+
+
+def _compare_dates(model_values: np.ndarray, correct_values: np.ndarray) -> np.ndarray:
+    model_strings = _map_unique(model_values, str)
+    correct_strings = _map_unique(correct_values, str)
+    return _compare_converted(model_strings, correct_strings, _to_date)
+
+
+def _compare_soft(model_values: np.ndarray, correct_values: np.ndarray) -> np.ndarray:
+    model_kinds = _kinds(model_values)
+    correct_kinds = _kinds(correct_values)
+    result = np.zeros(len(model_values), dtype=bool)
+
+    # Containers and unusual types keep the scalar comparator, including its exceptions
+    other = (model_kinds == KIND_OTHER) | (correct_kinds == KIND_OTHER)
+    for index in np.flatnonzero(other):
+        result[index] = soft_comparison(model_value=model_values[index], correct_value=correct_values[index])
+
+    model_nan = _nan_mask(model_values, model_kinds)
+    correct_nan = _nan_mask(correct_values, correct_kinds)
+    either_nan = ~other & (model_nan | correct_nan)
+    result[either_nan] = model_nan[either_nan] & correct_nan[either_nan]
+
+    remaining = ~other & ~either_nan
+    for kind, convert in ((KIND_INT, _to_int), (KIND_FLOAT, _to_float), (KIND_BOOL, bool)):
+        mask = remaining & (correct_kinds == kind)
+        if mask.any():
+            result[mask] = _compare_converted(model_values[mask], correct_values[mask], convert)
+    mask = remaining & ~np.isin(correct_kinds, [KIND_INT, KIND_FLOAT, KIND_BOOL])
+    result[mask] = _compare_strings(model_values[mask], correct_values[mask])
+    return result
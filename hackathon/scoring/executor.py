@@ -0,0 +1,94 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Optional
+
+import pandas as pd
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIExperimentItem
+from hackathon.scoring.engine import ExperimentScores, ScoringInput, prepare_experiment, score_rows
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_scoring_executor() -> Optional[Executor]:
+    global _executor
+    settings = get_settings()
+    if settings.scoring_executor == "none":
+        return None
+    with _executor_lock:
+        if _executor is None:
+            if settings.scoring_executor == "process":
+                _executor = ProcessPoolExecutor(max_workers=settings.scoring_workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=settings.scoring_workers, thread_name_prefix="scoring")
+        return _executor
+
+
+def shutdown_scoring_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _score_chunk(
+    scoring_input: ScoringInput, outputs: dict[int, str], usages: dict[int, Any], items: bool = True
+) -> tuple[ExperimentScores, list[AIExperimentItem]]:
+    scores = score_rows(scoring_input)
+    return scores, scores.experiment_items(outputs=outputs, usages=usages) if items else list()
+
+
+async def score_answers(
+    answers: dict[int, str],
+    ground_truth: pd.DataFrame,
+    outputs: Optional[dict[int, str]] = None,
+    usages: Optional[dict[int, Any]] = None,
+    items: bool = True,
+) -> tuple[ExperimentScores, list[AIExperimentItem]]:
+    """Score an experiment off the event loop, in chunks spread over the scoring executor.
+
+    With items False only the scores are returned, for responses built from the columnar form.
+    """
+    outputs = outputs if outputs is not None else answers
+    usages = usages or dict()
+    scoring_input = prepare_experiment(answers, ground_truth)
+    executor = get_scoring_executor()
+    chunks = scoring_input.split(get_settings().scoring_chunk_size)
+    if executor is None or not chunks:
+        return _score_chunk(scoring_input, outputs, usages, items)
+
+    # Each task only carries the outputs and usages of its own samples
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                executor,
+                _score_chunk,
+                chunk,
+                {sample_id: outputs[sample_id] for sample_id in chunk.sample_ids},
+                {sample_id: usages[sample_id] for sample_id in chunk.sample_ids if sample_id in usages},
+                items,
+            )
+            for chunk in chunks
+        ]
+    )
+    scores = ExperimentScores.concat([chunk_scores for chunk_scores, _ in results])
+    return scores, [item for _, chunk_items in results for item in chunk_items]
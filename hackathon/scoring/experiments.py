@@ -0,0 +1,37 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from pathlib import Path
+from typing import Final, Union
+
+import pandas as pd
+
+from hackathon.cache.tiered import get_cache
+
+EXPERIMENT_CACHE_SIZE: Final[int] = 64
+
+
+def read_experiment(path: Union[str, Path]) -> pd.DataFrame:
+    """Experiment file parsed once per version of the file, callers get their own copy."""
+    stat = os.stat(path)
+    # parsing a small file costs less than moving the frame between workers, the cache stays in-process
+    cache = get_cache("experiments", EXPERIMENT_CACHE_SIZE)
+    key = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    experiment = cache.get(key)
+    if experiment is None:
+        experiment = pd.read_csv(path, header=0)
+        cache.put(key, experiment)
+    return experiment.copy()
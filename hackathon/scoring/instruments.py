@@ -0,0 +1,174 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from collections import Counter, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Final, Iterator, Optional
+
+import Levenshtein
+import numpy as np
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.scoring.comparison import normalize_string_regex
+
+CLOSEST_CACHE_SIZE: Final[int] = 4096
+# Slack on the ratio bound so that float rounding can only make the search look at more candidates
+_BOUND_EPSILON: Final[float] = 1e-9
+
+
+@dataclass(frozen=True)
+class InstrumentMention:
+    start: int
+    end: int
+    instrument: str
+
+
+class InstrumentScanner:
+    """Aho-Corasick automaton over the instrument names, every mention is found in one pass over the text."""
+
+    def __init__(self, instruments: list[str]):
+        self._goto: list[dict[str, int]] = [dict()]
+        self._outputs: list[tuple[str, ...]] = [tuple()]
+        for instrument in dict.fromkeys(instruments):
+            state = 0
+            for char in instrument:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = self._goto[state][char] = len(self._goto)
+                    self._goto.append(dict())
+                    self._outputs.append(tuple())
+                state = next_state
+            self._outputs[state] += (instrument,)
+
+        # Failure links point to the longest proper suffix that is also a prefix, built breadth first
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+
+    def scan(self, text: str) -> Iterator[InstrumentMention]:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for instrument in outputs[state]:
+                yield InstrumentMention(start=position + 1 - len(instrument), end=position + 1, instrument=instrument)
+
+
+def select_mentioned_instrument(mentions: list[InstrumentMention]) -> Optional[str]:
+    """Most mentioned instrument, mentions inside a longer mention do not count, the earliest one wins ties."""
+    counted = [
+        mention
+        for mention in mentions
+        if not any(
+            other.start <= mention.start
+            and mention.end <= other.end
+            and other.end - other.start > len(mention.instrument)
+            for other in mentions
+        )
+    ]
+    if not counted:
+        return None
+    counts = Counter(mention.instrument for mention in counted)
+    first_starts: dict[str, int] = dict()
+    for mention in counted:
+        first_starts.setdefault(mention.instrument, mention.start)
+    return min(counts, key=lambda instrument: (-counts[instrument], first_starts[instrument]))
+
+
+class InstrumentIndex:
+    """Instrument vocabulary of one taxonomy, indexed for closest match by Levenshtein ratio.
+
+    The ratio is the normalized indel similarity, 1 - distance / (len(a) + len(b)). The indel distance is at least the
+    difference of the character counts of both strings, which bounds the ratio of every instrument from one vector
+    operation, so only the few instruments whose bound reaches the best ratio found so far are compared exactly.
+    """
+
+    def __init__(self, instruments: list[str]):
+        if not instruments:
+            raise ValueError("Instrument vocabulary is empty.")
+        self.instruments = list(instruments)
+        self._members = frozenset(self.instruments)
+        self._alphabet = {char: index for index, char in enumerate(sorted(set("".join(self.instruments))))}
+        # alphabet x instrument, so that the bound sums run over contiguous rows
+        self._counts = np.zeros((len(self._alphabet), len(self.instruments)), dtype=np.int16)
+        for column, instrument in enumerate(self.instruments):
+            for char in instrument:
+                self._counts[self._alphabet[char], column] += 1
+        self._lengths = np.array([len(instrument) for instrument in self.instruments], dtype=np.int64)
+        self.closest = lru_cache(maxsize=CLOSEST_CACHE_SIZE)(self._closest)
+        self._scanner = InstrumentScanner(self.instruments)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._members
+
+    def mentions(self, text: str) -> list[InstrumentMention]:
+        """Every instrument name in an already normalized text, overlapping mentions included."""
+        return list(self._scanner.scan(text))
+
+    def find_mentioned(self, raw_answer: str) -> Optional[str]:
+        return select_mentioned_instrument(self.mentions(normalize_string_regex.sub("", raw_answer)))
+
+    def _closest(self, value: str) -> str:
+        """Instrument with the highest Levenshtein ratio to value, the first one in vocabulary order on ties."""
+        known = [index for index in map(self._alphabet.get, value) if index is not None]
+        query = np.bincount(known, minlength=len(self._alphabet)).astype(self._counts.dtype)
+        length_sums = self._lengths + len(value)
+        # characters outside the vocabulary alphabet always need a deletion
+        distance_bounds = np.abs(self._counts - query[:, None]).sum(axis=0, dtype=np.int64) + (len(value) - len(known))
+        ratio_bounds = (length_sums - distance_bounds) / length_sums
+
+        # The instrument with the best bound seeds the search, only instruments whose bound reaches it are compared
+        best_index = int(np.argmax(ratio_bounds))
+        best_ratio = Levenshtein.ratio(value, self.instruments[best_index])
+        for index in np.flatnonzero(ratio_bounds >= best_ratio - _BOUND_EPSILON):
+            ratio = Levenshtein.ratio(value, self.instruments[index])
+            if ratio > best_ratio or (ratio == best_ratio and index < best_index):
+                best_index, best_ratio = index, ratio
+        return self.instruments[best_index]
+
+
+def load_instrument_indexes(path: Path) -> dict[str, InstrumentIndex]:
+    """Taxonomies from a JSON object of instrument lists, names normalized as the scoring compares them."""
+    with open(path) as f:
+        taxonomies = json.load(f)
+    return {
+        name: InstrumentIndex([normalize_string_regex.sub("", instrument) for instrument in instruments])
+        for name, instruments in taxonomies.items()
+    }
+
+
+@lru_cache
+def _instrument_indexes(path: Path) -> dict[str, InstrumentIndex]:
+    return load_instrument_indexes(path)
+
+
+def get_instrument_indexes() -> dict[str, InstrumentIndex]:
+    return _instrument_indexes(Path(get_settings().instruments_path))
+
+
+def get_instrument_index(name: str) -> InstrumentIndex:
+    return get_instrument_indexes()[name]
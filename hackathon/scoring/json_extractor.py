@@ -0,0 +1,85 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+from typing import Iterable, Optional
+
+structural_regex = re.compile(r'[{}"\\]')
+code_fence_regex = re.compile(r"```[\w-]*[ \t]*\n(.*?)```", re.DOTALL)
+
+
+def find_object_spans(text: str) -> list[tuple[int, int]]:
+    """Return (start, end) of every balanced {...} in the text, outermost first, in a single scan."""
+    spans = list()
+    open_braces = list()
+    in_string = False
+    escaped_position = -1
+    # Only braces, quotes and backslashes matter, so the scan jumps between them
+    for match in structural_regex.finditer(text):
+        position = match.start()
+        char = match.group()
+        if position == escaped_position:
+            continue
+        if in_string:
+            if char == "\\":
+                escaped_position = position + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            # Quotes in prose outside of any object do not start a string
+            in_string = bool(open_braces)
+        elif char == "{":
+            open_braces.append(position)
+        elif char == "}" and open_braces:
+            spans.append((open_braces.pop(), position + 1))
+    spans.sort(key=lambda span: (span[0], -span[1]))
+    return spans
+
+
+def extract_json_candidates(text: str) -> list[tuple[int, dict]]:
+    # Objects nested in an accepted candidate are part of it, stray braces around them are skipped
+    candidates = list()
+    accepted_end = -1
+    for start, end in find_object_spans(text):
+        if start < accepted_end:
+            continue
+        try:
+            candidate = json.loads(text[start:end])
+        except (ValueError, RecursionError):
+            continue
+        candidates.append((start, candidate))
+        accepted_end = end
+    return candidates
+
+
+def extract_json(answer: str, keys: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    Extract the JSON object of a model answer, None when no object can be parsed.
+
+    When the answer holds several objects, the one sharing most keys with the expected ones wins,
+    ties go to objects inside markdown code fences and then to the first one.
+    """
+    candidates = extract_json_candidates(answer)
+    if not candidates:
+        return None
+    keys = set(keys) if keys is not None else set()
+    fences = [match.span(1) for match in code_fence_regex.finditer(answer)] if "```" in answer else []
+
+    def rank(item: tuple[int, int, dict]) -> tuple:
+        order, start, candidate = item
+        in_fence = any(fence_start <= start < fence_end for fence_start, fence_end in fences)
+        return -len(keys.intersection(candidate.keys())), not in_fence, order
+
+    return min(((order, start, candidate) for order, (start, candidate) in enumerate(candidates)), key=rank)[2]
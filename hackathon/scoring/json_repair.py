@@ -0,0 +1,188 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+from typing import Final, Iterable, Optional
+
+from hackathon.telemetry.metrics import get_metrics_registry
+
+JSON_REPAIRS = get_metrics_registry().counter(
+    "hackathon_json_repairs_total", "Answers converted to JSON by repair method and outcome."
+)
+
+MAX_REPAIR_STARTS: Final[int] = 8
+LITERALS: Final[dict[str, str]] = {
+    "None": "null",
+    "null": "null",
+    "Null": "null",
+    "True": "true",
+    "true": "true",
+    "False": "false",
+    "false": "false",
+}
+
+json_number_regex = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+key_value_line_regex = re.compile(r"""^\s*(?:[-*•]\s*)?["']?([A-Za-z_][\w .]*?)["']?\s*[:=]\s*(.*?)\s*,?\s*$""")
+
+
+def _decode_string(raw: str, quote: str) -> str:
+    if quote == "'":
+        raw = re.sub(r'(?<!\\)"', '\\"', raw.replace("\\'", "'"))
+    try:
+        return json.loads(f'"{raw}"', strict=False)
+    except ValueError:
+        return raw
+
+
+def _read_string(text: str, start: int) -> tuple[int, str]:
+    # Unterminated strings run to the end of the text, as in a truncated answer
+    quote = text[start]
+    position = start + 1
+    while position < len(text):
+        if text[position] == "\\":
+            position += 2
+            continue
+        if text[position] == quote:
+            return position + 1, _decode_string(text[start + 1 : position], quote)
+        position += 1
+    return len(text), _decode_string(text[start + 1 :], quote)
+
+
+def _bare_value(raw: str) -> str:
+    if raw in LITERALS:
+        return LITERALS[raw]
+    if json_number_regex.fullmatch(raw):
+        return raw
+    return json.dumps(raw)
+
+
+def _starts_comment(text: str, position: int) -> bool:
+    # Inside bare values only a comment marker after whitespace counts, so that URLs and "No. #3" survive
+    return text[position - 1].isspace() and (text.startswith("//", position) or text[position] == "#")
+
+
+def _drop_trailing_comma(tokens: list[str]) -> None:
+    if tokens and tokens[-1] == ",":
+        tokens.pop()
+
+
+def _repair_object(text: str) -> Optional[dict]:
+    """Re-emit the object starting at text[0] as strict JSON, closing whatever a truncated answer left open."""
+    tokens: list[str] = list()
+    closers: list[str] = list()
+    expect_key = False
+    pending_key = -1  # index of a key that has not received its value yet
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if char.isspace():
+            position += 1
+        elif text.startswith("//", position) or char == "#":
+            end = text.find("\n", position)
+            position = len(text) if end == -1 else end
+        elif text.startswith("/*", position):
+            end = text.find("*/", position + 2)
+            position = len(text) if end == -1 else end + 2
+        elif char in "{[":
+            if tokens and tokens[-1] not in ("{", "[", ",", ":"):
+                tokens.append(",")
+            closers.append("}" if char == "{" else "]")
+            tokens.append(char)
+            pending_key = -1
+            expect_key = char == "{"
+            position += 1
+        elif char in "}]":
+            if pending_key != -1:
+                del tokens[pending_key:]
+                pending_key = -1
+            _drop_trailing_comma(tokens)
+            tokens.append(closers.pop())
+            expect_key = False
+            position += 1
+            if not closers:
+                break
+        elif char == ",":
+            if tokens[-1] not in ("{", "[", ","):
+                tokens.append(",")
+            expect_key = closers[-1] == "}"
+            position += 1
+        elif char in ":=":
+            tokens.append(":")
+            expect_key = False
+            position += 1
+        else:
+            # Values without a separating comma start a new member, as in one key per line
+            if tokens[-1] not in ("{", "[", ",", ":"):
+                tokens.append(",")
+                expect_key = closers[-1] == "}"
+            if char in "\"'":
+                position, value = _read_string(text, position)
+                token = json.dumps(value)
+            else:
+                stops = ":=,{}[]\n" if expect_key else ",}]\n"
+                end = position
+                while end < len(text) and text[end] not in stops and not _starts_comment(text, end):
+                    end += 1
+                raw = text[position:end].strip()
+                position = end
+                token = json.dumps(raw) if expect_key else _bare_value(raw)
+            if expect_key:
+                pending_key = len(tokens)
+            elif tokens[-1] == ":":
+                pending_key = -1
+            tokens.append(token)
+            expect_key = False
+
+    if pending_key != -1:
+        del tokens[pending_key:]
+    _drop_trailing_comma(tokens)
+    tokens.extend(reversed(closers))
+    try:
+        repaired = json.loads("".join(tokens), strict=False)
+    except (ValueError, RecursionError):
+        return None
+    return repaired if isinstance(repaired, dict) and repaired else None
+
+
+def _repair_key_value_lines(text: str, keys: set[str]) -> Optional[dict]:
+    repaired = dict()
+    for line in text.splitlines():
+        if match := key_value_line_regex.match(line):
+            key, raw = match.groups()
+            if len(raw) > 1 and raw[0] == raw[-1] and raw[0] in "\"'":
+                repaired[key] = _decode_string(raw[1:-1], raw[0])
+            else:
+                repaired[key] = json.loads(_bare_value(raw))
+    matched = keys.intersection(repaired.keys()) if keys else repaired.keys()
+    return repaired if len(matched) >= (1 if keys else 2) else None
+
+
+def repair_json(text: str, keys: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    Repair a model answer into a JSON object without calling a model, None when nothing usable is found.
+
+    Handles single quotes, trailing commas, unquoted keys and values, Python literals, comments,
+    truncated objects and plain key: value lines. Among several objects the best key overlap wins.
+    """
+    keys = set(keys) if keys is not None else set()
+    candidates = list()
+    start = text.find("{")
+    while start != -1 and len(candidates) < MAX_REPAIR_STARTS:
+        if (candidate := _repair_object(text[start:])) is not None:
+            candidates.append(candidate)
+        start = text.find("{", start + 1)
+    if not candidates:
+        return _repair_key_value_lines(text, keys)
+    return max(candidates, key=lambda candidate: len(keys.intersection(candidate.keys())))
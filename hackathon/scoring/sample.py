@@ -0,0 +1,140 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Final, Iterable, Optional
+
+from hackathon.models.ai_models import AISampleItem
+from hackathon.providers.base_provider import BaseProvider
+from hackathon.scoring.comparison import compare_as_strings, soft_comparison
+from hackathon.scoring.dates import compare_as_dates
+from hackathon.scoring.json_extractor import extract_json
+
+INSTRUMENT_TYPE_FIELD: Final[str] = "InstrumentType"
+PLACE_HOLDER: Final[str] = "None"
+INPUT_FIELD: Final[str] = "Input"
+DATE_FIELD_END_WITH: Final[str] = "Date"
+ADDITIONAL_FIELDS: Final[list[str]] = ["ID"]
+
+STATUS_SCORED: Final[str] = "scored"
+STATUS_MISMATCH: Final[str] = "mismatch"
+STATUS_ERROR: Final[str] = "error"
+STATUS_NO_JSON: Final[str] = "no_json"
+STATUS_MALFORMED: Final[str] = "malformed"
+
+
+def parse_answer(answer: str, keys: Optional[Iterable[str]] = None) -> tuple[str, Optional[dict]]:
+    if answer and answer.startswith(BaseProvider.get_error_answer()):
+        return STATUS_ERROR, None
+
+    if answer.find("{") == -1 or answer.find("}") == -1:
+        return STATUS_NO_JSON, None
+
+    json_answer = extract_json(answer, keys)
+    if json_answer is None:
+        return STATUS_MALFORMED, None
+    return STATUS_SCORED, json_answer
+
+
+def extract_sample_data(answer: str, correct_answer) -> tuple[float, list[AISampleItem]]:
+    correct_answer = {
+        key: correct_answer[key] for key in correct_answer.keys() if key not in ADDITIONAL_FIELDS and key != INPUT_FIELD
+    }
+
+    status, json_answer = parse_answer(answer, correct_answer.keys())
+    if status == STATUS_ERROR:
+        samples = list()
+        for key, value in correct_answer.items():
+            samples.append(AISampleItem(field=key, model="Error", correct=str(value), score="Not Scored - Error"))
+        return 0.0, samples
+
+    if status == STATUS_NO_JSON:
+        empty_samples = list()
+        for key, value in correct_answer.items():
+            empty_samples.append(AISampleItem(field=key, model=PLACE_HOLDER, correct=str(value), score="0%"))
+        return 0.0, empty_samples
+
+    if status == STATUS_MALFORMED:
+        malformed_json_samples = list()
+        for key, value in correct_answer.items():
+            malformed_json_samples.append(
+                AISampleItem(field=key, model="Malformed JSON", correct=str(value), score="No score - malformed JSON")
+            )
+        return 0.0, malformed_json_samples
+
+    sample_items = []
+    total_score = 0.0
+
+    if INSTRUMENT_TYPE_FIELD in json_answer.keys() and compare_as_strings(
+        model_value=json_answer[INSTRUMENT_TYPE_FIELD],
+        correct_value=correct_answer[INSTRUMENT_TYPE_FIELD],
+    ):
+        max_item_score = 1 / len(correct_answer.keys())
+        sample_items.append(
+            AISampleItem(
+                field=INSTRUMENT_TYPE_FIELD,
+                model=str(json_answer[INSTRUMENT_TYPE_FIELD])
+                if INSTRUMENT_TYPE_FIELD in json_answer.keys()
+                else "Not found in response",
+                correct=str(correct_answer[INSTRUMENT_TYPE_FIELD]),
+                score=str(round(100 * max_item_score, 2)) + "%",
+            )
+        )
+        total_score += max_item_score
+        for key in set(correct_answer.keys()) - {INSTRUMENT_TYPE_FIELD}:
+            model_value = json_answer.get(key)
+            correct_value = correct_answer[key]
+
+            if key.endswith(DATE_FIELD_END_WITH):
+                are_values_equal = compare_as_dates(model_value=model_value, correct_value=correct_value)
+            else:
+                are_values_equal = soft_comparison(model_value=model_value, correct_value=correct_value)
+
+            score = max_item_score if are_values_equal else 0.0
+            total_score += score
+            sample_items.append(
+                AISampleItem(
+                    field=key,
+                    model=str(model_value) if model_value is not None else PLACE_HOLDER,
+                    correct=str(correct_value),
+                    score=str(round(100 * score, 2)) + "%",
+                )
+            )
+
+        total_score *= 100
+        return total_score, sample_items
+    else:
+        sample_items.append(
+            AISampleItem(
+                field=INSTRUMENT_TYPE_FIELD,
+                model=str(json_answer[INSTRUMENT_TYPE_FIELD])
+                if INSTRUMENT_TYPE_FIELD in json_answer.keys()
+                else "Not found in response",
+                correct=str(correct_answer[INSTRUMENT_TYPE_FIELD]),
+                score="No score - mismatch",
+            )
+        )
+        for key in set(correct_answer.keys()) - {INSTRUMENT_TYPE_FIELD}:
+            model_value = json_answer.get(key)
+            correct_value = correct_answer[key]
+            # TODO: softer
+            sample_items.append(
+                AISampleItem(
+                    field=key,
+                    model=str(model_value) if model_value is not None else PLACE_HOLDER,
+                    correct=str(correct_value),
+                    score="Instrument type mismatch",
+                )
+            )
+        total_score *= 100
+        return total_score, sample_items
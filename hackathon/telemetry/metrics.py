@@ -0,0 +1,110 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from functools import lru_cache
+from typing import Callable, Final
+
+Labels = tuple[tuple[str, str], ...]
+
+COUNTER: Final[str] = "counter"
+GAUGE: Final[str] = "gauge"
+
+
+class Metric:
+    def __init__(self, name: str, description: str, metric_type: str):
+        self.name = name
+        self.description = description
+        self.metric_type = metric_type
+        self._values: dict[Labels, float] = dict()
+        self._lock = threading.Lock()
+
+    def samples(self) -> dict[Labels, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0.0)
+
+
+class Counter(Metric):
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description, COUNTER)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description, GAUGE)
+        self._callbacks: list[Callable[[], dict[Labels, float]]] = list()
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+    def add_callback(self, callback: Callable[[], dict[Labels, float]]) -> None:
+        # Callback gauges are evaluated on scrape, e.g. for queue depths owned by another component
+        self._callbacks.append(callback)
+
+    def samples(self) -> dict[Labels, float]:
+        values = super().samples()
+        for callback in self._callbacks:
+            values.update(callback())
+        return values
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = dict()
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(name, lambda: Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(name, lambda: Gauge(name, description))
+
+    def _register(self, name: str, factory: Callable[[], Metric]):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = factory()
+            return self.metrics[name]
+
+    def render_prometheus(self) -> str:
+        lines = list()
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for labels, value in sorted(metric.samples().items()):
+                label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f"{metric.name}{{{label_text}}} {value:g}" if labels else f"{metric.name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+@lru_cache
+def get_metrics_registry() -> MetricsRegistry:
+    return MetricsRegistry()
@@ -0,0 +1,366 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from types import FrameType
+from typing import Final, Optional
+from urllib.parse import parse_qs
+
+from hackathon.hackathon_settings import get_settings
+
+PROFILE_HEADER: Final[str] = "profile"
+ADMIN_KEY_HEADER: Final[str] = "admin-key"
+PROFILE_FILES_HEADER: Final[str] = "profile-files"
+# a profile that could not be taken, with the reason
+PROFILE_SKIPPED_HEADER: Final[str] = "profile-skipped"
+ALLOCATION_PROFILING_BUSY: Final[str] = "memory: allocation profiling busy"
+PROFILE_MODES: Final[dict[str, set[str]]] = {
+    "cpu": {"cpu"},
+    "memory": {"memory"},
+    "all": {"cpu", "memory"},
+    "true": {"cpu", "memory"},
+}
+PROFILED_PATH_SUFFIXES: Final[tuple[str, ...]] = ("/score", "/run")
+SPEEDSCOPE_SCHEMA: Final[str] = "https://www.speedscope.app/file-format-schema.json"
+ALLOCATION_TRACEBACK_DEPTH: Final[int] = 32
+# worker threads of the event loop default executor (asyncio.to_thread) and of the scoring thread pool
+EXECUTOR_THREAD_PREFIXES: Final[tuple[str, ...]] = ("asyncio_", "scoring_")
+
+Stack = tuple[tuple[str, str, int], ...]
+
+
+def is_admin(admin_key: Optional[str]) -> bool:
+    expected_key = get_settings().admin_api_key
+    if not expected_key or not admin_key:
+        return False
+    return hmac.compare_digest(admin_key.encode(), expected_key.encode())
+
+
+def _frame_stack(frame: Optional[FrameType]) -> Stack:
+    stack = list()
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """Samples stacks from a daemon thread, similar to py-spy but in-process.
+
+    Only the event loop thread and the executor threads are sampled. Other requests the loop serves meanwhile are
+    part of the profile too, background threads (exporters, other profilers) are not.
+    """
+
+    def __init__(self, interval: float, loop_thread_id: int):
+        self.interval = interval
+        self.loop_thread_id = loop_thread_id
+        self.samples: dict[str, list[Stack]] = collections.defaultdict(list)
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                if thread_id == self.loop_thread_id or thread_name.startswith(EXECUTOR_THREAD_PREFIXES):
+                    self.samples[thread_name].append(_frame_stack(frame))
+
+    def to_speedscope(self, name: str) -> dict:
+        frames = _FrameTable()
+        profiles = list()
+        for thread_name, stacks in self.samples.items():
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": f"CPU {thread_name}",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(self.end_time - self.start_time, 6),
+                    "samples": [[frames.index(*frame) for frame in stack] for stack in stacks],
+                    "weights": [self.interval] * len(stacks),
+                }
+            )
+        return _speedscope_file(name, frames, profiles)
+
+
+def allocations_to_speedscope(snapshot: tracemalloc.Snapshot, name: str) -> dict:
+    frames = _FrameTable()
+    samples = list()
+    weights = list()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    for statistic in snapshot.statistics("traceback"):
+        # tracemalloc keeps file and line only, the line is used as the frame name
+        stack = [
+            frames.index(f"{frame.filename}:{frame.lineno}", frame.filename, frame.lineno)
+            for frame in reversed(statistic.traceback)
+        ]
+        samples.append(stack)
+        weights.append(statistic.size)
+    profile = {
+        "type": "sampled",
+        "name": "Allocated memory",
+        "unit": "bytes",
+        "startValue": 0,
+        "endValue": sum(weights),
+        "samples": samples,
+        "weights": weights,
+    }
+    return _speedscope_file(name, frames, [profile])
+
+
+class _FrameTable:
+    def __init__(self):
+        self.frames: list[dict] = list()
+        self._indices: dict[tuple[str, str, int], int] = dict()
+
+    def index(self, name: str, file: str, line: int) -> int:
+        key = (name, file, line)
+        frame_index = self._indices.get(key)
+        if frame_index is None:
+            frame_index = self._indices[key] = len(self.frames)
+            self.frames.append({"name": name, "file": file, "line": line})
+        return frame_index
+
+
+def _speedscope_file(name: str, frames: _FrameTable, profiles: list[dict]) -> dict:
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "hackathon",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames.frames},
+        "profiles": profiles,
+    }
+
+
+def save_profile(profile: dict, file_name: str) -> Path:
+    profiles_path = get_settings().profiles_path
+    profiles_path.mkdir(parents=True, exist_ok=True)
+    file_path = Path(profiles_path, file_name)
+    with open(file_path, "w") as profile_file:
+        json.dump(profile, profile_file)
+    return file_path
+
+
+def _save_request_profiles(
+    request_name: str, path: str, cpu_profiler: Optional[SamplingProfiler], trace_allocations: bool
+) -> list[str]:
+    # runs off the event loop, the snapshot and the serialization of a profile take a while
+    file_names = list()
+    if cpu_profiler is not None:
+        cpu_profiler.stop()
+        file_name = f"{request_name}.cpu.speedscope.json"
+        save_profile(cpu_profiler.to_speedscope(f"{path} CPU"), file_name)
+        file_names.append(file_name)
+    if trace_allocations and tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        file_name = f"{request_name}.memory.speedscope.json"
+        save_profile(allocations_to_speedscope(snapshot, f"{path} memory"), file_name)
+        file_names.append(file_name)
+    return file_names
+
+
+class ProfilingMiddleware:
+    """Profiles a single score or run request end to end when an admin asks for it.
+
+    Allocations are traced process wide, so only one request traces them at a time. A request asking for them while
+    another one traces gets the profile-skipped header instead of a memory profile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        modes = self._requested_modes(scope)
+        if not modes:
+            return await self.app(scope, receive, send)
+
+        settings = get_settings()
+        request_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(4).hex()}"
+        file_names, skipped = list(), list()
+        cpu_profiler = SamplingProfiler(settings.profile_interval, threading.get_ident()) if "cpu" in modes else None
+        trace_allocations = "memory" in modes and not tracemalloc.is_tracing()
+        if "memory" in modes and not trace_allocations:
+            skipped.append(ALLOCATION_PROFILING_BUSY)
+        if cpu_profiler is not None:
+            cpu_profiler.start()
+        if trace_allocations:
+            tracemalloc.start(ALLOCATION_TRACEBACK_DEPTH)
+        finished = False
+
+        async def send_with_profile_header(message):
+            if message["type"] == "http.response.start":
+                await finish()
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_FILES_HEADER.encode(), ",".join(file_names).encode()))
+                if skipped:
+                    headers.append((PROFILE_SKIPPED_HEADER.encode(), ",".join(skipped).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        async def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            file_names.extend(
+                await asyncio.to_thread(
+                    _save_request_profiles, request_name, scope["path"], cpu_profiler, trace_allocations
+                )
+            )
+
+        try:
+            await self.app(scope, receive, send_with_profile_header)
+        finally:
+            await finish()
+
+    @staticmethod
+    def _requested_modes(scope) -> set[str]:
+        if scope["type"] != "http" or not scope["path"].endswith(PROFILED_PATH_SUFFIXES):
+            return set()
+        headers = {key.decode().lower(): value.decode() for key, value in scope.get("headers", [])}
+        query = parse_qs(scope.get("query_string", b"").decode())
+        mode = headers.get(PROFILE_HEADER) or next(iter(query.get(PROFILE_HEADER, [])), None)
+        if not mode or not is_admin(headers.get(ADMIN_KEY_HEADER)):
+            return set()
+        return PROFILE_MODES.get(mode.lower(), set())
+
+
+class BackgroundProfiler:
+    # Aggregates sampled stacks across live traffic into a rolling window of per-minute buckets
+    BUCKET_SECONDS: Final[int] = 60
+
+    def __init__(self, interval: float, window_minutes: int):
+        self.interval = interval
+        self.buckets: collections.deque[collections.Counter] = collections.deque(maxlen=window_minutes)
+        self._bucket_start = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="background-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            stacks = [
+                _frame_stack(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_thread_id
+            ]
+            with self._lock:
+                if not self.buckets or now - self._bucket_start >= self.BUCKET_SECONDS:
+                    self.buckets.append(collections.Counter())
+                    self._bucket_start = now
+                bucket = self.buckets[-1]
+                for stack in stacks:
+                    if stack and not _is_idle(stack):
+                        bucket[stack] += 1
+
+    def aggregate(self) -> collections.Counter:
+        total = collections.Counter()
+        with self._lock:
+            for bucket in self.buckets:
+                total.update(bucket)
+        return total
+
+    def hot_frames(self, top: int) -> list[dict]:
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        sample_count = 0
+        for stack, count in self.aggregate().items():
+            sample_count += count
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+        return [
+            {
+                "function": frame[0],
+                "file": frame[1],
+                "line": frame[2],
+                "self_samples": self_counts[frame],
+                "total_samples": total_counts[frame],
+                "self_pct": round(100 * self_counts[frame] / sample_count, 2),
+            }
+            for frame, _ in self_counts.most_common(top)
+        ]
+
+    def collapsed_stacks(self) -> str:
+        # Brendan Gregg's folded format, accepted by flamegraph.pl and speedscope
+        lines = [
+            ";".join(f"{name} ({Path(file).name}:{line})" for name, file, line in stack) + f" {count}"
+            for stack, count in self.aggregate().items()
+        ]
+        return "\n".join(lines)
+
+
+def _is_idle(stack: Stack) -> bool:
+    # Threads parked in a wait are not interesting for hot frame analysis
+    return stack[-1][0] in {"wait", "select", "poll", "acquire", "sleep"}
+
+
+_background_profiler: Optional[BackgroundProfiler] = None
+
+
+def get_background_profiler() -> Optional[BackgroundProfiler]:
+    return _background_profiler
+
+
+def start_background_profiler() -> None:
+    global _background_profiler
+    settings = get_settings()
+    if settings.background_profiler and _background_profiler is None:
+        _background_profiler = BackgroundProfiler(
+            interval=settings.background_profile_interval, window_minutes=settings.background_profile_window
+        )
+        _background_profiler.start()
+
+
+def stop_background_profiler() -> None:
+    global _background_profiler
+    if _background_profiler is not None:
+        _background_profiler.stop()
+        _background_profiler = None
@@ -0,0 +1,277 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Final, Iterator, Optional
+
+from hackathon.hackathon_settings import get_settings
+
+SERVICE_NAME: Final[str] = "hackathon"
+STATUS_OK: Final[str] = "OK"
+STATUS_ERROR: Final[str] = "ERROR"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    start_time_ns: int = field(default_factory=time.time_ns)
+    end_time_ns: Optional[int] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status: str = STATUS_OK
+
+    @property
+    def duration_ms(self) -> float:
+        end_time_ns = self.end_time_ns if self.end_time_ns is not None else time.time_ns()
+        return (end_time_ns - self.start_time_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, description: str = "") -> None:
+        self.status = STATUS_ERROR
+        self.set_attribute("error.message", description or None)
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [_to_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2 if self.status == STATUS_ERROR else 1},
+        }
+
+
+class TraceRecorder:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: list[Span] = list()
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        stages: dict[str, dict] = dict()
+        root_duration_ms = 0.0
+        for span in self.spans:
+            if span.parent_span_id is None:
+                root_duration_ms = max(root_duration_ms, span.duration_ms)
+            stage = stages.setdefault(
+                span.name, {"name": span.name, "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            stage["count"] += 1
+            stage["errors"] += 1 if span.status == STATUS_ERROR else 0
+            stage["total_ms"] += span.duration_ms
+            stage["max_ms"] = max(stage["max_ms"], span.duration_ms)
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 3)
+            stage["max_ms"] = round(stage["max_ms"], 3)
+        return {
+            "trace_id": self.trace_id,
+            "duration_ms": round(root_duration_ms, 3),
+            "stages": list(stages.values()),
+        }
+
+
+class SpanExporter:
+    def export(self, spans: list[Span]) -> None:
+        ...
+
+    def shutdown(self) -> None:
+        ...
+
+
+class FileSpanExporter(SpanExporter):
+    # One OTLP/JSON ExportTraceServiceRequest per line, readable by the collector file receiver
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a") as trace_file:
+            trace_file.write(json.dumps(_to_otlp_request(spans)) + "\n")
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    REQUEST_TIMEOUT: Final[int] = 10
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint.rstrip("/")
+        if not self.endpoint.endswith("/v1/traces"):
+            self.endpoint += "/v1/traces"
+        import httpx  # only the OTLP exporter needs an HTTP client, keep it off the startup path
+
+        self.client = httpx.Client(timeout=self.REQUEST_TIMEOUT)
+
+    def export(self, spans: list[Span]) -> None:
+        self.client.post(self.endpoint, json=_to_otlp_request(spans)).raise_for_status()
+
+    def shutdown(self) -> None:
+        self.client.close()
+
+
+class BatchSpanProcessor:
+    # Exports finished traces from a daemon thread so that request handling never waits for I/O
+    MAX_QUEUE_SIZE: Final[int] = 2048
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+        self._queue: queue.Queue[Optional[list[Span]]] = queue.Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._worker, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_trace_end(self, spans: list[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Span export queue is full, dropping trace.")
+
+    def shutdown(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self.exporter.shutdown()
+
+    def _worker(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            try:
+                self.exporter.export(spans)
+            except Exception as err:
+                logger.warning(f"Failed to export spans: {err}")
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_current_recorder: ContextVar[Optional[TraceRecorder]] = ContextVar("current_recorder", default=None)
+_processor: Optional[BatchSpanProcessor] = None
+_processor_lock = threading.Lock()
+
+
+def get_span_processor() -> Optional[BatchSpanProcessor]:
+    global _processor
+    settings = get_settings()
+    if settings.trace_exporter == "none":
+        return None
+    with _processor_lock:
+        if _processor is None:
+            if settings.trace_exporter == "file":
+                exporter = FileSpanExporter(settings.trace_file_path)
+            elif settings.trace_exporter == "otlp":
+                exporter = OtlpHttpSpanExporter(settings.trace_otlp_endpoint)
+            else:
+                raise ValueError(f"Unknown trace exporter: '{settings.trace_exporter}'.")
+            _processor = BatchSpanProcessor(exporter)
+    return _processor
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_recorder() -> Optional[TraceRecorder]:
+    return _current_recorder.get()
+
+
+@contextlib.contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[TraceRecorder]:
+    recorder = TraceRecorder(trace_id=os.urandom(16).hex())
+    recorder_token = _current_recorder.set(recorder)
+    try:
+        with start_span(name, **attributes):
+            yield recorder
+    finally:
+        _current_recorder.reset(recorder_token)
+        processor = get_span_processor()
+        if processor is not None:
+            processor.on_trace_end(list(recorder.spans))
+
+
+@contextlib.contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Span]:
+    recorder = _current_recorder.get()
+    parent = _current_span.get()
+    span = Span(
+        name=name,
+        trace_id=recorder.trace_id if recorder is not None else os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_span_id=parent.span_id if parent is not None else None,
+    )
+    span.set_attributes(**attributes)
+    span_token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as err:
+        span.set_error(f"{type(err).__name__}: {err}")
+        raise
+    finally:
+        span.end_time_ns = time.time_ns()
+        _current_span.reset(span_token)
+        if recorder is not None:
+            recorder.add(span)
+
+
+def _to_otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        otlp_value = {"boolValue": value}
+    elif isinstance(value, int):
+        otlp_value = {"intValue": str(value)}
+    elif isinstance(value, float):
+        otlp_value = {"doubleValue": value}
+    else:
+        otlp_value = {"stringValue": str(value)}
+    return {"key": key, "value": otlp_value}
+
+
+def _to_otlp_request(spans: list[Span]) -> dict:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_to_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
@@ -0,0 +1,138 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import hashlib
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from hackathon.telemetry.metrics import get_metrics_registry
+
+PROVIDER_CALLS = get_metrics_registry().counter("hackathon_provider_calls_total", "Provider calls by outcome.")
+PROVIDER_TOKENS = get_metrics_registry().counter("hackathon_provider_tokens_total", "Tokens reported by providers.")
+PROVIDER_COST = get_metrics_registry().counter("hackathon_provider_cost_usd_total", "Estimated provider cost in USD.")
+PROVIDER_LATENCY = get_metrics_registry().counter(
+    "hackathon_provider_latency_seconds_total", "Wall time spent waiting for providers."
+)
+
+
+@dataclass
+class ProviderUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    provider_time_ms: Optional[float] = None
+    latency_ms: float = 0.0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    provider_time_ms: Optional[float] = None
+    latency_ms: float = 0.0
+    cost: float = 0.0
+
+    def add(self, usage: ProviderUsage) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.latency_ms += usage.latency_ms
+        self.cost += usage.cost
+        if usage.provider_time_ms is not None:
+            self.provider_time_ms = (self.provider_time_ms or 0.0) + usage.provider_time_ms
+
+    def merge(self, totals: "UsageTotals") -> None:
+        self.calls += totals.calls
+        self.prompt_tokens += totals.prompt_tokens
+        self.completion_tokens += totals.completion_tokens
+        self.latency_ms += totals.latency_ms
+        self.cost += totals.cost
+        if totals.provider_time_ms is not None:
+            self.provider_time_ms = (self.provider_time_ms or 0.0) + totals.provider_time_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "estimated_cost": round(self.cost, 6),
+            "provider_time_ms": round(self.provider_time_ms, 3) if self.provider_time_ms is not None else None,
+            "latency_ms": round(self.latency_ms, 3),
+        }
+
+
+class UsageMeter:
+    # Collects usage of every provider call made while serving one request, repair calls included
+    def __init__(self):
+        self.total = UsageTotals()
+        self.samples: dict[int, UsageTotals] = dict()
+        self._lock = threading.Lock()
+
+    def record(self, sample_id: Optional[int], usage: ProviderUsage) -> None:
+        with self._lock:
+            self.total.add(usage)
+            if sample_id is not None:
+                self.samples.setdefault(sample_id, UsageTotals()).add(usage)
+
+    def for_sample(self, sample_id: int) -> Optional[dict]:
+        totals = self.samples.get(sample_id)
+        return totals.to_dict() if totals is not None else None
+
+
+_current_meter: ContextVar[Optional[UsageMeter]] = ContextVar("current_usage_meter", default=None)
+
+
+@contextlib.contextmanager
+def start_usage_meter() -> Iterator[UsageMeter]:
+    meter = UsageMeter()
+    token = _current_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _current_meter.reset(token)
+
+
+def api_key_label(api_key: Optional[str]) -> str:
+    # Keys are never exported, only a short digest that is stable across workers
+    if not api_key:
+        return "anonymous"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def record_usage(
+    provider_name: str,
+    api_key: Optional[str],
+    provider_model: str,
+    sample_id: Optional[int],
+    outcome: str,
+    usage: ProviderUsage,
+) -> None:
+    labels = dict(provider=provider_name, model=provider_model, api_key=api_key_label(api_key))
+    PROVIDER_CALLS.inc(outcome=outcome, **labels)
+    PROVIDER_TOKENS.inc(usage.prompt_tokens, kind="prompt", **labels)
+    PROVIDER_TOKENS.inc(usage.completion_tokens, kind="completion", **labels)
+    PROVIDER_COST.inc(usage.cost, **labels)
+    PROVIDER_LATENCY.inc(usage.latency_ms / 1000, **labels)
+    meter = _current_meter.get()
+    if meter is not None:
+        meter.record(sample_id, usage)
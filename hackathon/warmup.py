@@ -0,0 +1,148 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import glob
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Final, Optional
+
+from hackathon.api.static_files import precompress_static
+from hackathon.chains.definition import get_chain
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.jobs.manager import get_job_manager
+from hackathon.models.ai_models import AIProvider
+from hackathon.providers.manager import get_provider_class
+from hackathon.scoring.executor import get_scoring_executor
+from hackathon.scoring.experiments import read_experiment
+from hackathon.scoring.instruments import get_instrument_indexes
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING: Final[str] = "pending"
+STATUS_OK: Final[str] = "ok"
+STATUS_FAILED: Final[str] = "failed"
+
+
+@dataclass
+class WarmUpStep:
+    name: str
+    # a worker is not ready while a required step failed, an optional one only degrades what depends on it
+    required: bool = True
+    status: str = STATUS_PENDING
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class Readiness:
+    """Warm-up progress of this worker, ready once every required step succeeded."""
+
+    def __init__(self):
+        self.steps: list[WarmUpStep] = list()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self.finished and all(step.status == STATUS_OK for step in self.steps if step.required)
+
+    def run_step(self, name: str, action: Callable[[], None], required: bool = True) -> None:
+        step = WarmUpStep(name=name, required=required)
+        with self._lock:
+            self.steps.append(step)
+        start_time = time.perf_counter()
+        try:
+            action()
+            step.status = STATUS_OK
+        except Exception as err:
+            step.status, step.error = STATUS_FAILED, f"{type(err).__name__}: {err}"
+            logger.exception("Warm-up step %s failed.", name)
+        step.duration_ms = (time.perf_counter() - start_time) * 1000
+
+    def finish(self) -> None:
+        self._finished.set()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            steps = [asdict(step) for step in self.steps]
+        return dict(ready=self.ready, finished=self.finished, steps=steps)
+
+
+_readiness = Readiness()
+
+
+def get_readiness() -> Readiness:
+    return _readiness
+
+
+def _import_providers(settings: Settings) -> None:
+    for provider in settings.warm_up_providers:
+        get_provider_class(AIProvider(provider))
+
+
+def _load_chains(settings: Settings) -> None:
+    for path in sorted(glob.glob(str(Path(settings.prompts_path, "*.json")))):
+        get_chain(Path(path).stem)
+
+
+def _read_experiments(settings: Settings) -> None:
+    for path in sorted(glob.glob(str(Path(settings.data_path, "*.csv")))):
+        read_experiment(path)
+
+
+def _start_scoring_workers(settings: Settings) -> None:
+    executor = get_scoring_executor()
+    if executor is not None:
+        # process workers are spawned by the first tasks, the first scoring request should not pay for it
+        for future in [executor.submit(int) for _ in range(settings.scoring_workers)]:
+            future.result()
+
+
+def _prune_jobs(settings: Settings) -> None:
+    get_job_manager().store.prune(time.time() - settings.job_retention_days * 24 * 3600)
+
+
+def warm_up(readiness: Readiness, settings: Settings) -> None:
+    """Load everything the first requests would otherwise load, the slow parts of a cold start."""
+    try:
+        readiness.run_step("providers", lambda: _import_providers(settings), required=False)
+        readiness.run_step("chains", lambda: _load_chains(settings))
+        readiness.run_step("instruments", get_instrument_indexes)
+        readiness.run_step("experiments", lambda: _read_experiments(settings))
+        readiness.run_step("scoring", lambda: _start_scoring_workers(settings))
+        # finished jobs past retention are pruned here, their results are the bulk of the job store
+        readiness.run_step("jobs", lambda: _prune_jobs(settings), required=False)
+        if settings.static_precompress:
+            # a read-only static directory only costs the compression, the files are still served
+            readiness.run_step("static", lambda: precompress_static(settings.static_path), required=False)
+    finally:
+        readiness.finish()
+
+
+def start_warm_up() -> Optional[asyncio.Task]:
+    """Warm up off the event loop, so that the liveness probe answers while the worker gets ready."""
+    readiness, settings = get_readiness(), get_settings()
+    if not settings.warm_up:
+        readiness.finish()
+        return None
+    return asyncio.create_task(asyncio.to_thread(warm_up, readiness, settings))
@@ -0,0 +1,155 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import asdict
+from functools import lru_cache
+from importlib import import_module
+from pathlib import Path
+from typing import Final, Optional
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIProvider
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.metrics import get_metrics_registry
+from hackathon.telemetry.usage import ProviderUsage
+from hackathon.workqueue.queues import QueueTask, SQLiteWorkQueue, TaskResult, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TASKS = get_metrics_registry().counter(
+    "hackathon_queue_tasks_total", "Provider calls sent to the work queue, by outcome."
+)
+
+
+class QueueClient:
+    """Provider calls of this process sent to the work queue, answered as the workers finish them.
+
+    One poller puts the calls made since its last round in one transaction and collects every finished answer, so the
+    queue sees a few statements per poll_interval however many samples are waiting.
+    """
+
+    # Answers of clients that went away are deleted after this many seconds
+    ORPHAN_AFTER: Final[float] = 3600.0
+
+    def __init__(self, queue: WorkQueue, poll_interval: float = 0.2):
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.client_id = uuid.uuid4().hex
+        self._pending: list[QueueTask] = list()
+        self._futures: dict[str, asyncio.Future] = dict()
+        self._poller: Optional[asyncio.Task] = None
+        self._pruned_at = 0.0
+
+    async def call(self, ai_provider: AIProvider, param: ProviderParam, api_key: Optional[str]) -> ProviderAnswer:
+        task = QueueTask(
+            task_id=uuid.uuid4().hex,
+            client_id=self.client_id,
+            provider=ai_provider.value,
+            param=asdict(param),
+            api_key=api_key,
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._futures[task.task_id] = future
+        self._pending.append(task)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        try:
+            result: TaskResult = await future
+        except asyncio.CancelledError:
+            self._futures.pop(task.task_id, None)
+            if task in self._pending:
+                self._pending.remove(task)
+            else:
+                await asyncio.shield(asyncio.to_thread(self.queue.cancel, [task.task_id]))
+            QUEUE_TASKS.inc(outcome="cancelled")
+            raise
+        if result.answer is None:
+            QUEUE_TASKS.inc(outcome="failed")
+            return ProviderAnswer(sample_id=param.sample_id, answer=BaseProvider.get_error_answer(str(result.error)))
+        QUEUE_TASKS.inc(outcome="answered")
+        usage = result.answer.get("usage")
+        return ProviderAnswer(
+            sample_id=param.sample_id,
+            answer=result.answer["answer"],
+            usage=ProviderUsage(**usage) if usage is not None else None,
+        )
+
+    async def _poll(self) -> None:
+        while self._futures:
+            pending, self._pending = self._pending, list()
+            try:
+                if pending:
+                    await asyncio.to_thread(self.queue.put, pending)
+                results = await asyncio.to_thread(self.queue.collect, self.client_id)
+                if time.time() - self._pruned_at > self.ORPHAN_AFTER:
+                    self._pruned_at = time.time()
+                    await asyncio.to_thread(self.queue.prune, self._pruned_at - self.ORPHAN_AFTER)
+            except Exception:
+                # the calls are put again next round, a locked or unreachable queue only delays them
+                logger.exception("Work queue round failed.")
+                self._pending = pending + self._pending
+                results = list()
+            for result in results:
+                future = self._futures.pop(result.task_id, None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+            await asyncio.sleep(self.poll_interval)
+
+
+class QueuedProvider(BaseProvider):
+    """Provider whose calls are run by worker processes through the work queue.
+
+    It takes the name of the provider it stands for, so that unit hashes, usage and traces are those of a local run.
+    """
+
+    def __init__(self, ai_provider: AIProvider, provider: BaseProvider, client: QueueClient):
+        super().__init__(provider.api_key)
+        self.PROVIDER_NAME = provider.PROVIDER_NAME or type(provider).__name__
+        self.ai_provider = ai_provider
+        self.client = client
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        return await self.client.call(self.ai_provider, param, self.api_key)
+
+
+@lru_cache
+def _work_queue(backend: str, path: Path, max_attempts: int) -> Optional[WorkQueue]:
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteWorkQueue(path, max_attempts)
+    # any other backend is a "module:Class" path, a networked queue is built from the settings
+    module_name, class_name = backend.split(":")
+    return getattr(import_module(module_name), class_name).from_settings(get_settings())
+
+
+def get_work_queue() -> Optional[WorkQueue]:
+    settings = get_settings()
+    return _work_queue(settings.work_queue_backend, Path(settings.work_queue_path), settings.work_queue_max_attempts)
+
+
+@lru_cache
+def get_queue_client() -> Optional[QueueClient]:
+    queue = get_work_queue()
+    return QueueClient(queue, get_settings().work_queue_poll_interval) if queue is not None else None
+
+
+def distribute(ai_provider: AIProvider, provider: BaseProvider) -> BaseProvider:
+    """The provider of a score run, queued to the worker processes when a work queue is configured."""
+    client = get_queue_client()
+    return QueuedProvider(ai_provider, provider, client) if client is not None else provider
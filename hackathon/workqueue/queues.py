@@ -0,0 +1,278 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import contextlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, Iterator, Optional
+
+from hackathon.hackathon_settings import Settings
+
+STATUS_QUEUED: Final[str] = "queued"
+STATUS_RUNNING: Final[str] = "running"
+STATUS_DONE: Final[str] = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    provider TEXT NOT NULL,
+    param TEXT NOT NULL,
+    api_key TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL,
+    finished_at REAL,
+    answer TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at);
+CREATE INDEX IF NOT EXISTS tasks_client ON tasks (client_id, status);
+"""
+
+
+@dataclass
+class QueueTask:
+    """One provider call of a score run, the sample-level unit of distributed work."""
+
+    task_id: str
+    client_id: str  # the process waiting for the answer
+    provider: str  # AIProvider value, the worker builds the provider from it
+    param: dict  # ProviderParam fields
+    api_key: Optional[str] = None
+    attempts: int = 0
+
+
+@dataclass
+class TaskResult:
+    task_id: str
+    answer: Optional[dict] = None  # ProviderAnswer fields, usage included
+    error: Optional[str] = None  # set when every attempt failed
+
+
+class WorkQueue(abc.ABC):
+    """Durable queue of provider calls shared by the API workers that put them and the worker processes that run them.
+
+    A claimed task is leased to its worker, a task whose lease ran out is claimed again by another worker until it
+    failed max_attempts times.
+    """
+
+    @classmethod
+    @abc.abstractmethod
+    def from_settings(cls, settings: Settings) -> "WorkQueue":
+        """Queue configured by the settings, backends named by their "module:Class" path are built with it."""
+
+    @abc.abstractmethod
+    def put(self, tasks: list[QueueTask]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def claim(self, worker_id: str, limit: int, lease: float) -> list[QueueTask]:
+        ...
+
+    @abc.abstractmethod
+    def extend(self, worker_id: str, lease: float) -> None:
+        """Renew the leases of every task the worker is running."""
+
+    @abc.abstractmethod
+    def complete(self, task_id: str, worker_id: str, answer: dict) -> None:
+        ...
+
+    @abc.abstractmethod
+    def fail(self, task_id: str, worker_id: str, error: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def release(self, worker_id: str) -> None:
+        """Put the running tasks of a stopping worker back in the queue."""
+
+    @abc.abstractmethod
+    def collect(self, client_id: str) -> list[TaskResult]:
+        """Finished tasks of a client, removed from the queue."""
+
+    @abc.abstractmethod
+    def cancel(self, task_ids: list[str]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def prune(self, older_than: float) -> int:
+        """Delete answers finished before older_than (unix time) that nobody collected."""
+
+    @abc.abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in one SQLite file in WAL mode, for API and worker processes on one node or a shared volume.
+
+    API keys are kept with their tasks until the tasks finished, the file should be as private as the keys.
+    """
+
+    LOCK_TIMEOUT: Final[float] = 30.0
+
+    def __init__(self, path: Path, max_attempts: int = 3):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "SQLiteWorkQueue":
+        return cls(Path(settings.work_queue_path), settings.work_queue_max_attempts)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=self.LOCK_TIMEOUT, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def put(self, tasks: list[QueueTask]) -> None:
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO tasks (task_id, client_id, status, created_at, provider, param, api_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        task.task_id,
+                        task.client_id,
+                        STATUS_QUEUED,
+                        now,
+                        task.provider,
+                        json.dumps(task.param),
+                        task.api_key,
+                    )
+                    for task in tasks
+                ],
+            )
+
+    def _finish(self, connection: sqlite3.Connection, where: str, args: tuple, answer=None, error=None) -> None:
+        # the key is only needed to run the task, it is not kept any longer than that
+        connection.execute(
+            f"UPDATE tasks SET status = ?, finished_at = ?, answer = ?, error = ?, api_key = NULL WHERE {where}",
+            (STATUS_DONE, time.time(), json.dumps(answer) if answer is not None else None, error, *args),
+        )
+
+    def claim(self, worker_id: str, limit: int, lease: float) -> list[QueueTask]:
+        now = time.time()
+        with self._transaction() as connection:
+            # tasks of workers that stopped renewing their leases, given up after max_attempts
+            self._finish(
+                connection,
+                "status = ? AND lease_until < ? AND attempts >= ?",
+                (STATUS_RUNNING, now, self.max_attempts),
+                error="Worker stopped responding.",
+            )
+            connection.execute(
+                "UPDATE tasks SET status = ?, worker_id = NULL WHERE status = ? AND lease_until < ?",
+                (STATUS_QUEUED, STATUS_RUNNING, now),
+            )
+            rows = connection.execute(
+                "SELECT task_id, client_id, provider, param, api_key, attempts FROM tasks WHERE status = ? "
+                "ORDER BY created_at LIMIT ?",
+                (STATUS_QUEUED, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE tasks SET status = ?, worker_id = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE task_id = ?",
+                [(STATUS_RUNNING, worker_id, now + lease, row[0]) for row in rows],
+            )
+        return [
+            QueueTask(
+                task_id=task_id,
+                client_id=client_id,
+                provider=provider,
+                param=json.loads(param),
+                api_key=api_key,
+                attempts=attempts + 1,
+            )
+            for task_id, client_id, provider, param, api_key, attempts in rows
+        ]
+
+    def extend(self, worker_id: str, lease: float) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET lease_until = ? WHERE worker_id = ? AND status = ?",
+                (time.time() + lease, worker_id, STATUS_RUNNING),
+            )
+
+    def complete(self, task_id: str, worker_id: str, answer: dict) -> None:
+        with self._connect() as connection:
+            # a task whose lease was lost is answered by the worker that claimed it again
+            self._finish(
+                connection, "task_id = ? AND worker_id = ? AND status = ?", (task_id, worker_id, STATUS_RUNNING), answer
+            )
+
+    def fail(self, task_id: str, worker_id: str, error: str) -> None:
+        with self._transaction() as connection:
+            where, args = "task_id = ? AND worker_id = ? AND status = ?", (task_id, worker_id, STATUS_RUNNING)
+            self._finish(connection, f"{where} AND attempts >= ?", (*args, self.max_attempts), error=error)
+            connection.execute(f"UPDATE tasks SET status = ?, worker_id = NULL WHERE {where}", (STATUS_QUEUED, *args))
+
+    def release(self, worker_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, worker_id = NULL, attempts = attempts - 1 "
+                "WHERE worker_id = ? AND status = ?",
+                (STATUS_QUEUED, worker_id, STATUS_RUNNING),
+            )
+
+    def collect(self, client_id: str) -> list[TaskResult]:
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT task_id, answer, error FROM tasks WHERE client_id = ? AND status = ?", (client_id, STATUS_DONE)
+            ).fetchall()
+            connection.executemany("DELETE FROM tasks WHERE task_id = ?", [(row[0],) for row in rows])
+        return [
+            TaskResult(task_id=task_id, answer=json.loads(answer) if answer is not None else None, error=error)
+            for task_id, answer, error in rows
+        ]
+
+    def cancel(self, task_ids: list[str]) -> None:
+        with self._connect() as connection:
+            connection.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in task_ids])
+
+    def prune(self, older_than: float) -> int:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "DELETE FROM tasks WHERE status = ? AND finished_at < ?", (STATUS_DONE, older_than)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE)} | dict(rows)
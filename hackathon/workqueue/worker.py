@@ -0,0 +1,125 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import asdict
+from typing import Callable, Optional
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIProvider
+from hackathon.providers.base_provider import BaseProvider, ProviderParam
+from hackathon.providers.manager import get_provider
+from hackathon.workqueue.client import get_work_queue
+from hackathon.workqueue.queues import QueueTask, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+ProviderFactory = Callable[[AIProvider, Optional[str]], BaseProvider]
+
+
+class QueueWorker:
+    """Runs provider calls claimed from the work queue, up to concurrency at a time, and renews their leases."""
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        concurrency: int,
+        lease: float = 30.0,
+        poll_interval: float = 0.2,
+        provider_factory: ProviderFactory = get_provider,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.provider_factory = provider_factory
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{id(self):x}"
+        self.completed = 0
+
+    async def _execute(self, task: QueueTask) -> None:
+        try:
+            provider = self.provider_factory(AIProvider(task.provider), task.api_key)
+            answers = await provider.run([ProviderParam(**task.param)])
+            answer = dict(answer=answers[0].answer, usage=asdict(answers[0].usage) if answers[0].usage else None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.exception("Task %s failed.", task.task_id)
+            await asyncio.to_thread(self.queue.fail, task.task_id, self.worker_id, f"{type(err).__name__}: {err}")
+            return
+        await asyncio.to_thread(self.queue.complete, task.task_id, self.worker_id, answer)
+        self.completed += 1
+
+    async def run(self, stop: asyncio.Event) -> None:
+        running: set[asyncio.Task] = set()
+        extended_at = time.monotonic()
+        try:
+            while not stop.is_set():
+                claimed = list()
+                if len(running) < self.concurrency:
+                    claimed = await asyncio.to_thread(
+                        self.queue.claim, self.worker_id, self.concurrency - len(running), self.lease
+                    )
+                for task in claimed:
+                    running.add(asyncio.create_task(self._execute(task)))
+                if running and time.monotonic() - extended_at > self.lease / 3:
+                    # a long provider call keeps its task as long as the worker is alive
+                    await asyncio.to_thread(self.queue.extend, self.worker_id, self.lease)
+                    extended_at = time.monotonic()
+                waiters = [*running, asyncio.create_task(stop.wait())]
+                done, _ = await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                waiters[-1].cancel()
+                running -= done
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            # unfinished calls go back to the queue for the other workers, without counting as an attempt
+            await asyncio.to_thread(self.queue.release, self.worker_id)
+
+
+def add_worker_parser(commands: argparse._SubParsersAction) -> None:
+    settings = get_settings()
+    parser = commands.add_parser("worker", help="Run provider calls of score runs from the work queue.")
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency, help="Calls run at once.")
+
+
+def worker(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    queue = get_work_queue()
+    if queue is None:
+        print("No work queue is configured, set WORK_QUEUE_BACKEND.", file=sys.stderr)
+        return 1
+    logging.basicConfig(level=settings.log_level)
+    queue_worker = QueueWorker(
+        queue, args.concurrency, lease=settings.work_queue_lease, poll_interval=settings.work_queue_poll_interval
+    )
+
+    async def serve() -> None:
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+        logger.info("Worker %s started with concurrency %d.", queue_worker.worker_id, args.concurrency)
+        await queue_worker.run(stop)
+        logger.info("Worker %s stopped after %d calls.", queue_worker.worker_id, queue_worker.completed)
+
+    asyncio.run(serve())
+    return 0
@@ -12,13 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Callable, Any, Generator
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Generator
 
 import fastapi
 import pytest
 from fastapi.testclient import TestClient
 
 from hackathon.__main__ import app as fastapi_app
+from hackathon.hackathon_settings import Settings, get_settings
+
+
+@pytest.fixture(scope="session", autouse=True)
+def writable_paths(tmp_path_factory: pytest.TempPathFactory) -> Settings:
+    """Files the app writes (precompressed static files, archive, jobs, caches) go to a temporary directory."""
+    settings = get_settings()
+    root: Path = tmp_path_factory.mktemp("hackathon")
+    static_path = root.joinpath("wwwroot")
+    shutil.copytree(settings.static_path, static_path, ignore=shutil.ignore_patterns("*.br", "*.gz"))
+    settings.static_path = static_path
+    settings.archive_path = root.joinpath("archive/runs.sqlite")
+    settings.jobs_path = root.joinpath("jobs/jobs.sqlite")
+    settings.cache_shared_path = root.joinpath("cache/shared.sqlite")
+    settings.work_queue_path = root.joinpath("queue/tasks.sqlite")
+    return settings
 
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,90 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from hackathon.archive.rescore import rescore_run, rescore_runs
+from hackathon.archive.store import ArchivedRun, ArchivedSamples, RunArchive, content_hash, dataset_hash
+from hackathon.scoring.engine import score_experiment
+
+DATA_PATH = Path(__file__).parents[1].joinpath("data")
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+def _answers(ground_truth: pd.DataFrame) -> dict[int, str]:
+    return {
+        int(index) + 1: json.dumps({"InstrumentType": row["InstrumentType"]}) if index % 2 else "no json"
+        for index, row in ground_truth.iterrows()
+    }
+
+
+def _archive_run(archive: RunArchive, data_path: Path, answers: dict[int, str], overall_score: float) -> ArchivedRun:
+    run = ArchivedRun(
+        run_id=content_hash(str(overall_score).encode())[:32],
+        created_at=1.0,
+        route="score",
+        experiment_name=EXPERIMENT_NAME,
+        provider="openai",
+        provider_model="gpt-3.5-turbo",
+        params=dict(seed=1, temperature=0.0),
+        prompt_hash=content_hash(b"prompt"),
+        dataset_hash=dataset_hash(data_path.joinpath(f"{EXPERIMENT_NAME}.csv")),
+        overall_score=overall_score,
+        timings={"duration_ms": 1.0},
+    )
+    archive.save_run(run, "prompt", ArchivedSamples(outputs=answers, answers=answers))
+    return run
+
+
+def test_archive_round_trip(tmp_path):
+    archive = RunArchive(tmp_path.joinpath("runs.sqlite"))
+    answers = {1: '{"InstrumentType": "Bond"}', 12: "error: timeout"}
+    run = _archive_run(archive, DATA_PATH, answers, 50.0)
+
+    assert archive.get_run(run.run_id) == run
+    assert archive.list_runs(experiment_name=EXPERIMENT_NAME) == [run]
+    assert archive.list_runs(experiment_name="Other") == []
+    assert archive.get_samples(run.run_id) == ArchivedSamples(outputs=answers, answers=answers)
+    assert archive.get_prompt(run.prompt_hash) == "prompt"
+    assert archive.get_run("unknown") is None
+    assert archive.get_samples("unknown") is None
+
+
+def test_rescore_matches_scoring(tmp_path):
+    data_path = tmp_path.joinpath("data")
+    data_path.mkdir()
+    shutil.copy(DATA_PATH.joinpath(f"{EXPERIMENT_NAME}.csv"), data_path)
+    ground_truth = pd.read_csv(data_path.joinpath(f"{EXPERIMENT_NAME}.csv"), header=0).fillna("None")
+    answers = _answers(ground_truth)
+    expected = score_experiment(answers, ground_truth)
+    archive = RunArchive(tmp_path.joinpath("runs.sqlite"))
+    run = _archive_run(archive, data_path, answers, expected.average_score)
+
+    result = rescore_run(archive, run.run_id, data_path)
+    response = result.to_response()
+    assert result.overall_score == expected.average_score
+    assert response.archived_score == response.overall_experiment_score
+    assert not response.dataset_changed
+    assert [item.sample_id for item in response.experiment_data] == sorted(answers)
+    assert rescore_run(archive, "unknown", data_path) is None
+
+    ground_truth.iloc[:1].to_csv(data_path.joinpath(f"{EXPERIMENT_NAME}.csv"), index=False)
+    assert rescore_runs(archive, data_path)[0].to_response().dataset_changed
+
+    data_path.joinpath(f"{EXPERIMENT_NAME}.csv").unlink()
+    assert rescore_runs(archive, data_path) == []
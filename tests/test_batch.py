@@ -0,0 +1,112 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+from pathlib import Path
+
+import pytest
+
+from hackathon.batch import cli
+from hackathon.batch.checkpoint import Checkpoint, CheckpointMismatch
+from hackathon.hackathon_settings import get_settings
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.scoring.experiments import read_experiment
+from hackathon.scoring.sample import INSTRUMENT_TYPE_FIELD
+from hackathon.telemetry.usage import ProviderUsage
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+class FlakyProvider(BaseProvider):
+    """Answers the instrument type, interrupted after a number of calls and failing for some samples."""
+
+    def __init__(self, api_key: str, interrupt_after: int = -1, failing: frozenset = frozenset()):
+        super().__init__(api_key=api_key)
+        experiment = read_experiment(Path(get_settings().data_path, f"{EXPERIMENT_NAME}.csv"))
+        self.instrument_types = experiment[INSTRUMENT_TYPE_FIELD].tolist()
+        self.interrupt_after = interrupt_after
+        self.failing = failing
+        self.calls: list[int] = list()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        if len(self.calls) == self.interrupt_after:
+            raise KeyboardInterrupt
+        self.calls.append(param.sample_id)
+        if param.sample_id in self.failing:
+            return ProviderAnswer(sample_id=param.sample_id, answer=self.get_error_answer("timeout"))
+        answer = json.dumps({INSTRUMENT_TYPE_FIELD: self.instrument_types[param.sample_id - 1]})
+        return ProviderAnswer(sample_id=param.sample_id, answer=answer, usage=ProviderUsage(prompt_tokens=5))
+
+
+def _args(output: Path, *options: str) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    cli.add_score_parser(parser.add_subparsers())
+    prompt_file = output.with_name("prompt.txt")
+    prompt_file.write_text("Extract the terms.")
+    argv = ["score", "openai", "--experiment", EXPERIMENT_NAME, "--model", "gpt-4", "--output", str(output)]
+    argv += ["--prompt-file", str(prompt_file), "--concurrency", "2", "--batch-size", "3"]
+    return parser.parse_args(argv + list(options))
+
+
+def _rows(output: Path) -> list[dict]:
+    return [json.loads(line) for line in output.read_text().splitlines()]
+
+
+def test_interrupted_run_resumes_without_calling_the_provider_again(tmp_path, monkeypatch, capsys):
+    output = tmp_path.joinpath("results.jsonl")
+    providers = [FlakyProvider("key", interrupt_after=4, failing=frozenset({2})), FlakyProvider("key")]
+    monkeypatch.setattr(cli, "get_provider", lambda ai_provider, api_key: providers.pop(0))
+
+    interrupted, resumed = providers
+    assert cli.score(_args(output)) == 130
+    assert cli.score(_args(output)) == 0
+    # the failed sample is tried again, the others answered before the interruption are not
+    assert set(resumed.calls) & set(interrupted.calls) == {2}
+    assert len(resumed.calls) == 10 - 3
+
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["samples_resumed"] == 3
+    assert (summary["samples_total"], summary["samples_written"], summary["samples_failed"]) == (10, 10, 0)
+    assert summary["usage"]["calls"] == 10
+    assert summary["usage"]["prompt_tokens"] == 50
+    rows = _rows(output)
+    assert sorted(row["sample_id"] for row in rows) == list(range(1, 11))
+    assert all(row[f"score.{INSTRUMENT_TYPE_FIELD}"] > 0 for row in rows)
+    assert summary["overall_experiment_score"] == round(sum(row["overall_score"] for row in rows) / 10, 2)
+
+
+def test_checkpoint_of_another_run_is_not_resumed(tmp_path, monkeypatch, capsys):
+    output = tmp_path.joinpath("results.jsonl")
+    monkeypatch.setattr(cli, "get_provider", lambda ai_provider, api_key: FlakyProvider("key"))
+    assert cli.score(_args(output)) == 0
+    assert cli.score(_args(output, "--temperature", "0.5")) == 1
+    assert "--restart" in capsys.readouterr().err
+    assert cli.score(_args(output, "--temperature", "0.5", "--restart")) == 0
+    assert json.loads(capsys.readouterr().out)["samples_resumed"] == 0
+    assert len(_rows(output)) == 10
+
+
+def test_cut_off_line_is_dropped(tmp_path):
+    checkpoint = Checkpoint(tmp_path.joinpath("run.checkpoint"))
+    assert checkpoint.open(dict(run=1)) == set()
+    checkpoint.close()
+    with open(checkpoint.path, "ab") as file:
+        file.write(b'{"sample_id": 1, "output": "a", "answer": "a", "usage": {}}\n{"sample_id": 2, "outp')
+
+    assert checkpoint.open(dict(run=1)) == {1}
+    checkpoint.close()
+    assert checkpoint.path.read_bytes().endswith(b"}\n")
+    with pytest.raises(CheckpointMismatch):
+        checkpoint.open(dict(run=2))
@@ -0,0 +1,94 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from hackathon.cache.tiered import Codec, TieredCache
+from hackathon.cache.tiers import MemoryTier, SQLiteTier
+
+ROOT_PATH = Path(__file__).parents[1]
+JSON_CODEC = Codec(encode=lambda value: json.dumps(value).encode(), decode=json.loads)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2)
+    tier.put("a", 1)
+    tier.put("b", 2)
+    tier.get("a")
+    tier.put("c", 3)
+    assert (tier.get("a"), tier.get("b"), tier.get("c")) == (1, None, 3)
+    assert tier.stats() == dict(entries=2, max_entries=2, evictions=1)
+
+
+def test_sqlite_tier_is_shared_between_processes(tmp_path):
+    path = tmp_path / "shared.sqlite"
+    tier = SQLiteTier(path, max_bytes=1024)
+    code = (
+        f"from hackathon.cache.tiers import SQLiteTier; SQLiteTier({str(path)!r}, 1024).put('stages', 'key', b'value')"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT_PATH, check=True)
+    assert tier.get("stages", "key") == b"value"
+    assert tier.get("other", "key") is None
+
+
+def test_sqlite_tier_evicts_over_size_limit(tmp_path):
+    tier = SQLiteTier(tmp_path / "shared.sqlite", max_bytes=1000)
+    tier.put("stages", "replaced", b"x" * 500)
+    tier.put("stages", "replaced", b"x" * 100)
+    assert tier.stats("stages")["bytes"] == 100
+    for index in range(10):
+        tier.put("stages", str(index), bytes(200))
+    stats = tier.stats("stages")
+    assert stats["bytes"] <= 1000
+    assert stats["evictions"] > 0
+    assert tier.get("stages", "replaced") is None
+    assert tier.get("stages", "9") == bytes(200)
+    tier.put("stages", "too large", bytes(2000))
+    assert tier.get("stages", "too large") is None
+
+
+def test_unreadable_shared_tier_is_a_miss(tmp_path):
+    path = tmp_path / "shared.sqlite"
+    tier = SQLiteTier(path, max_bytes=1000)
+    for file in tmp_path.iterdir():
+        file.write_bytes(b"not a database" * 100)
+    tier.put("stages", "key", b"value")
+    assert tier.get("stages", "key") is None
+
+
+def test_shared_hits_are_promoted_with_stats_per_tier(tmp_path):
+    shared = SQLiteTier(tmp_path / "shared.sqlite", max_bytes=1024)
+    TieredCache("stages", MemoryTier(8), [shared], JSON_CODEC).put("key", {"answer": 1})
+    cache = TieredCache("stages", MemoryTier(8), [shared], JSON_CODEC)
+
+    assert cache.get("missing") is None
+    assert cache.get("key") == {"answer": 1}
+    assert cache.get("key") == {"answer": 1}
+    memory_stats, shared_stats = cache.stats()["tiers"]
+    assert (memory_stats["tier"], memory_stats["hits"], memory_stats["misses"]) == ("memory", 1, 2)
+    assert (shared_stats["tier"], shared_stats["hits"], shared_stats["misses"]) == ("sqlite", 1, 1)
+    assert shared_stats["hit_rate"] == 0.5
+    assert shared_stats["entries"] == 1
+
+
+def test_cache_without_codec_stays_in_process(tmp_path):
+    shared = SQLiteTier(tmp_path / "shared.sqlite", max_bytes=1024)
+    cache = TieredCache("frames", MemoryTier(8), [shared])
+    cache.put("key", object())
+    assert shared.stats("frames")["entries"] == 0
+    assert [tier["tier"] for tier in cache.stats()["tiers"]] == ["memory"]
@@ -0,0 +1,148 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import json
+from typing import Optional
+
+import pytest
+
+from hackathon.cache.tiered import TieredCache
+from hackathon.cache.tiers import MemoryTier
+from hackathon.chains.definition import Chain, ChainStage, load_chain
+from hackathon.chains.executor import run_chain
+from hackathon.hackathon_settings import get_settings
+from hackathon.models.ai_models import AIScoreBody
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+
+KEYS = ["InstrumentType", "Notional"]
+
+
+class StageProvider(BaseProvider):
+    def __init__(self, fail_stages=()):
+        super().__init__(api_key="")
+        self.calls = list()
+        self.fail_stages = set(fail_stages)
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        stage = param.prompt.split()[0]
+        self.calls.append(stage)
+        if stage in self.fail_stages:
+            return ProviderAnswer(sample_id=param.sample_id, answer=self.get_error_answer() + " timeout")
+        return ProviderAnswer(sample_id=param.sample_id, answer=json.dumps({"InstrumentType": "AsianOption"}))
+
+
+def _chain(second_template: str = "second {InstrumentType} {input}") -> Chain:
+    return Chain(
+        name="test",
+        taxonomy="PricingModels",
+        stages=[
+            ChainStage(name="stage_1", template="first {input}"),
+            ChainStage(
+                name="stage_2",
+                template=second_template,
+                fields={"InstrumentType": "stage_1.InstrumentType"},
+                fixups=["instrument_type"],
+                repair=True,
+            ),
+        ],
+    )
+
+
+def _run(chain: Chain, provider: BaseProvider, cache: TieredCache, temperature: Optional[float] = 0.0):
+    body = AIScoreBody(
+        experiment_name="PricingModels-Hackathon", provider_model="gpt-4", prompt="", temperature=temperature
+    )
+    return asyncio.run(run_chain(chain, 1, "input", KEYS, body, provider, cache=cache))
+
+
+def _write_chain(tmp_path, stages):
+    (tmp_path / "one.txt").write_text("first {input}")
+    (tmp_path / "two.txt").write_text("second {InstrumentType} {input}")
+    path = tmp_path / "chain.json"
+    path.write_text(json.dumps({"taxonomy": "PricingModels", "stages": stages}))
+    return path
+
+
+@pytest.mark.parametrize("name", ["PricingModels LBG", "TermSheets LBG"])
+def test_shipped_chains_load(name):
+    chain = load_chain(get_settings().prompts_path / f"{name}.json")
+    assert [stage.name for stage in chain.stages] == ["stage_1", "stage_2"]
+    assert chain.taxonomy == name.split()[0]
+
+
+@pytest.mark.parametrize(
+    "stages, message",
+    [
+        ([{"name": "a", "prompt": "one.txt"}, {"name": "a", "prompt": "one.txt"}], "repeats stage"),
+        ([{"name": "a", "prompt": "two.txt", "fields": {"InstrumentType": "b.InstrumentType"}}], "earlier stage"),
+        ([{"name": "a", "prompt": "one.txt"}, {"name": "b", "prompt": "two.txt", "fields": {"X": "a"}}], "no source"),
+        ([{"name": "a", "prompt": "one.txt", "transforms": ["shout"]}], "unknown steps"),
+        ([], "no stages"),
+    ],
+)
+def test_invalid_chains_are_rejected(tmp_path, stages, message):
+    with pytest.raises(ValueError, match=message):
+        load_chain(_write_chain(tmp_path, stages))
+
+
+def test_only_changed_stages_run_again():
+    provider, cache = StageProvider(), TieredCache("test", MemoryTier(16))
+    first = _run(_chain(), provider, cache)
+    assert provider.calls == ["first", "second"]
+    assert json.loads(first["stage_2"].answer) == {"InstrumentType": "AsianOption"}
+
+    assert _run(_chain(), provider, cache) == first
+    assert provider.calls == ["first", "second"]
+
+    _run(_chain("second edited {InstrumentType} {input}"), provider, cache)
+    assert provider.calls == ["first", "second", "second"]
+
+
+def test_failed_stages_are_not_cached():
+    provider, cache = StageProvider(fail_stages={"second"}), TieredCache("test", MemoryTier(16))
+    _run(_chain(), provider, cache)
+    provider.fail_stages.clear()
+    result = _run(_chain(), provider, cache)
+    assert provider.calls == ["first", "second", "second"]
+    assert json.loads(result["stage_2"].answer) == {"InstrumentType": "AsianOption"}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TieredCache("test", MemoryTier(1))
+    provider = StageProvider()
+    _run(_chain(), provider, cache)
+    _run(_chain(), provider, cache)
+    # every stage evicts the result of the other one
+    assert provider.calls == ["first", "second", "first", "second"]
+
+
+def test_sampled_runs_skip_the_cache():
+    provider, cache = StageProvider(), TieredCache("test", MemoryTier(16))
+    _run(_chain(), provider, cache, temperature=0.7)
+    _run(_chain(), provider, cache, temperature=0.7)
+    assert provider.calls == ["first", "second", "first", "second"]
+
+    _run(_chain(), provider, cache, temperature=0.0)
+    _run(_chain(), provider, cache, temperature=0.0)
+    assert provider.calls == ["first", "second"] * 3
+
+
+def test_runs_without_temperature_skip_the_cache():
+    # providers sample at their default temperature when none is given
+    provider, cache = StageProvider(), TieredCache("test", MemoryTier(16))
+    _run(_chain(), provider, cache, temperature=None)
+    _run(_chain(), provider, cache, temperature=None)
+    assert provider.calls == ["first", "second", "first", "second"]
@@ -0,0 +1,66 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dateutil
+import pytest
+from dateutil.parser import parse
+
+from hackathon.scoring.comparison import NONE_FIELDS, compare_as_strings
+from hackathon.scoring.dates import MONTH_NAMES, _parse_fast, compare_as_dates, parse_date
+
+
+def _dateutil_or_none(value: str):
+    try:
+        return parse(value)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _legacy_compare_as_dates(model_value, correct_value) -> bool:
+    try:
+        model_value = str(model_value)
+        correct_value = str(correct_value)
+        return dateutil.parser.parse(model_value) == dateutil.parser.parse(correct_value)
+    except (ValueError, OverflowError):
+        return compare_as_strings(model_value=model_value, correct_value=correct_value)
+
+
+def test_fast_path_agrees_with_dateutil():
+    values = list()
+    for year in (2000, 2023, 2024):
+        for first in range(0, 33):
+            for second in range(0, 33):
+                values += [f"{year}-{first:02d}-{second:02d}", f"{year}/{first}/{second}T10:30"]
+                values += [f"{first}{separator}{second}{separator}{year}" for separator in "/.-"]
+        for name in MONTH_NAMES + [name[:3].upper() for name in MONTH_NAMES] + ["Sept", "Mayo"]:
+            for day in range(0, 33):
+                values += [f"{day} {name} {year}", f"{day:02d}-{name}-{year}", f"{name} {day}, {year}"]
+
+    fast_values = [value for value in values if _parse_fast(value) is not None]
+    assert len(fast_values) > len(values) / 2
+    for value in fast_values:
+        assert _parse_fast(value) == _dateutil_or_none(value), value
+
+
+@pytest.mark.parametrize("value", NONE_FIELDS)
+def test_none_fields_are_not_dates(value):
+    assert parse_date(value) is None
+
+
+def test_compare_as_dates_matches_legacy():
+    values = ["2012-09-27", "09/27/2012", "27 Sep 2012", "Sept 27, 2012", "2012-09-27T00:00:00", "None", "Jan", "", 5]
+    for model_value in values:
+        for correct_value in values:
+            expected = _legacy_compare_as_dates(model_value, correct_value)
+            assert compare_as_dates(model_value, correct_value) == expected, (model_value, correct_value)
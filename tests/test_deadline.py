@@ -0,0 +1,97 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+from hackathon.api import routes
+from hackathon.hackathon_settings import get_settings
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.providers.deadline import DEADLINE_EXCEEDED, LATENCY_ESTIMATES, start_deadline
+from hackathon.telemetry.usage import start_usage_meter
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+class SleepyProvider(BaseProvider):
+    """Answers odd samples at once, even samples after a long sleep."""
+
+    PROVIDER_NAME = "sleepy"
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+        self.started: list[int] = list()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        self.started.append(param.sample_id)
+        if param.sample_id % 2 == 0:
+            await asyncio.sleep(5)
+        return ProviderAnswer(sample_id=param.sample_id, answer='{"InstrumentType": "Other"}')
+
+
+def test_calls_share_the_deadline():
+    params = [ProviderParam(sample_id=sample_id, provider_model="gpt-4") for sample_id in range(1, 7)]
+
+    async def score():
+        provider = SleepyProvider("key")
+        with start_deadline(0.1) as deadline, start_usage_meter() as meter:
+            answers = await provider.run(params)
+            # no call starts once the budget is spent
+            late = await provider.run([ProviderParam(sample_id=7, provider_model="gpt-4")])
+        return provider, deadline, meter, answers + late
+
+    started = time.perf_counter()
+    provider, deadline, meter, answers = asyncio.run(score())
+    assert time.perf_counter() - started < 2
+    assert deadline.unfinished == {2, 4, 6, 7}
+    assert [answer.answer.endswith(DEADLINE_EXCEEDED) for answer in answers] == [False, True] * 3 + [True]
+    assert 7 not in provider.started
+    assert meter.total.calls == 3
+
+
+def test_call_expected_to_finish_late_is_not_started():
+    LATENCY_ESTIMATES.update("sleepy", "slow-model", 10.0)
+
+    async def score():
+        provider = SleepyProvider("key")
+        with start_deadline(1.0) as deadline:
+            await provider.run([ProviderParam(sample_id=1, provider_model="slow-model")])
+        return provider, deadline
+
+    provider, deadline = asyncio.run(score())
+    assert provider.started == []
+    assert deadline.unfinished == {1}
+
+
+def test_score_returns_the_samples_finished_in_time(client, monkeypatch):
+    monkeypatch.setattr(routes, "get_provider", lambda ai_provider, api_key: SleepyProvider(api_key))
+    monkeypatch.setattr(get_settings(), "deadline_margin", 0.0)
+    body = dict(experiment_name=EXPERIMENT_NAME, prompt="Extract the terms.", provider_model="gpt-4")
+
+    started = time.perf_counter()
+    response = client.post("/openai/score", params=dict(time_budget=0.3), json=body)
+    assert time.perf_counter() - started < 3
+    assert response.status_code == 200
+    result = response.json()
+    assert result["unscored_samples"] == 5
+    assert result["unscored_sample_ids"] == [2, 4, 6, 8, 10]
+    assert [item["sample_id"] for item in result["experiment_data"]] == [1, 3, 5, 7, 9]
+
+    # the margin takes the whole budget: every sample is unscored and the score is 0 instead of an error
+    monkeypatch.setattr(get_settings(), "deadline_margin", 1.0)
+    empty = client.post("/openai/score", params=dict(time_budget=0.3, format="compact"), json=body)
+    assert empty.status_code == 200
+    assert empty.json()["unscored_samples"] == 10
+    assert empty.json()["overall_experiment_score"] == 0.0
+    assert empty.json()["sample_ids"] == []
@@ -0,0 +1,77 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from hackathon.archive.incremental import UnitCache, unit_hash
+from hackathon.archive.store import ArchivedRun, ArchivedSamples, RunArchive
+from hackathon.models.ai_models import AIExperimentItem
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+
+
+class CountingProvider(BaseProvider):
+    PROVIDER_NAME = "counting"
+
+    def __init__(self):
+        super().__init__(api_key="")
+        self.calls = list()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        self.calls.append(param.sample_id)
+        if param.context == "fails":
+            return ProviderAnswer(sample_id=param.sample_id, answer=self.get_error_answer("timeout"))
+        return ProviderAnswer(sample_id=param.sample_id, answer=f"{param.prompt}:{param.context}")
+
+
+def _params(prompt: str, contexts: list[str], temperature: float = 0.0) -> list[ProviderParam]:
+    return [
+        ProviderParam(sample_id=index + 1, provider_model="m", prompt=prompt, context=context, temperature=temperature)
+        for index, context in enumerate(contexts)
+    ]
+
+
+def test_unit_hash_ignores_sample_position():
+    provider = CountingProvider()
+    first, second = _params("p", ["a", "a"])
+    assert unit_hash(provider, first) == unit_hash(provider, second)
+    assert unit_hash(provider, first) != unit_hash(provider, _params("p", ["a"], temperature=0.5)[0])
+    assert unit_hash(provider, first) != unit_hash(provider, _params("q", ["a"])[0])
+
+
+def test_only_changed_units_are_executed():
+    provider = CountingProvider()
+    reference = UnitCache()
+    asyncio.run(reference.run(provider, _params("p", ["a", "b", "fails"])))
+    assert provider.calls == [1, 2, 3]
+    assert len(reference.units) == 2  # error answers are never reused
+
+    provider.calls.clear()
+    units = UnitCache(reference.units)
+    # a row inserted at the top shifts sample ids, unchanged inputs are still reused
+    answers = asyncio.run(units.run(provider, _params("p", ["new", "a", "b", "fails"])))
+    assert sorted(provider.calls) == [1, 4]
+    assert [answer.answer for answer in answers[:3]] == ["p:new", "p:a", "p:b"]
+    assert units.executed == {1, 4}
+    assert len(units.units) == 3
+
+    items = [AIExperimentItem(overall_sample_score="0%", sample_id=i, output="", sample_data=[]) for i in range(1, 5)]
+    units.mark_reused(items)
+    assert [item.reused for item in items] == [False, True, True, False]
+
+
+def test_units_are_archived(tmp_path):
+    archive = RunArchive(tmp_path.joinpath("runs.sqlite"))
+    run = ArchivedRun(run_id="r", created_at=1.0, route="score", experiment_name="e", provider="p", provider_model="m")
+    archive.save_run(run, "prompt", ArchivedSamples(outputs={1: "a"}, answers={1: "a"}, units={"hash": "a"}))
+    assert archive.get_samples("r").units == {"hash": "a"}
@@ -0,0 +1,103 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+import string
+from pathlib import Path
+
+import Levenshtein
+import numpy as np
+import pytest
+
+from hackathon.scoring.comparison import normalize_string_regex
+from hackathon.scoring.instruments import (
+    InstrumentIndex,
+    InstrumentMention,
+    InstrumentScanner,
+    load_instrument_indexes,
+    select_mentioned_instrument,
+)
+
+INSTRUMENTS_PATH = Path(__file__).parents[1].joinpath("data", "instruments.json")
+
+
+def _closest(value: str, instruments: list[str]) -> str:
+    return instruments[np.argmax([Levenshtein.ratio(value, candidate) for candidate in instruments])]
+
+
+def _mutate(value: str, rng: random.Random) -> str:
+    chars = list(value)
+    for _ in range(rng.randint(0, 6)):
+        position = rng.randint(0, len(chars))
+        operation = rng.random()
+        if operation < 0.3 and chars:
+            del chars[min(position, len(chars) - 1)]
+        elif operation < 0.6:
+            chars.insert(position, rng.choice(string.ascii_letters + " -_"))
+        elif chars:
+            chars[min(position, len(chars) - 1)] = rng.choice(string.ascii_letters)
+    return "".join(chars)
+
+
+def test_vocabulary_is_loaded_normalized():
+    indexes = load_instrument_indexes(INSTRUMENTS_PATH)
+    with open(INSTRUMENTS_PATH) as f:
+        taxonomies = json.load(f)
+    assert set(indexes) == {"TermSheets", "PricingModels"}
+    for name, instruments in taxonomies.items():
+        assert indexes[name].instruments == [normalize_string_regex.sub("", instrument) for instrument in instruments]
+
+
+@pytest.mark.parametrize("size", [0, 500])
+def test_closest_matches_linear_scan(size):
+    rng = random.Random(size)
+    instruments = load_instrument_indexes(INSTRUMENTS_PATH)["TermSheets"].instruments
+    words = ["Callable", "Note", "Swap", "Linked", "Equity", "Fixed", "Rate", "Range", "Barrier", "Digital", "Basket"]
+    instruments = instruments + ["".join(rng.sample(words, rng.randint(2, 5))) for _ in range(size)]
+    instruments += ["ab", "ba"]  # equal ratios, the first in vocabulary order wins
+    index = InstrumentIndex(instruments)
+
+    values = ["", "a", "b", "None", "Bond", "ab", "ba", "ac", "Équity linked note"]
+    values += [_mutate(rng.choice(instruments), rng) for _ in range(1000)]
+    for value in values:
+        assert index.closest(value) == _closest(value, instruments), value
+    assert "ab" in index and "Bond" not in index
+
+
+def test_scanner_finds_every_mention():
+    rng = random.Random(3)
+    for _ in range(300):
+        patterns = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 30)))
+        expected = {
+            InstrumentMention(start=start, end=start + len(pattern), instrument=pattern)
+            for pattern in patterns
+            for start in range(len(text))
+            if text.startswith(pattern, start)
+        }
+        mentions = list(InstrumentScanner(patterns).scan(text))
+        assert len(mentions) == len(expected)
+        assert set(mentions) == expected
+
+
+def test_mention_selection():
+    index = load_instrument_indexes(INSTRUMENTS_PATH)["PricingModels"]
+    # a name inside a longer mentioned name does not count
+    answer = "It is a Non-Callable Fixed-ForFloatingSwap, not a CallableFixedForFloatingSwap."
+    assert index.find_mentioned(answer) == normalize_string_regex.sub("", "NonCallableFixedForFloatingSwap")
+    assert index.find_mentioned("LookbackOption or AsianOption, mostly AsianOption") == "AsianOption"
+    assert index.find_mentioned("AsianOption or LookbackOption") == "AsianOption"
+    assert index.find_mentioned("no instrument here") is None
+    assert select_mentioned_instrument([]) is None
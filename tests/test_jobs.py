@@ -0,0 +1,198 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from hackathon.api import routes, routes_jobs
+from hackathon.jobs.manager import JobManager
+from hackathon.jobs.progress import JobProgress
+from hackathon.jobs.store import (
+    STATUS_CANCELLED,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    JobStore,
+    new_job,
+)
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.scoring.experiments import read_experiment
+from hackathon.scoring.sample import ADDITIONAL_FIELDS, INPUT_FIELD
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+def _job(kind: str = "score"):
+    return new_job(kind, EXPERIMENT_NAME, "openai", "gpt-4", dict(body=dict(prompt="p")))
+
+
+def test_running_jobs_are_capped_across_workers(tmp_path):
+    store = JobStore(tmp_path.joinpath("jobs.sqlite"))
+    first, second = _job(), _job()
+    store.create(first)
+    store.create(second)
+
+    now = time.time()
+    assert store.try_start(first.job_id, max_running=1, stale_after=30, now=now) == STATUS_RUNNING
+    # the store is shared, a second worker sees the slot taken
+    assert JobStore(store.path).try_start(second.job_id, max_running=1, stale_after=30, now=now) == STATUS_QUEUED
+    assert store.get(first.job_id).request == dict(body=dict(prompt="p"))
+
+    # a worker that stopped reporting loses its jobs, the running one frees its slot
+    third = _job()
+    third.created_at = now + 60
+    store.create(third)
+    assert store.try_start(third.job_id, max_running=1, stale_after=30, now=now + 60) == STATUS_RUNNING
+    assert store.get(first.job_id).status == STATUS_FAILED
+    assert store.get(second.job_id).status == STATUS_FAILED
+
+
+def test_jobs_start_in_submission_order(tmp_path):
+    store = JobStore(tmp_path.joinpath("jobs.sqlite"))
+    first, second = _job(), _job()
+    store.create(first)
+    store.create(second)
+    assert store.try_start(second.job_id, max_running=1, stale_after=30) == STATUS_QUEUED
+    assert store.try_start(first.job_id, max_running=1, stale_after=30) == STATUS_RUNNING
+
+
+def test_cancel_queued_and_running_jobs(tmp_path):
+    store = JobStore(tmp_path.joinpath("jobs.sqlite"))
+    running, queued = _job(), _job()
+    store.create(running)
+    store.create(queued)
+    store.try_start(running.job_id, max_running=1, stale_after=30)
+
+    assert store.request_cancel(queued.job_id).status == STATUS_CANCELLED
+    assert store.try_start(queued.job_id, max_running=2, stale_after=30) == STATUS_CANCELLED
+    assert store.request_cancel(running.job_id).status == STATUS_RUNNING
+    assert store.heartbeat(running.job_id, 10, 5, 50.0) is True
+    assert store.request_cancel("unknown") is None
+
+
+def test_results_are_kept_until_pruned(tmp_path):
+    store = JobStore(tmp_path.joinpath("jobs.sqlite"))
+    job = _job()
+    store.create(job)
+    store.try_start(job.job_id, max_running=1, stale_after=30)
+    assert store.get_result(job.job_id) is None
+
+    store.finish(job.job_id, STATUS_SUCCEEDED, run_id="r", media_type="application/json", result=b'{"a": 1}')
+    assert store.get_result(job.job_id) == ("application/json", b'{"a": 1}')
+    # a finished job is never finished again, by a late cancellation or a stale check
+    store.finish(job.job_id, STATUS_FAILED, error="late")
+    assert store.get(job.job_id).status == STATUS_SUCCEEDED
+
+    assert store.prune(time.time() - 3600) == 0
+    assert store.prune(time.time() + 1) == 1
+    assert store.get(job.job_id) is None
+
+
+def test_progress_scores_answers_in_batches():
+    ground_truth = read_experiment(routes.Path(routes.get_settings().data_path, f"{EXPERIMENT_NAME}.csv"))
+    ground_truth = ground_truth.fillna('None')
+    keys = [key for key in ground_truth.columns if key not in ADDITIONAL_FIELDS and key != INPUT_FIELD]
+    correct = {key: ground_truth.iloc[0][key] for key in keys}
+
+    progress = JobProgress()
+    progress.start(len(ground_truth), ground_truth)
+    progress.sample_done(1, json.dumps(correct, default=str))
+    progress.sample_done(2, "no answer")
+    assert progress.running_score is None
+    progress.score_pending()
+    assert progress.samples_done == 2
+    assert progress.running_score == pytest.approx(50.0)
+    progress.score_pending()
+    assert progress.running_score == pytest.approx(50.0)
+
+
+def test_manager_reports_progress_and_cancels(tmp_path):
+    store = JobStore(tmp_path.joinpath("jobs.sqlite"))
+    manager = JobManager(store, max_running=1, poll_interval=0.01)
+
+    async def run_jobs():
+        release = asyncio.Event()
+
+        async def blocked(progress: JobProgress):
+            progress.samples_total = 3
+            progress.samples_done = 1
+            await release.wait()
+            return JSONResponse({"score": 1}), "run"
+
+        async def never(progress: JobProgress):
+            await asyncio.Event().wait()
+
+        first = await manager.submit(_job(), blocked)
+        second = await manager.submit(_job(), never)
+        await asyncio.sleep(0.1)
+        assert store.get(first.job_id).samples_done == 1
+        assert store.get(second.job_id).status == STATUS_QUEUED
+
+        release.set()
+        await asyncio.sleep(0.1)
+        assert store.get(second.job_id).status == STATUS_RUNNING
+        await manager.cancel(second.job_id)
+        await asyncio.sleep(0.1)
+        return first.job_id, second.job_id
+
+    first_id, second_id = asyncio.run(run_jobs())
+    assert store.get(first_id).status == STATUS_SUCCEEDED
+    assert store.get(first_id).run_id == "run"
+    assert store.get_result(first_id) == ("application/json", b'{"score":1}')
+    assert store.get(second_id).status == STATUS_CANCELLED
+
+
+class EchoProvider(BaseProvider):
+    PROVIDER_NAME = "echo"
+
+    def __init__(self, api_key: str = ""):
+        super().__init__(api_key=api_key)
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        await asyncio.sleep(0)
+        return ProviderAnswer(sample_id=param.sample_id, answer='{"InstrumentType": "Swap"}')
+
+
+def test_job_returns_the_synchronous_response(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(routes, "get_provider", lambda ai_provider, api_key: EchoProvider(api_key))
+    manager = JobManager(JobStore(tmp_path.joinpath("jobs.sqlite")), max_running=1, poll_interval=0.01)
+    monkeypatch.setattr(routes_jobs, "get_job_manager", lambda: manager)
+    body = dict(experiment_name=EXPERIMENT_NAME, provider_model="gpt-4", prompt="Extract the terms.")
+
+    response = client.post("/jobs/openai/score", json=body)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == STATUS_QUEUED
+
+    for _ in range(200):
+        job = client.get(f"/jobs/{job['job_id']}").json()
+        if job["status"] not in (STATUS_QUEUED, STATUS_RUNNING):
+            break
+        time.sleep(0.02)
+    assert job["status"] == STATUS_SUCCEEDED
+    assert job["samples_done"] == job["samples_total"]
+
+    result = client.get(f"/jobs/{job['job_id']}/result").json()
+    expected = client.post("/openai/score", json=body).json()
+    assert result["overall_experiment_score"] == expected["overall_experiment_score"]
+    assert float(result["overall_experiment_score"][:-1]) == pytest.approx(job["running_score"], abs=0.01)
+
+    assert client.post("/jobs/openai/score", json=dict(body, provider_model="unknown")).status_code == 422
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.get("/jobs/unknown/result").status_code == 404
@@ -0,0 +1,63 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from hackathon.scoring.json_extractor import extract_json
+from hackathon.scoring.sample import STATUS_MALFORMED, STATUS_NO_JSON, STATUS_SCORED, parse_answer
+
+KEYS = ["InstrumentType", "Notional", "Strike"]
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [
+        ('{"InstrumentType": "AsianOption"}', {"InstrumentType": "AsianOption"}),
+        (
+            'Result:\n```json\n{"InstrumentType": "AsianOption", "Terms": {"Strike": 5}}\n```\nHope it helps.',
+            {"InstrumentType": "AsianOption", "Terms": {"Strike": 5}},
+        ),
+        (
+            '{"InstrumentType": "Note {see below}", "Notional": 10}',
+            {"InstrumentType": "Note {see below}", "Notional": 10},
+        ),
+        ('Use {placeholders} like {x} then {"Strike": 1.5}', {"Strike": 1.5}),
+        ('Stray { before {"Notional": 100, "Strike": 2} and after', {"Notional": 100, "Strike": 2}),
+        ('{"a": "quote \\" and brace }", "Strike": 3}', {"a": 'quote " and brace }', "Strike": 3}),
+    ],
+)
+def test_extract_json(answer, expected):
+    assert extract_json(answer, KEYS) == expected
+
+
+def test_extract_json_picks_best_key_overlap():
+    answer = 'Example: {"Field": "Value"}\nAnswer: {"InstrumentType": "AsianOption", "Strike": 5}\nAlso {"Strike": 1}'
+    assert extract_json(answer, KEYS) == {"InstrumentType": "AsianOption", "Strike": 5}
+
+
+def test_extract_json_prefers_fenced_object_on_ties():
+    answer = 'Like {"Strike": 1} but\n```\n{"Strike": 2}\n```'
+    assert extract_json(answer, KEYS) == {"Strike": 2}
+
+
+@pytest.mark.parametrize(
+    "answer, status",
+    [
+        ("No JSON here", STATUS_NO_JSON),
+        ('{"InstrumentType": "AsianOption", "Strike": }', STATUS_MALFORMED),
+        ('{"InstrumentType": "AsianOption", "Legs": {"Strike": 1}}', STATUS_SCORED),
+    ],
+)
+def test_parse_answer_status(answer, status):
+    assert parse_answer(answer, KEYS)[0] == status
@@ -0,0 +1,54 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from hackathon.scoring.json_repair import repair_json
+
+KEYS = ["InstrumentType", "Notional", "Strike", "Currency"]
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [
+        ("{'InstrumentType': 'AsianOption', 'Notional': 100,}", {"InstrumentType": "AsianOption", "Notional": 100}),
+        (
+            "{InstrumentType: AsianOption, Strike: 1.5, Flag: True, Currency: None}",
+            {"InstrumentType": "AsianOption", "Strike": 1.5, "Flag": True, "Currency": None},
+        ),
+        (
+            '```json\n{\n  // type\n  "InstrumentType": "AsianOption", /* note */\n  "Strike": 5 # five\n}\n```',
+            {"InstrumentType": "AsianOption", "Strike": 5},
+        ),
+        (
+            '{"InstrumentType": "AsianOption", "Notional": 100, "Strike": 5, "Curr',
+            {"InstrumentType": "AsianOption", "Notional": 100, "Strike": 5},
+        ),
+        ('{"InstrumentType": "AsianOption", "Legs": [1, 2', {"InstrumentType": "AsianOption", "Legs": [1, 2]}),
+        ('{\n"InstrumentType": "AsianOption"\n"Notional": 100\n}', {"InstrumentType": "AsianOption", "Notional": 100}),
+        ('{"Url": http://x.com/a, "Strike": 5}', {"Url": "http://x.com/a", "Strike": 5}),
+        (
+            "InstrumentType: AsianOption\n- Notional: 100\n* Currency: 'USD'",
+            {"InstrumentType": "AsianOption", "Notional": 100, "Currency": "USD"},
+        ),
+        ("Example {x}, then {'Strike': 5, 'Currency': USD,}", {"Strike": 5, "Currency": "USD"}),
+    ],
+)
+def test_repair_json(answer, expected):
+    assert repair_json(answer, KEYS) == expected
+
+
+@pytest.mark.parametrize("answer", ["I am unable to extract the terms.", "{", "{}", "Note: see the attached"])
+def test_repair_json_gives_up(answer):
+    assert repair_json(answer, KEYS) is None
@@ -0,0 +1,107 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+from hackathon.api import routes_lbg
+from hackathon.archive.incremental import UnitCache
+from hackathon.chains.definition import Chain, ChainStage
+from hackathon.chains.executor import run_chain
+from hackathon.models.ai_models import AIScoreBody
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+class ChainProvider(BaseProvider):
+    """Holds the first prompt of sample 1 until sample 2 went through its whole chain."""
+
+    def __init__(self):
+        super().__init__(api_key="")
+        self.calls = list()
+        self.sample_2_repaired = asyncio.Event()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        stage = param.prompt.split()[0]
+        self.calls.append((param.sample_id, stage))
+        if (param.sample_id, stage) == (1, "first"):
+            await self.sample_2_repaired.wait()
+        if stage == "Convert":
+            self.sample_2_repaired.set()
+            return ProviderAnswer(sample_id=param.sample_id, answer=json.dumps({"InstrumentType": "AsianOption"}))
+        if (param.sample_id, stage) == (2, "second"):
+            return ProviderAnswer(sample_id=param.sample_id, answer="no json here")
+        return ProviderAnswer(sample_id=param.sample_id, answer=json.dumps({"InstrumentType": "LookbackOption"}))
+
+
+def test_samples_run_their_chains_independently():
+    provider = ChainProvider()
+    chain = Chain(
+        name="PricingModels LBG",
+        taxonomy="PricingModels",
+        stages=[
+            ChainStage(name="stage_1", template="first {input}"),
+            ChainStage(
+                name="stage_2",
+                template="second {InstrumentType} {input}",
+                fields={"InstrumentType": "stage_1.InstrumentType"},
+                fixups=["instrument_type"],
+                repair=True,
+            ),
+        ],
+    )
+    keys = routes_lbg._get_answer_keys(EXPERIMENT_NAME)
+    body = AIScoreBody(experiment_name=EXPERIMENT_NAME, provider_model="gpt-4", prompt="")
+
+    async def run_chains():
+        units = UnitCache()
+        chains = [run_chain(chain, sample_id, "input", keys, body, provider, units) for sample_id in (1, 2)]
+        # a barrier between the stages would never let sample 2 reach its repair
+        return await asyncio.wait_for(asyncio.gather(*chains), timeout=5)
+
+    results_1, results_2 = asyncio.run(run_chains())
+    assert json.loads(results_1["stage_2"].answer) == {"InstrumentType": "LookbackOption"}
+    assert results_2["stage_2"].output == "no json here"
+    assert json.loads(results_2["stage_2"].answer) == {"InstrumentType": "AsianOption"}
+    assert provider.calls.index((2, "Convert")) < provider.calls.index((1, "second"))
+
+
+class UnrepairedProvider(BaseProvider):
+    """Answers stage 1 with prose, the instrument type only comes back once the answer is converted to JSON."""
+
+    def __init__(self):
+        super().__init__(api_key="")
+        self.prompts = list()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        self.prompts.append(param.prompt)
+        if param.prompt.startswith("Analyze"):
+            return ProviderAnswer(sample_id=param.sample_id, answer="Hard to tell, it pays at expiry.")
+        return ProviderAnswer(sample_id=param.sample_id, answer=json.dumps({"InstrumentType": "AsianOption"}))
+
+
+def test_run_repairs_a_stage_1_answer_that_is_not_json(client, monkeypatch):
+    provider = UnrepairedProvider()
+    monkeypatch.setattr(routes_lbg, "get_provider", lambda ai_provider, api_key: provider)
+    body = dict(experiment_name=EXPERIMENT_NAME, provider_model="gpt-4", sample_id=1, input="double n = 1;")
+
+    for _ in range(2):
+        response = client.post("/lbg/openai/run", json=body)
+        assert response.status_code == 200
+    # a repeated run asks the model again, single sample runs do not use the stage cache
+    assert len(provider.prompts) == 6
+    _, repair, stage_2 = provider.prompts[:3]
+    assert repair.strip().startswith("Convert")
+    assert "The product is instrument type AsianOption." in stage_2
@@ -0,0 +1,51 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from hackathon.api.negotiation import COMPACT_MEDIA_TYPE, compact_score_response, get_score_format
+from hackathon.models.ai_models import AIScoreFormat
+
+
+def test_score_format_negotiation():
+    assert get_score_format() == AIScoreFormat.FULL
+    assert get_score_format(accept="application/json") == AIScoreFormat.FULL
+    assert get_score_format(accept=f"{COMPACT_MEDIA_TYPE}, application/json;q=0.5") == AIScoreFormat.COMPACT
+    assert get_score_format(response_format=AIScoreFormat.COMPACT) == AIScoreFormat.COMPACT
+    # an explicit query flag wins over the Accept header
+    assert get_score_format(response_format=AIScoreFormat.FULL, accept=COMPACT_MEDIA_TYPE) == AIScoreFormat.FULL
+
+
+def test_compact_score_response():
+    response = compact_score_response(
+        dict(fields=["InstrumentType"], sample_ids=[1], scores=[[None]]),
+        overall_experiment_score=0.0,
+        reused=[False],
+        usage=None,
+        trace=None,
+        run_id="run",
+    )
+    assert response.media_type == COMPACT_MEDIA_TYPE
+    assert json.loads(response.body) == dict(
+        overall_experiment_score=0.0,
+        fields=["InstrumentType"],
+        sample_ids=[1],
+        scores=[[None]],
+        reused=[False],
+        usage=None,
+        trace=None,
+        run_id="run",
+        unscored_samples=0,
+        unscored_sample_ids=[],
+    )
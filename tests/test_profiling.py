@@ -0,0 +1,150 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from hackathon.api import routes
+from hackathon.hackathon_settings import get_settings
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry import profiling
+from hackathon.telemetry.profiling import (
+    ALLOCATION_PROFILING_BUSY,
+    EXECUTOR_THREAD_PREFIXES,
+    PROFILE_FILES_HEADER,
+    PROFILE_SKIPPED_HEADER,
+    SPEEDSCOPE_SCHEMA,
+    BackgroundProfiler,
+    SamplingProfiler,
+    allocations_to_speedscope,
+)
+
+ADMIN_KEY = "admin-secret"
+BODY = dict(experiment_name="PricingModels-Hackathon", prompt="Extract the terms.", provider_model="gpt-4")
+
+
+class InstantProvider(BaseProvider):
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        return ProviderAnswer(sample_id=param.sample_id, answer='{"InstrumentType": "Other"}')
+
+
+@pytest.fixture
+def profiled_app(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), "admin_api_key", ADMIN_KEY)
+    monkeypatch.setattr(get_settings(), "profiles_path", tmp_path)
+    monkeypatch.setattr(routes, "get_provider", lambda ai_provider, api_key: InstantProvider(api_key))
+    return tmp_path
+
+
+def _parked(event: threading.Event) -> None:
+    event.wait()
+
+
+def test_sampling_profiler_samples_the_loop_and_executor_threads():
+    release = threading.Event()
+    threads = [
+        threading.Thread(target=_parked, args=(release,), name=name, daemon=True)
+        for name in ("asyncio_test", "exporter")
+    ]
+    for thread in threads:
+        thread.start()
+    profiler = SamplingProfiler(0.001, threading.get_ident())
+    profiler.start()
+    time.sleep(0.05)
+    profiler.stop()
+    release.set()
+
+    assert {threading.current_thread().name, "asyncio_test"} <= set(profiler.samples)
+    assert "exporter" not in profiler.samples
+    assert all(
+        name.startswith(EXECUTOR_THREAD_PREFIXES) for name in set(profiler.samples) - {threading.current_thread().name}
+    )
+
+
+def test_memory_profile_of_a_concurrent_request_is_reported_busy(client, profiled_app):
+    tracemalloc.start()
+    try:
+        response = client.post("/openai/score", json=BODY, headers={"profile": "memory", "admin-key": ADMIN_KEY})
+    finally:
+        tracemalloc.stop()
+    assert response.status_code == 200
+    assert response.headers[PROFILE_FILES_HEADER] == ""
+    assert response.headers[PROFILE_SKIPPED_HEADER] == ALLOCATION_PROFILING_BUSY
+    assert list(profiled_app.iterdir()) == []
+
+
+def _assert_speedscope(profile: dict, unit: str) -> None:
+    assert profile["$schema"] == SPEEDSCOPE_SCHEMA
+    frame_count = len(profile["shared"]["frames"])
+    assert profile["profiles"]
+    for sampled in profile["profiles"]:
+        assert sampled["type"] == "sampled" and sampled["unit"] == unit
+        assert len(sampled["samples"]) == len(sampled["weights"])
+        assert all(0 <= index < frame_count for stack in sampled["samples"] for index in stack)
+
+
+def test_score_is_profiled_for_admins_only(client, profiled_app):
+    response = client.post("/openai/score", json=BODY, headers={"profile": "all"})
+    assert response.status_code == 200
+    assert PROFILE_FILES_HEADER not in response.headers
+    assert list(profiled_app.iterdir()) == []
+
+    response = client.post("/openai/score", json=BODY, headers={"profile": "all", "admin-key": ADMIN_KEY})
+    assert response.status_code == 200
+    file_names = response.headers[PROFILE_FILES_HEADER].split(",")
+    assert [name.split(".", 1)[1] for name in file_names] == ["cpu.speedscope.json", "memory.speedscope.json"]
+    assert client.get("/admin/profiles", headers={"admin-key": ADMIN_KEY}).json() == sorted(file_names)
+    for file_name, unit in zip(file_names, ["seconds", "bytes"]):
+        profile = client.get(f"/admin/profiles/{file_name}", headers={"admin-key": ADMIN_KEY})
+        _assert_speedscope(profile.json(), unit)
+
+
+def test_allocations_to_speedscope():
+    tracemalloc.start(8)
+    try:
+        blocks = [bytearray(1024) for _ in range(100)]
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    profile = json.loads(json.dumps(allocations_to_speedscope(snapshot, "allocations")))
+
+    _assert_speedscope(profile, "bytes")
+    sampled = profile["profiles"][0]
+    assert sampled["endValue"] == sum(sampled["weights"]) >= 100 * 1024
+    assert all(frame["name"] == f"{frame['file']}:{frame['line']}" for frame in profile["shared"]["frames"])
+    assert not any(frame["file"] == tracemalloc.__file__ for frame in profile["shared"]["frames"])
+    assert blocks
+
+
+def test_hot_frames_aggregate_the_buckets(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_api_key", ADMIN_KEY)
+    main, score, parse = ("main", "app.py", 1), ("score", "engine.py", 10), ("parse", "dates.py", 20)
+    profiler = BackgroundProfiler(interval=0.05, window_minutes=2)
+    profiler.buckets.append(collections.Counter({(main, score): 3}))
+    profiler.buckets.append(collections.Counter({(main, score): 1, (main, score, parse): 2}))
+    monkeypatch.setattr(profiling, "_background_profiler", profiler)
+
+    response = client.get("/admin/profile/hot-frames", params=dict(top=5), headers={"admin-key": ADMIN_KEY})
+    assert response.status_code == 200
+    assert [(frame["function"], frame["self_samples"], frame["total_samples"]) for frame in response.json()] == [
+        ("score", 4, 6),
+        ("parse", 2, 2),
+    ]
+    assert [frame["self_pct"] for frame in response.json()] == [66.67, 33.33]
+    assert client.get("/admin/profile/hot-frames").status_code == 403
@@ -0,0 +1,111 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from hackathon.providers.base_provider import BaseProvider, ProviderParam
+from hackathon.providers.fireworks_provider import FireworksProvider
+from hackathon.providers.openai_provider import OpenAIProvider
+from hackathon.providers.replicate_provider import ReplicateProvider
+
+PARAM = ProviderParam(sample_id=1, provider_model="llama-2-7b-chat", prompt="Extract.", context="input")
+
+
+class _Predictions:
+    """Replicate predictions API answering with the given statuses, one per request."""
+
+    def __init__(self, *predictions: SimpleNamespace):
+        self.predictions = list(predictions)
+
+    async def async_create(self, **kwargs) -> SimpleNamespace:
+        return self.predictions.pop(0)
+
+    async def async_get(self, prediction_id: str) -> SimpleNamespace:
+        return self.predictions.pop(0)
+
+
+def _prediction(status: str, **fields) -> SimpleNamespace:
+    return SimpleNamespace(**{**dict(id="p1", status=status, output=None, metrics=None, error=None), **fields})
+
+
+class _OpenAIResponse(dict):
+    response_ms = 120
+
+
+def _stub(monkeypatch, provider: BaseProvider, method: str, response) -> None:
+    async def create(param: ProviderParam):
+        return response
+
+    monkeypatch.setattr(provider, method, create)
+
+
+def test_openai_usage(monkeypatch):
+    provider = OpenAIProvider(api_key="key")
+    response = _OpenAIResponse(
+        choices=[dict(message=dict(content="answer"))], usage=dict(prompt_tokens=12, completion_tokens=3)
+    )
+    _stub(monkeypatch, provider, "_openai_create", response)
+
+    answer = asyncio.run(provider.get_answer(PARAM))
+    assert answer.answer == "answer"
+    assert (answer.usage.prompt_tokens, answer.usage.completion_tokens) == (12, 3)
+    assert answer.usage.provider_time_ms == 120
+
+    # a response without usage still counts as a call
+    _stub(monkeypatch, provider, "_openai_create", _OpenAIResponse(choices=[dict(message=dict(content="answer"))]))
+    assert asyncio.run(provider.get_answer(PARAM)).usage.total_tokens == 0
+
+
+def test_fireworks_usage(monkeypatch):
+    provider = FireworksProvider(api_key="key")
+    choices = [SimpleNamespace(text="answer")]
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=None)
+    _stub(monkeypatch, provider, "_fireworks_create", SimpleNamespace(choices=choices, usage=usage))
+
+    answer = asyncio.run(provider.get_answer(PARAM))
+    assert answer.answer == "answer"
+    assert (answer.usage.prompt_tokens, answer.usage.completion_tokens) == (12, 0)
+    assert answer.usage.provider_time_ms is None
+
+
+def test_replicate_usage(monkeypatch):
+    provider = ReplicateProvider(api_key="key")
+    metrics = dict(input_token_count=12, output_token_count=3, predict_time=0.25)
+    _stub(monkeypatch, provider, "_replicate_run", _prediction("succeeded", output=["ans", "wer"], metrics=metrics))
+
+    answer = asyncio.run(provider.get_answer(PARAM))
+    assert answer.answer == "answer"
+    assert (answer.usage.prompt_tokens, answer.usage.completion_tokens) == (12, 3)
+    assert answer.usage.provider_time_ms == 250.0
+
+
+@pytest.mark.parametrize("status", ["failed", "canceled"])
+def test_replicate_prediction_without_success_is_an_error(status):
+    provider = ReplicateProvider(api_key="key")
+    # every retry attempt polls once before the prediction ends
+    predictions = _Predictions(
+        *[
+            prediction
+            for _ in range(BaseProvider.RETRY_ATTEMPT)
+            for prediction in (_prediction("processing"), _prediction(status))
+        ]
+    )
+    provider.replicate_client = SimpleNamespace(poll_interval=0, predictions=predictions)
+
+    answer = asyncio.run(provider.get_answer(PARAM))
+    assert answer.answer == BaseProvider.get_error_answer(f"Prediction {status}.")
+    assert answer.usage is None
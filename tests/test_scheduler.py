@@ -0,0 +1,131 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.providers.scheduler import LANE_BULK, LANE_INTERACTIVE, FairScheduler, get_scheduler, start_scheduling
+
+
+async def _call(scheduler: FairScheduler, tenant: str, lane: str, started: list, release: asyncio.Event) -> None:
+    async with scheduler.slot(tenant, lane):
+        started.append(tenant if lane == LANE_BULK else f"{tenant}:{lane}")
+        await release.wait()
+
+
+def test_interactive_calls_do_not_wait_for_bulk_calls():
+    async def schedule():
+        scheduler = FairScheduler(capacity=3, interactive_reserve=1)
+        started, release = list(), asyncio.Event()
+        bulk = [asyncio.create_task(_call(scheduler, "a", LANE_BULK, started, release)) for _ in range(10)]
+        await asyncio.sleep(0)
+        assert started == ["a", "a"]
+        interactive = asyncio.create_task(_call(scheduler, "b", LANE_INTERACTIVE, started, asyncio.Event()))
+        await asyncio.sleep(0)
+        stats = {(item["lane"], item["tenant"]): (item["queued"], item["in_flight"]) for item in scheduler.stats()}
+        interactive.cancel()
+        release.set()
+        await asyncio.gather(*bulk, interactive, return_exceptions=True)
+        return started, stats, scheduler.stats()
+
+    started, stats, final_stats = asyncio.run(schedule())
+    assert started[:3] == ["a", "a", "b:interactive"]
+    assert stats == {(LANE_BULK, "a"): (8, 2), (LANE_INTERACTIVE, "b"): (0, 1)}
+    assert len(started) == 11
+    assert final_stats == []
+
+
+def test_tenants_share_slots_by_weight():
+    order = list()
+
+    async def schedule():
+        scheduler = FairScheduler(capacity=1, weights={"a": 2.0})
+        release = asyncio.Event()
+        holder = asyncio.create_task(_call(scheduler, "c", LANE_BULK, list(), release))
+        await asyncio.sleep(0)
+
+        async def call(tenant: str) -> None:
+            async with scheduler.slot(tenant, LANE_BULK):
+                order.append(tenant)
+
+        calls = [asyncio.create_task(call(tenant)) for tenant in ["a"] * 6 + ["b"] * 6]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *calls)
+
+    asyncio.run(schedule())
+    # while both tenants wait, a with twice the weight gets two slots for every slot of b
+    assert order[:6].count("a") == 4
+    assert sorted(order) == ["a"] * 6 + ["b"] * 6
+
+
+def test_tenant_weights_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("SCHEDULER_TENANT_WEIGHTS", '{"a": 2, "b": 0.5}')
+    assert Settings().scheduler_tenant_weights == {"a": 2.0, "b": 0.5}
+    for weights in ('{"a": 0}', '{"a": -1}'):
+        monkeypatch.setenv("SCHEDULER_TENANT_WEIGHTS", weights)
+        with pytest.raises(ValidationError, match="SCHEDULER_TENANT_WEIGHTS"):
+            Settings()
+
+
+def test_tenant_in_flight_cap():
+    async def schedule():
+        scheduler = FairScheduler(capacity=4, tenant_max_in_flight=2)
+        started, release = list(), asyncio.Event()
+        calls = [asyncio.create_task(_call(scheduler, "a", LANE_BULK, started, release)) for _ in range(4)]
+        await asyncio.sleep(0)
+        calls += [asyncio.create_task(_call(scheduler, "b", LANE_BULK, started, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        snapshot = list(started)
+        release.set()
+        await asyncio.gather(*calls)
+        return snapshot
+
+    assert asyncio.run(schedule()) == ["a", "a", "b", "b"]
+
+
+class SlowProvider(BaseProvider):
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        return ProviderAnswer(sample_id=param.sample_id, answer="{}")
+
+
+def test_provider_calls_of_a_request_are_scheduled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "scheduler_capacity", 6)
+    monkeypatch.setattr(get_settings(), "scheduler_interactive_reserve", 2)
+    params = [ProviderParam(sample_id=index, provider_model="gpt-4") for index in range(1, 21)]
+
+    async def score():
+        scheduled, unscheduled = SlowProvider("key"), SlowProvider("key")
+        with start_scheduling("key", LANE_BULK):
+            await scheduled.run(params)
+        await unscheduled.run(params)
+        return scheduled, unscheduled, get_scheduler().stats()
+
+    scheduled, unscheduled, stats = asyncio.run(score())
+    assert scheduled.max_in_flight == 4
+    assert unscheduled.max_in_flight == 20
+    assert stats == []
@@ -0,0 +1,140 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from hackathon.providers.base_provider import BaseProvider
+from hackathon.scoring.engine import score_experiment
+from hackathon.scoring.sample import (
+    ADDITIONAL_FIELDS,
+    INPUT_FIELD,
+    INSTRUMENT_TYPE_FIELD,
+    PLACE_HOLDER,
+    extract_sample_data,
+)
+
+DATA_PATH = Path(__file__).parents[1].joinpath("data")
+
+
+def _perturb(value, rng: random.Random):
+    choice = rng.randrange(12)
+    if choice == 0:
+        return None
+    if choice == 1:
+        return rng.choice(["Null", "NaN", "Unknown", "", "n/a"])
+    if choice == 2:
+        return str(value)
+    if choice == 3:
+        return f" {str(value).upper()} "
+    if choice == 4:
+        return [value]
+    if choice == 5 and isinstance(value, (int, float)):
+        return value + rng.choice([0.000001, 1, -0.5])
+    if choice == 6:
+        return rng.choice([True, False, 0, 1, 2.5, "2023-01-05", "Jan 5, 2023", "05/01/2023"])
+    if choice == 7:
+        return {"value": value}
+    return value
+
+
+def _random_answer(correct_answer: dict, rng: random.Random) -> str:
+    kind = rng.randrange(10)
+    if kind == 0:
+        return BaseProvider.get_error_answer() + " timeout"
+    if kind == 1:
+        return "I could not find the terms."
+    if kind == 2:
+        return '{"InstrumentType": "Swap", "Notional": }'
+    answer = {key: _perturb(value, rng) for key, value in correct_answer.items() if rng.random() > 0.1}
+    if kind == 3:
+        answer.pop(INSTRUMENT_TYPE_FIELD, None)
+    elif kind == 4:
+        answer[INSTRUMENT_TYPE_FIELD] = "Other"
+    elif kind > 5:
+        answer[INSTRUMENT_TYPE_FIELD] = correct_answer[INSTRUMENT_TYPE_FIELD]
+    return "Here it is:\n" + json.dumps(answer, default=str)
+
+
+@pytest.mark.parametrize("experiment_name", ["PricingModels-Hackathon", "TermSheets-Hackathon"])
+def test_engine_matches_scalar_scoring(experiment_name):
+    ground_truth = pd.read_csv(DATA_PATH.joinpath(f"{experiment_name}.csv"), header=0).fillna("None")
+    rng = random.Random(42)
+    for _ in range(20):
+        answers = dict()
+        for index, row in ground_truth.iterrows():
+            correct_answer = {
+                key: row[key] for key in row.keys() if key not in ADDITIONAL_FIELDS and key != INPUT_FIELD
+            }
+            if rng.random() > 0.1:
+                answers[int(index) + 1] = _random_answer(correct_answer, rng)
+
+        scores = score_experiment(answers, ground_truth)
+
+        expected_scores = list()
+        for index, row in ground_truth.iterrows():
+            if int(index) + 1 not in answers:
+                continue
+            expected_score, expected_items = extract_sample_data(answer=answers[int(index) + 1], correct_answer=row)
+            row_index = scores.sample_ids.index(int(index) + 1)
+            assert scores.sample_items(row_index) == expected_items
+            assert str(round(float(scores.overall_scores[row_index]), 2)) == str(round(expected_score, 2))
+            expected_scores.append(expected_score)
+        if expected_scores:
+            assert scores.average_score == sum(expected_scores) / len(expected_scores)
+
+
+def test_columns_match_items():
+    ground_truth = pd.read_csv(DATA_PATH.joinpath("TermSheets-Hackathon.csv"), header=0).fillna("None")
+    rng = random.Random(7)
+    answers = dict()
+    for index, row in ground_truth.iterrows():
+        correct_answer = {key: row[key] for key in row.keys() if key not in ADDITIONAL_FIELDS and key != INPUT_FIELD}
+        answers[int(index) + 1] = _random_answer(correct_answer, rng)
+    scores = score_experiment(answers, ground_truth)
+
+    columns = scores.columns(outputs=answers)
+    json.dumps(columns, allow_nan=False)
+    assert columns["outputs"] == [answers[sample_id] for sample_id in scores.sample_ids]
+    assert "outputs" not in scores.columns()
+    for row, status in enumerate(columns["statuses"]):
+        assert columns["overall_sample_scores"][row] == scores.overall_scores[row]
+        if status != "scored":
+            assert columns["scores"][row] == [None] * len(columns["fields"])
+            continue
+        for item in scores.sample_items(row):
+            column = columns["fields"].index(item.field)
+            assert str(round(columns["scores"][row][column], 2)) + "%" == item.score
+            assert columns["correct_values"][row][column] == item.correct
+            model_value = columns["model_values"][row][column]
+            assert item.model == (model_value if model_value is not None else PLACE_HOLDER)
+
+
+def test_ground_truth_without_instrument_type():
+    ground_truth = pd.DataFrame({INPUT_FIELD: ["a", "b", "c"], "Notional": [100, 200, 300], "Currency": ["EUR"] * 3})
+    answers = {
+        1: BaseProvider.get_error_answer("timeout"),
+        2: json.dumps(dict(Notional=200, Currency="USD")),
+        3: "no json here",
+    }
+    scores = score_experiment(answers, ground_truth)
+
+    assert scores.statuses == ["error", "scored", "no_json"]
+    assert sorted(scores.scored_fields) == ["Currency", "Notional"]
+    assert scores.overall_scores.tolist() == [0.0, 50.0, 0.0]
+    assert {item.field: item.score for item in scores.sample_items(1)} == dict(Notional="50.0%", Currency="0.0%")
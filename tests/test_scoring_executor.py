@@ -0,0 +1,48 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from hackathon.hackathon_settings import Settings
+from hackathon.scoring import executor
+from hackathon.scoring.engine import score_experiment
+
+DATA_PATH = Path(__file__).parents[1].joinpath("data")
+
+
+@pytest.mark.parametrize("scoring_executor", ["none", "thread", "process"])
+def test_chunked_scoring_matches_inline(monkeypatch, scoring_executor):
+    settings = Settings(scoring_executor=scoring_executor, scoring_workers=2, scoring_chunk_size=3)
+    monkeypatch.setattr(executor, "get_settings", lambda: settings)
+    ground_truth = pd.read_csv(DATA_PATH.joinpath("TermSheets-Hackathon.csv"), header=0).fillna("None")
+    answers = {
+        int(index) + 1: json.dumps({"InstrumentType": row["InstrumentType"], "Notional": row["Notional"]})
+        if index % 3
+        else "{InstrumentType: missing"
+        for index, row in ground_truth.iterrows()
+    }
+    try:
+        scores, items = asyncio.run(executor.score_answers(answers, ground_truth))
+    finally:
+        executor.shutdown_scoring_executor()
+
+    expected = score_experiment(answers, ground_truth)
+    assert scores.sample_ids == expected.sample_ids
+    assert scores.average_score == expected.average_score
+    assert items == expected.experiment_items(outputs=answers)
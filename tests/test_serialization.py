@@ -0,0 +1,109 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from hackathon.api import serialization
+from hackathon.api.compression import CompressionMiddleware, brotli
+from hackathon.api.serialization import FastJSONResponse
+from hackathon.models.ai_models import AIExperimentItem, AIRunResponse, AISampleItem, SampleInputResponse
+
+PAYLOAD = {"outputs": ["answer " * 50] * 20, "scores": [[100.0, None, 0.5]] * 20, "sample_ids": [1, 2]}
+
+
+def _run_response() -> AIRunResponse:
+    sample_data = [AISampleItem(field="Notional", model="1000", correct="1000", score="100.0%")]
+    return AIRunResponse(overall_sample_score="100.0%", output='{"Notional": 1000}', sample_data=sample_data)
+
+
+def test_models_render_as_their_json_dump():
+    response = _run_response()
+    assert json.loads(FastJSONResponse(response).body) == json.loads(response.model_dump_json())
+
+    inputs = [SampleInputResponse(index=1, value="first"), SampleInputResponse(index=2, value="second")]
+    assert json.loads(FastJSONResponse(inputs).body) == [
+        {"index": 1, "value": "first"},
+        {"index": 2, "value": "second"},
+    ]
+    assert FastJSONResponse([]).body == b"[]"
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_plain_content_renders_with_and_without_orjson(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert json.loads(FastJSONResponse(PAYLOAD).body) == PAYLOAD
+    assert json.loads(FastJSONResponse({1: "é"}).body) == {"1": "é"}
+
+
+def _app(response: Response) -> TestClient:
+    app = Starlette(routes=[Route("/", lambda request: response)])
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    return TestClient(app)
+
+
+def test_large_json_is_compressed_with_negotiated_encoding():
+    client = _app(FastJSONResponse(PAYLOAD))
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(json.dumps(PAYLOAD))
+    assert response.json() == PAYLOAD
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == ("br" if brotli is not None else "gzip")
+    assert response.json() == PAYLOAD
+
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == PAYLOAD
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        FastJSONResponse({"small": True}),
+        Response(b"\x89PNG" * 100, media_type="image/png"),
+        Response(gzip.compress(b"x" * 1000), media_type="application/json", headers={"content-encoding": "gzip"}),
+        StreamingResponse(iter([b"[1,", b"2]" * 100]), media_type="application/json"),
+    ],
+    ids=["small", "binary", "encoded", "streamed"],
+)
+def test_other_responses_pass_through(response):
+    body = response.body if hasattr(response, "body") else None
+    result = _app(response).get("/", headers={"Accept-Encoding": "gzip"})
+    assert result.headers.get("content-encoding") == response.headers.get("content-encoding")
+    if body is not None and "content-encoding" not in response.headers:
+        assert result.content == body
+
+
+def test_text_is_compressed():
+    response = _app(PlainTextResponse("text " * 100)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "text " * 100
+
+
+def test_experiment_item_usage_is_kept():
+    item = AIExperimentItem(overall_sample_score="0%", sample_id=1, output="", sample_data=[])
+    assert json.loads(FastJSONResponse([item]).body)[0]["reused"] is False
@@ -0,0 +1,104 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import json
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from hackathon.api.static_files import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    PrecompressedStaticFiles,
+    brotli,
+    precompress_static,
+)
+
+SCRIPT = b"console.log('hackathon');\n" * 200
+PAGE = b"<html><body>" + b"<div>hackathon</div>" * 100 + b"</body></html>"
+
+
+@pytest.fixture
+def static_path(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "static" / "js" / "main.abc123.js").write_bytes(SCRIPT)
+    (tmp_path / "index.html").write_bytes(PAGE)
+    manifest = {"files": {"main.js": "/static/js/main.abc123.js", "index.html": "/index.html"}}
+    (tmp_path / "asset-manifest.json").write_text(json.dumps(manifest))
+    return tmp_path
+
+
+def _client(static_path) -> TestClient:
+    app = Starlette(routes=[Mount("/", app=PrecompressedStaticFiles(directory=static_path, html=True))])
+    return TestClient(app)
+
+
+def test_precompress_writes_fresh_variants_once(static_path):
+    written = precompress_static(static_path)
+    script_path = static_path / "static" / "js" / "main.abc123.js"
+    assert gzip.decompress(script_path.with_name("main.abc123.js.gz").read_bytes()) == SCRIPT
+    if brotli is not None:
+        assert brotli.decompress(script_path.with_name("main.abc123.js.br").read_bytes()) == SCRIPT
+    # the manifest is too small to be worth compressing
+    assert {path.stem for path in written} == {"main.abc123.js", "index.html"}
+    assert precompress_static(static_path) == []
+
+
+def test_fingerprinted_assets_are_immutable_and_precompressed(static_path):
+    precompress_static(static_path)
+    client = _client(static_path)
+
+    response = client.get("/static/js/main.abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-type"].startswith(("application/javascript", "text/javascript"))
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == SCRIPT
+
+    response = client.get("/static/js/main.abc123.js", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.content == SCRIPT
+
+
+def test_stale_variants_are_not_served(static_path):
+    precompress_static(static_path)
+    script_path = static_path / "static" / "js" / "main.abc123.js"
+    variant_stat = script_path.with_name("main.abc123.js.gz").stat()
+    os.utime(script_path, ns=(variant_stat.st_atime_ns, variant_stat.st_mtime_ns + 1_000_000_000))
+
+    response = _client(static_path).get("/static/js/main.abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == SCRIPT
+
+
+def test_index_is_revalidated_with_content_etag(static_path):
+    client = _client(static_path)
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    etag = response.headers["etag"]
+
+    # the ETag follows the content, not the modification time
+    os.utime(static_path / "index.html", ns=(0, 0))
+    response = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    (static_path / "index.html").write_bytes(PAGE + b"\n")
+    response = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200
@@ -0,0 +1,147 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+from pydantic_settings.sources import SettingsError
+
+from hackathon.api import routes_sweep
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.models.ai_models import AIProvider, AISweepBody
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.scoring.experiments import read_experiment
+from hackathon.scoring.sample import INSTRUMENT_TYPE_FIELD
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+def test_grid_only_varies_supported_params():
+    body = AISweepBody(
+        experiment_name=EXPERIMENT_NAME,
+        prompt="p",
+        candidates=[
+            dict(provider="openai", provider_model="gpt-4"),
+            dict(provider="fireworks", provider_model="llama-v2-7b-chat"),
+        ],
+        temperature=[0.0, 0.5],
+        top_p=[0.5, 0.9],
+        seed=[1, 2],
+    )
+    runs = routes_sweep.sweep_runs(body)
+    openai_runs = [run_body for ai_provider, run_body in runs if ai_provider == AIProvider.OPENAI]
+    # openai only takes a temperature, fireworks a temperature and top_p, neither a seed
+    assert [(run_body.temperature, run_body.top_p, run_body.seed) for run_body in openai_runs] == [
+        (0.0, None, None),
+        (0.5, None, None),
+    ]
+    assert len(runs) == 2 + 4
+
+
+def test_provider_concurrency_is_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("PROVIDER_CONCURRENCY", '{"openai": 4}')
+    assert Settings().provider_concurrency == {"openai": 4}
+    monkeypatch.setenv("PROVIDER_CONCURRENCY", '{"openai": 0}')
+    with pytest.raises(ValidationError, match="PROVIDER_CONCURRENCY"):
+        Settings()
+    # a malformed value fails when the settings load, not when the module is imported
+    monkeypatch.setenv("PROVIDER_CONCURRENCY", "openai=4")
+    with pytest.raises(SettingsError, match="provider_concurrency"):
+        Settings()
+
+
+class TemperatureProvider(BaseProvider):
+    """Answers the instrument type correctly at temperature 0 only."""
+
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+        experiment = read_experiment(Path(get_settings().data_path, f"{EXPERIMENT_NAME}.csv"))
+        self.instrument_types = experiment[INSTRUMENT_TYPE_FIELD].tolist()
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        TemperatureProvider.in_flight += 1
+        TemperatureProvider.max_in_flight = max(TemperatureProvider.max_in_flight, TemperatureProvider.in_flight)
+        await asyncio.sleep(0.001)
+        TemperatureProvider.in_flight -= 1
+        instrument_type = self.instrument_types[param.sample_id - 1] if param.temperature == 0 else "Other"
+        return ProviderAnswer(sample_id=param.sample_id, answer=json.dumps({INSTRUMENT_TYPE_FIELD: instrument_type}))
+
+
+def test_sweep_ranks_every_combination(client, monkeypatch):
+    monkeypatch.setattr(routes_sweep, "get_provider", lambda ai_provider, api_key: TemperatureProvider(api_key))
+    monkeypatch.setitem(get_settings().provider_concurrency, "openai", 3)
+    body = dict(
+        experiment_name=EXPERIMENT_NAME,
+        prompt="Extract the terms.",
+        candidates=[dict(provider="openai", provider_model="gpt-4"), dict(provider="openai", provider_model="gpt-4")],
+        temperature=[0.7, 0, 0.2],
+    )
+
+    response = client.post("/sweep", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert [run["temperature"] for run in result["runs"]][0] == 0
+    assert len(result["runs"]) == 3
+    best, worse = result["runs"][0], result["runs"][1]
+    assert best["overall_experiment_score"] > worse["overall_experiment_score"]
+    assert best["field_scores"][INSTRUMENT_TYPE_FIELD] == 100.0
+    assert worse["field_scores"][INSTRUMENT_TYPE_FIELD] == 0.0
+    assert list(best["field_scores"]) == result["fields"]
+    assert best["usage"]["calls"] == 10
+    assert TemperatureProvider.max_in_flight <= 3
+
+    too_many = dict(body, temperature=[index / 100 for index in range(get_settings().sweep_max_runs + 1)])
+    assert client.post("/sweep", json=too_many).status_code == 422
+    unsupported = dict(body, candidates=[dict(provider="openai", provider_model="llama-v2-7b-chat")])
+    assert client.post("/sweep", json=unsupported).status_code == 422
+
+
+class FailingProvider(TemperatureProvider):
+    """Fails every call at temperature 0.2."""
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        if param.temperature == 0.2:
+            raise RuntimeError("provider went away")
+        return await super().get_answer(param)
+
+
+def test_sweep_reports_failed_combinations(client, monkeypatch):
+    monkeypatch.setattr(routes_sweep, "get_provider", lambda ai_provider, api_key: FailingProvider(api_key))
+    body = dict(
+        experiment_name=EXPERIMENT_NAME,
+        prompt="Extract the terms.",
+        candidates=[dict(provider="openai", provider_model="gpt-4")],
+        temperature=[0.7, 0, 0.2],
+    )
+
+    response = client.post("/sweep", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert [run["temperature"] for run in result["runs"]] == [0, 0.7]
+    assert result["fields"] == list(result["runs"][0]["field_scores"])
+    (failed,) = result["failed_runs"]
+    assert (failed["provider"], failed["provider_model"], failed["temperature"]) == ("openai", "gpt-4", 0.2)
+    assert failed["error"] == "RuntimeError: provider went away"
+
+    # every combination failed, the response still lists them
+    failing = client.post("/sweep", json=dict(body, temperature=[0.2]))
+    assert failing.status_code == 200
+    assert failing.json()["runs"] == []
+    assert len(failing.json()["failed_runs"]) == 1
@@ -0,0 +1,40 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from hackathon.telemetry.tracing import STATUS_ERROR, start_span, start_trace
+
+
+def test_trace_summary_groups_spans_by_name():
+    with start_trace("score") as recorder:
+        for sample_id in range(3):
+            with start_span("provider.call", sample_id=sample_id):
+                pass
+    summary = recorder.summary()
+    stages = {stage["name"]: stage for stage in summary["stages"]}
+    assert set(stages.keys()) == {"score", "provider.call"}
+    assert stages["provider.call"]["count"] == 3
+    root = [span for span in recorder.spans if span.name == "score"][0]
+    assert all(span.parent_span_id == root.span_id for span in recorder.spans if span.name == "provider.call")
+
+
+def test_span_records_error():
+    with start_trace("run") as recorder:
+        with pytest.raises(ValueError):
+            with start_span("stage"):
+                raise ValueError("boom")
+    span = [span for span in recorder.spans if span.name == "stage"][0]
+    assert span.status == STATUS_ERROR
+    assert recorder.summary()["stages"][0]["errors"] == 1
@@ -0,0 +1,121 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+
+import pytest
+
+from hackathon.api import routes
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.providers.pricing import estimate_cost
+from hackathon.telemetry.usage import (
+    PROVIDER_CALLS,
+    PROVIDER_COST,
+    PROVIDER_TOKENS,
+    ProviderUsage,
+    UsageTotals,
+    api_key_label,
+)
+
+EXPERIMENT_NAME = "PricingModels-Hackathon"
+
+
+class MeteredProvider(BaseProvider):
+    """Answers every sample with 100 prompt and 20 completion tokens."""
+
+    PROVIDER_NAME = "metered"
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        usage = ProviderUsage(prompt_tokens=100, completion_tokens=20, provider_time_ms=5.0)
+        return ProviderAnswer(sample_id=param.sample_id, answer='{"InstrumentType": "Other"}', usage=usage)
+
+
+def test_estimate_cost():
+    # gpt-4 lists 30 USD per million prompt tokens and 60 USD per million completion tokens
+    assert estimate_cost("gpt-4", 1000, 500) == pytest.approx(0.06)
+    assert estimate_cost("gpt-4", 0, 0) == 0.0
+    assert estimate_cost("unknown-model", 1000, 500) == 0.0
+
+
+def test_totals_keep_provider_time_unknown_until_reported():
+    totals = UsageTotals()
+    totals.add(ProviderUsage(prompt_tokens=10, completion_tokens=5, latency_ms=100.0, cost=0.5))
+    assert totals.provider_time_ms is None
+    assert totals.to_dict() == dict(
+        calls=1,
+        prompt_tokens=10,
+        completion_tokens=5,
+        total_tokens=15,
+        estimated_cost=0.5,
+        provider_time_ms=None,
+        latency_ms=100.0,
+    )
+
+    totals.add(ProviderUsage(prompt_tokens=1, completion_tokens=1, provider_time_ms=40.0, latency_ms=50.0))
+    assert totals.provider_time_ms == 40.0
+
+    merged = UsageTotals()
+    merged.merge(UsageTotals(calls=2, prompt_tokens=3, provider_time_ms=None))
+    assert merged.provider_time_ms is None
+    merged.merge(totals)
+    assert (merged.calls, merged.prompt_tokens, merged.completion_tokens) == (4, 14, 6)
+    assert merged.provider_time_ms == 40.0
+    assert merged.latency_ms == 150.0
+
+
+def test_calls_are_metered_per_model_and_api_key():
+    labels = dict(provider="metered", model="gpt-4", api_key=api_key_label("tenant-key"))
+    other_labels = dict(labels, api_key=api_key_label("other-key"))
+    calls = PROVIDER_CALLS.value(outcome="ok", **labels)
+    other_calls = PROVIDER_CALLS.value(outcome="ok", **other_labels)
+    prompt_tokens = PROVIDER_TOKENS.value(kind="prompt", **labels)
+    completion_tokens = PROVIDER_TOKENS.value(kind="completion", **labels)
+    cost = PROVIDER_COST.value(**labels)
+
+    params = [ProviderParam(sample_id=sample_id, provider_model="gpt-4") for sample_id in (1, 2)]
+    asyncio.run(MeteredProvider("tenant-key").run(params))
+    asyncio.run(MeteredProvider("other-key").run(params[:1]))
+
+    assert PROVIDER_CALLS.value(outcome="ok", **labels) - calls == 2
+    assert PROVIDER_CALLS.value(outcome="ok", **other_labels) - other_calls == 1
+    assert PROVIDER_TOKENS.value(kind="prompt", **labels) - prompt_tokens == 200
+    assert PROVIDER_TOKENS.value(kind="completion", **labels) - completion_tokens == 40
+    assert PROVIDER_COST.value(**labels) - cost == pytest.approx(2 * estimate_cost("gpt-4", 100, 20))
+    # the key itself is never a label value
+    assert "tenant-key" not in api_key_label("tenant-key")
+    assert api_key_label(None) == "anonymous"
+
+
+def test_score_reports_the_usage(client, monkeypatch):
+    monkeypatch.setattr(routes, "get_provider", lambda ai_provider, api_key: MeteredProvider(api_key))
+    body = dict(experiment_name=EXPERIMENT_NAME, prompt="Extract the terms.", provider_model="gpt-4")
+
+    response = client.post("/openai/score", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    samples = len(result["experiment_data"])
+    assert samples > 0
+    assert result["usage"] == dict(
+        calls=samples,
+        prompt_tokens=100 * samples,
+        completion_tokens=20 * samples,
+        total_tokens=120 * samples,
+        estimated_cost=round(samples * estimate_cost("gpt-4", 100, 20), 6),
+        provider_time_ms=5.0 * samples,
+        latency_ms=result["usage"]["latency_ms"],
+    )
+    for item in result["experiment_data"]:
+        assert item["usage"]["calls"] == 1
+        assert item["usage"]["prompt_tokens"] == 100
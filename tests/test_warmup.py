@@ -0,0 +1,77 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from httpx import Client
+
+from hackathon.hackathon_settings import get_settings
+from hackathon.warmup import STATUS_FAILED, STATUS_OK, Readiness, get_readiness, warm_up
+
+ROOT_PATH = Path(__file__).parents[1]
+
+
+def _fail():
+    raise RuntimeError("broken")
+
+
+def test_required_step_failure_keeps_worker_unready():
+    readiness = Readiness()
+    readiness.run_step("optional", _fail, required=False)
+    readiness.run_step("required", lambda: None)
+    assert not readiness.ready
+    readiness.finish()
+    assert readiness.ready
+
+    readiness.run_step("broken", _fail)
+    state = readiness.to_dict()
+    assert not state["ready"]
+    assert [step["status"] for step in state["steps"]] == [STATUS_FAILED, STATUS_OK, STATUS_FAILED]
+    assert state["steps"][-1]["error"] == "RuntimeError: broken"
+
+
+def test_warm_up_succeeds_with_repository_files():
+    readiness = Readiness()
+    warm_up(readiness, get_settings())
+    assert readiness.ready, readiness.to_dict()
+    assert [step.name for step in readiness.steps][:5] == [
+        "providers",
+        "chains",
+        "instruments",
+        "experiments",
+        "scoring",
+    ]
+
+
+def test_provider_sdks_are_not_imported_at_startup():
+    code = (
+        "import sys, hackathon.__main__; "
+        "print(any(name in sys.modules for name in ('openai', 'replicate', 'fireworks')))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_PATH, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_health_probes(client: Client):
+    assert client.get("/health/live").json() == {"status": "alive"}
+    deadline = time.monotonic() + 30
+    while not get_readiness().finished and time.monotonic() < deadline:
+        time.sleep(0.05)
+    response = client.get("/health/ready")
+    assert response.status_code == 200, response.json()
+    assert response.json()["ready"]
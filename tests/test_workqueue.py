@@ -0,0 +1,131 @@
+# Copyright (C) 2023-present The Project Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from hackathon.archive.incremental import UnitCache, unit_hash
+from hackathon.hackathon_settings import Settings, get_settings
+from hackathon.models.ai_models import AIProvider
+from hackathon.providers.base_provider import BaseProvider, ProviderAnswer, ProviderParam
+from hackathon.telemetry.usage import ProviderUsage, start_usage_meter
+from hackathon.workqueue.client import QueueClient, QueuedProvider, get_work_queue
+from hackathon.workqueue.queues import STATUS_DONE, STATUS_QUEUED, STATUS_RUNNING, QueueTask, SQLiteWorkQueue
+from hackathon.workqueue.worker import QueueWorker
+
+
+def _task(task_id: str, client_id: str = "client") -> QueueTask:
+    return QueueTask(task_id=task_id, client_id=client_id, provider="openai", param=dict(sample_id=1), api_key="key")
+
+
+def test_tasks_are_leased_and_retried(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path.joinpath("tasks.sqlite"), max_attempts=2)
+    queue.put([_task("a"), _task("b")])
+
+    (claimed,) = queue.claim("worker-1", limit=1, lease=0.01)
+    assert (claimed.task_id, claimed.api_key, claimed.attempts) == ("a", "key", 1)
+    # the lease ran out, another worker takes the task over and the late answer is ignored
+    time.sleep(0.02)
+    assert [task.task_id for task in queue.claim("worker-2", limit=5, lease=30)] == ["a", "b"]
+    queue.complete("a", "worker-1", dict(answer="late"))
+    queue.complete("a", "worker-2", dict(answer="ok"))
+    assert queue.stats() == {STATUS_QUEUED: 0, STATUS_RUNNING: 1, STATUS_DONE: 1}
+
+    queue.fail("b", "worker-2", "RuntimeError: first")
+    assert queue.claim("worker-2", limit=5, lease=30)[0].attempts == 2
+    queue.fail("b", "worker-2", "RuntimeError: second")
+
+    results = {result.task_id: result for result in queue.collect("client")}
+    assert results["a"].answer == dict(answer="ok")
+    assert results["b"].error == "RuntimeError: second"
+    assert queue.collect("client") == []
+
+
+def test_stopping_worker_releases_its_tasks(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path.joinpath("tasks.sqlite"))
+    queue.put([_task("a"), _task("b", client_id="other")])
+    queue.claim("worker-1", limit=2, lease=30)
+    queue.release("worker-1")
+    assert [task.attempts for task in queue.claim("worker-2", limit=2, lease=30)] == [1, 1]
+
+    queue.cancel(["a"])
+    queue.complete("b", "worker-2", dict(answer="ok"))
+    assert queue.collect("client") == []
+    assert queue.prune(time.time() + 1) == 1
+
+
+class EchoProvider(BaseProvider):
+    PROVIDER_NAME = "echo"
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+
+    async def get_answer(self, param: ProviderParam) -> ProviderAnswer:
+        if param.context == "broken":
+            raise RuntimeError("broken")
+        usage = ProviderUsage(prompt_tokens=10, completion_tokens=len(param.context))
+        return ProviderAnswer(sample_id=param.sample_id, answer=f"{self.api_key}:{param.context}", usage=usage)
+
+
+def test_worker_answers_queued_calls(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path.joinpath("tasks.sqlite"), max_attempts=2)
+    contexts = ["a", "bb", "broken", "ccc"]
+    params = [ProviderParam(sample_id=index + 1, provider_model="gpt-4", context=c) for index, c in enumerate(contexts)]
+
+    async def score():
+        client = QueueClient(queue, poll_interval=0.01)
+        provider = QueuedProvider(AIProvider.OPENAI, EchoProvider("key"), client)
+        workers = [
+            QueueWorker(queue, concurrency=2, poll_interval=0.01, provider_factory=lambda _, key: EchoProvider(key))
+            for _ in range(2)
+        ]
+        stop = asyncio.Event()
+        running = [asyncio.create_task(worker.run(stop)) for worker in workers]
+        seen = list()
+        with start_usage_meter() as meter:
+            units = UnitCache()
+            answers = await asyncio.wait_for(units.run(provider, params, on_answer=seen.append), timeout=10)
+        stop.set()
+        await asyncio.gather(*running)
+        return provider, answers, seen, meter, units, sum(worker.completed for worker in workers)
+
+    provider, answers, seen, meter, units, completed = asyncio.run(score())
+    assert [answer.answer for answer in answers[:2] + answers[3:]] == ["key:a", "key:bb", "key:ccc"]
+    assert answers[2].answer == BaseProvider.get_error_answer("RuntimeError: broken")
+    assert len(seen) == 4
+    assert completed == 3
+    # usage and unit hashes are the ones of a local run
+    assert meter.for_sample(2)["completion_tokens"] == 2
+    assert meter.total.prompt_tokens == 30
+    assert unit_hash(provider, params[0]) == unit_hash(EchoProvider("key"), params[0])
+    assert len(units.units) == 3
+    assert queue.stats() == {STATUS_QUEUED: 0, STATUS_RUNNING: 0, STATUS_DONE: 0}
+
+
+def test_backend_is_loaded_from_its_class_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "work_queue_backend", "hackathon.workqueue.queues:SQLiteWorkQueue")
+    monkeypatch.setattr(get_settings(), "work_queue_path", tmp_path.joinpath("tasks.sqlite"))
+    monkeypatch.setattr(get_settings(), "work_queue_max_attempts", 5)
+    queue = get_work_queue()
+    assert isinstance(queue, SQLiteWorkQueue)
+    assert (queue.path, queue.max_attempts) == (tmp_path.joinpath("tasks.sqlite"), 5)
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("WORK_QUEUE_BACKEND", "redis")
+    with pytest.raises(ValidationError, match="WORK_QUEUE_BACKEND"):
+        Settings()